@@ -0,0 +1,258 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Compact encoding of numeric arrays in PubSub message bodies.
+
+Rather than serialising time-series data as JSON lists of numbers, arrays are encoded as a
+Base64 little-endian typed buffer with the dtype and shape in the message body:
+
+```
+{"samples": {"__array__": {"dtype": "<f8", "shape": [10000], "data": "AAAAAAAA8D8AAAAAAAAAQA..."}}}
+```
+
+Receivers decode it into an array.array or a NumPy array over the decoded buffer without creating a
+Python object per element. For bytes message bodies (i.e: publish_bytes(), claim-check or chunked messages),
+pack_array() encodes an array as a raw buffer with a small header rather than as Base64.
+
+dtype is the NumPy array-protocol type string of a little-endian int ('i'), unsigned int ('u') or float ('f') type,
+i.e: '<f8', '<f4', '<i4', '|u1'.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import sys
+import json
+import base64
+import struct
+from array import array
+
+# Key of an encoded array object in the message body.
+ARRAY_KEY = '__array__'
+
+# Header of a packed raw array of (magic, header JSON length).
+PACKED_MAGIC = b'GGPSARR1'
+_packed_header = struct.Struct('<8sI')
+
+_is_big_endian = sys.byteorder == 'big'
+
+# NumPy is only imported when first needed, it adds to component startup time.
+_numpy = None
+
+def _get_numpy():
+
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+
+    return _numpy
+
+def _is_numpy_array(value):
+    return type(value).__module__ == 'numpy' and hasattr(value, 'dtype') and hasattr(value, 'shape')
+
+def get_dtype(typecode):
+    '''
+    Returns the little-endian dtype string of an array.array typecode.
+    '''
+
+    if typecode not in 'bBhHiIlLqQfd':
+        raise Exception('Unsupported array typecode: {}. Supported Values: [b || B || h || H || i || I || l || L || q || Q || f || d]'.format(typecode))
+
+    kind = 'f' if typecode in 'fd' else ('u' if typecode.isupper() else 'i')
+    itemsize = array(typecode).itemsize
+    return '{}{}{}'.format('|' if itemsize == 1 else '<', kind, itemsize)
+
+def get_typecode(dtype):
+    '''
+    Returns the array.array typecode of a dtype string.
+    '''
+
+    if len(dtype) < 3 or dtype[0] not in '<|' or dtype[1] not in 'iuf' or not dtype[2:].isdigit():
+        raise Exception('Unsupported array dtype: {}. Expected a little-endian int, unsigned int or float type, i.e: <f8'.format(dtype))
+
+    kind, itemsize = dtype[1], int(dtype[2:])
+    for typecode in ('fd' if kind == 'f' else ('BHILQ' if kind == 'u' else 'bhilq')):
+        if array(typecode).itemsize == itemsize:
+            return typecode
+
+    raise Exception('Unsupported array dtype: {}. No array typecode with an item size of {} bytes.'.format(dtype, itemsize))
+
+def _get_buffer(values, dtype=None):
+    '''
+    Returns a tuple of the (dtype, shape, little-endian buffer) of an array.array, NumPy array or list of numbers.
+    '''
+
+    if _is_numpy_array(values):
+        if values.dtype.kind not in 'iuf':
+            raise Exception('Unsupported array dtype: {}. Expected an int, unsigned int or float array.'.format(values.dtype.str))
+        little_endian = values.dtype.newbyteorder('<') if values.dtype.byteorder == '>' or (values.dtype.byteorder == '=' and _is_big_endian) else values.dtype
+        values = _get_numpy().ascontiguousarray(values, dtype=little_endian)
+        return values.dtype.str, list(values.shape), values.data.cast('B')
+
+    if not isinstance(values, array):
+        values = array(get_typecode(dtype) if dtype else 'd', values)
+    elif dtype and get_dtype(values.typecode) != dtype:
+        values = array(get_typecode(dtype), values)
+
+    if _is_big_endian:
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return get_dtype(values.typecode), [len(values)], memoryview(values).cast('B')
+
+def encode_array(values, dtype=None):
+    '''
+    Returns the encoded array dict of an array.array, NumPy array or list of numbers to set in a message body.
+
+    ### Parameters
+
+    **values**: array.array, numpy.ndarray or list
+
+        Array to encode, NumPy arrays of any shape are encoded with their shape.
+
+    **dtype**: str (Optional) Default=The array type or '<f8' for lists
+
+        dtype to encode the values as, i.e: '<f4' to send float64 values as float32.
+    '''
+
+    dtype, shape, buffer = _get_buffer(values, dtype)
+    return {ARRAY_KEY : {
+        'dtype' : dtype,
+        'shape' : shape,
+        'data' : base64.b64encode(buffer).decode('ascii')
+    }}
+
+def is_encoded_array(value):
+    '''
+    Returns True if the value is an encoded array dict.
+    '''
+    return value.__class__ is dict and len(value) == 1 and ARRAY_KEY in value
+
+def decode_array(encoded, use_numpy=None):
+    '''
+    Returns the array of an encoded array dict.
+
+    ### Parameters
+
+    **encoded**: dict
+
+        Encoded array dict from encode_array().
+
+    **use_numpy**: bool (Optional) Default=True if NumPy is installed
+
+        If True, returns a read only numpy.ndarray of the encoded shape over the decoded buffer.
+        If False, returns a (flat) array.array.
+    '''
+
+    fields = encoded[ARRAY_KEY] if ARRAY_KEY in encoded else encoded
+    return _decode_buffer(fields['dtype'], fields['shape'], base64.b64decode(fields['data']), use_numpy)
+
+def _decode_buffer(dtype, shape, data, use_numpy):
+
+    typecode = get_typecode(dtype)
+    size = array(typecode).itemsize
+    for dim in shape:
+        size *= dim
+    if len(data) != size:
+        raise Exception('Encoded array data of {} bytes does not match dtype: {} and shape: {}'.format(len(data), dtype, shape))
+
+    numpy = _get_numpy() if use_numpy is not False else None
+    if use_numpy and not numpy:
+        raise Exception('NumPy array decoding requested but NumPy is not installed.')
+
+    if numpy:
+        return numpy.frombuffer(data, dtype=dtype).reshape(shape)
+
+    values = array(typecode)
+    values.frombytes(data)
+    if _is_big_endian:
+        values.byteswap()
+    return values
+
+def encode_arrays(body):
+    '''
+    Returns the message body with any array.array and NumPy array values in (nested) dicts and lists replaced by
+    encoded array dicts. Dicts and lists containing arrays are copied, the given body isn't modified.
+    '''
+
+    if isinstance(body, array) or _is_numpy_array(body):
+        return encode_array(body)
+
+    if body.__class__ is dict:
+        encoded = None
+        for key, value in body.items():
+            if value.__class__ in (dict, list) or isinstance(value, array) or _is_numpy_array(value):
+                encoded_value = encode_arrays(value)
+                if encoded_value is not value:
+                    if encoded is None:
+                        encoded = dict(body)
+                    encoded[key] = encoded_value
+        return encoded if encoded is not None else body
+
+    if body.__class__ is list:
+        encoded = None
+        for idx, value in enumerate(body):
+            if value.__class__ in (dict, list) or isinstance(value, array) or _is_numpy_array(value):
+                encoded_value = encode_arrays(value)
+                if encoded_value is not value:
+                    if encoded is None:
+                        encoded = list(body)
+                    encoded[idx] = encoded_value
+        return encoded if encoded is not None else body
+
+    return body
+
+def decode_arrays(body, use_numpy=None):
+    '''
+    Returns the message body with encoded array dicts in (nested) dicts and lists replaced by their decoded arrays.
+    Dicts and lists are decoded in place. See decode_array() for use_numpy.
+    '''
+
+    if body.__class__ is dict:
+        if len(body) == 1 and ARRAY_KEY in body:
+            return decode_array(body, use_numpy)
+        for key, value in body.items():
+            if value.__class__ in (dict, list):
+                body[key] = decode_arrays(value, use_numpy)
+
+    elif body.__class__ is list:
+        for idx, value in enumerate(body):
+            if value.__class__ in (dict, list):
+                body[idx] = decode_arrays(value, use_numpy)
+
+    return body
+
+def pack_array(values, dtype=None):
+    '''
+    Returns bytes of a raw little-endian array buffer with a header of the dtype and shape,
+    to publish as a bytes payload or message body. See encode_array() for the parameters.
+    '''
+
+    dtype, shape, buffer = _get_buffer(values, dtype)
+    header = json.dumps({'dtype' : dtype, 'shape' : shape}).encode('utf-8')
+    return b''.join([_packed_header.pack(PACKED_MAGIC, len(header)), header, buffer])
+
+def unpack_array(payload, use_numpy=None):
+    '''
+    Returns the array of a packed array payload (bytes or memoryview) from pack_array(). NumPy arrays are
+    a read only view of the payload without copying it. See decode_array() for use_numpy.
+    '''
+
+    payload = memoryview(payload).cast('B')
+    if payload.nbytes < _packed_header.size:
+        raise Exception('Packed array payload of {} bytes is shorter than the header.'.format(payload.nbytes))
+
+    magic, header_len = _packed_header.unpack_from(payload)
+    if magic != PACKED_MAGIC:
+        raise Exception('Payload is not a packed array.')
+
+    offset = _packed_header.size + header_len
+    header = json.loads(str(payload[_packed_header.size:offset], 'utf-8'))
+    return _decode_buffer(header['dtype'], header['shape'], payload[offset:], use_numpy)
@@ -0,0 +1,380 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Claim-check transfer of large message bodies between components on the same device.
+
+Rather than serialising a large message body into the IPC payload and copying it through the
+Greengrass nucleus, the publishing ClaimCheckStore writes the body once to a segment file in shared
+memory (/dev/shm) and publishes a small reference message with a claim_check header field in its place:
+
+```
+"claim_check": {"segment": "ggpubsub-cc-<expires_ms>-<id>", "size": 4194304, "encoding": "bytes"}
+```
+
+The receiving ClaimCheckReader maps the segment read-only and passes the message handler a
+memoryview of the mapped segment (bytes bodies) or the body parsed from it (JSON bodies) without
+copying it through the IPC payload. Mappings are reference counted per segment in the receiving process
+and unmapped once released. Segments are deleted by the publishing process once their TTL expires,
+receivers need to map the segment within the TTL. Segments left by a stopped process are deleted
+by the next ClaimCheckStore created in the same directory.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import os
+import re
+import json
+import mmap
+import time
+import logging
+import binascii
+import tempfile
+import threading
+from collections import deque
+
+from awsgreengrasspubsubsdk.pubsub_message import PubSubMessage
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'ggpubsub-cc-'
+_segment_name = re.compile(r'^ggpubsub-cc-(\d+)-[0-9a-f]{32}$')
+
+def get_default_directory():
+    '''
+    Returns /dev/shm if available (memory backed on Linux) else the system temp directory.
+    '''
+
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+
+    return tempfile.gettempdir()
+
+class ClaimCheckStore():
+    '''
+    Writes large message bodies to shared memory segments and returns claim-check reference messages to publish in their place.
+
+    ### Parameters
+
+    **threshold**: int (Optional) Default=1MB
+
+        Message bodies of this many bytes or more are claim-checked.
+
+    **ttl**: float (Optional) Default=60
+
+        Secs before a segment is deleted, receivers must map it within this time.
+
+    **directory**: str (Optional) Default=/dev/shm
+
+        Directory of the segment files, must be the same directory the receiving components read from.
+
+    **mode**: int (Optional) Default=0o600
+
+        File mode of the segments. The default only allows components running as the same user to read them. 
+        To share segments between components running as different users, use a directory only those users 
+        can access (i.e: a group owned directory in /dev/shm) with mode=0o640.
+    '''
+
+    def __init__(self, threshold=1024 * 1024, ttl=60, directory=None, mode=0o600):
+
+        self.threshold = threshold
+        self.ttl = ttl
+        self.directory = directory if directory else get_default_directory()
+        self.mode = mode
+
+        # (expires_at, path) of the segments written by this store, in expiry order.
+        self._segments = deque()
+        self._lock = threading.Lock()
+        self._cleanup_timer = None
+
+        # Counters
+        self.checked_in = 0
+        self.bytes_checked_in = 0
+        self.deleted = 0
+
+        self._delete_stale_segments()
+
+    def check_in(self, message):
+        '''
+        Returns a claim-check reference message dict for an SDK formatted message dict with a body over the threshold,
+        or else the JSON encoded message payload bytes to publish as is. Bodies of bytes, bytearray or memoryview are 
+        written as is and always claim-checked as they can't be serialised to JSON, other bodies are written as JSON.
+
+        The message body is serialised once, for both the size check and the segment or payload.
+        '''
+
+        header = {key : value for key, value in message.items() if key != 'message'}
+        body = message.get('message')
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            encoding = 'bytes'
+            data = memoryview(body).cast('B') if isinstance(body, memoryview) else body
+        else:
+            encoding = 'json'
+            data = json.dumps(body).encode('utf-8')
+
+        size = data.nbytes if isinstance(data, memoryview) else len(data)
+        if size < self.threshold and encoding == 'json':
+            # Same as json.dumps() of the message with the body as the last field.
+            header = json.dumps(header).encode('utf-8')
+            return b''.join([header[:-1], b', ' if header != b'{}' else b'', b'"message": ', data, b'}'])
+
+        expires_at = time.time() + self.ttl
+        segment = '{}{}-{}'.format(SEGMENT_PREFIX, int(expires_at * 1000), binascii.hexlify(os.urandom(16)).decode('ascii'))
+        path = os.path.join(self.directory, segment)
+
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, self.mode)
+        try:
+            written = 0
+            view = memoryview(data)
+            while written < size:
+                written += os.write(fd, view[written:])
+        finally:
+            os.close(fd)
+
+        with self._lock:
+            self._segments.append((expires_at, path))
+            self.checked_in += 1
+            self.bytes_checked_in += size
+            self._schedule_cleanup()
+
+        # Reference message with the same header fields, the claim check must precede the message body.
+        reference = header
+        reference['claim_check'] = {'segment' : segment, 'size' : size, 'encoding' : encoding}
+        reference['message'] = {}
+        return reference
+
+    def get_stats(self):
+        '''
+        Returns a dict of the segments checked in, bytes checked in, segments deleted and active segments.
+        '''
+
+        with self._lock:
+            return {
+                'checked_in' : self.checked_in,
+                'bytes_checked_in' : self.bytes_checked_in,
+                'deleted' : self.deleted,
+                'active' : len(self._segments)
+            }
+
+    def close(self):
+        '''
+        Deletes all segments written by this store.
+        '''
+
+        with self._lock:
+            if self._cleanup_timer:
+                self._cleanup_timer.cancel()
+                self._cleanup_timer = None
+            segments = list(self._segments)
+            self._segments.clear()
+
+        for _, path in segments:
+            self._delete_segment(path)
+
+    def _schedule_cleanup(self):
+        '''
+        Schedules deleting the next segment to expire if not already scheduled. Must hold the lock.
+        '''
+
+        if self._cleanup_timer or not self._segments:
+            return
+
+        self._cleanup_timer = threading.Timer(max(self._segments[0][0] - time.time(), 0), self._delete_expired_segments)
+        self._cleanup_timer.daemon = True
+        self._cleanup_timer.start()
+
+    def _delete_expired_segments(self):
+
+        now = time.time()
+        expired = []
+        with self._lock:
+            while self._segments and self._segments[0][0] <= now:
+                expired.append(self._segments.popleft()[1])
+            self._cleanup_timer = None
+            self._schedule_cleanup()
+
+        for path in expired:
+            self._delete_segment(path)
+
+    def _delete_segment(self, path):
+
+        try:
+            os.unlink(path)
+            self.deleted += 1
+        except FileNotFoundError:
+            pass
+        except Exception as err:
+            log.error('Exception deleting claim check segment. ERROR: {} - PATH: {}'.format(err, path))
+
+    def _delete_stale_segments(self):
+        '''
+        Deletes expired segments in the directory left by stopped processes.
+        '''
+
+        now_ms = time.time() * 1000
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        for name in names:
+            match = _segment_name.match(name)
+            if match and int(match.group(1)) < now_ms:
+                self._delete_segment(os.path.join(self.directory, name))
+
+class ClaimCheckReader():
+    '''
+    Maps the claim-check segments of received reference messages. Each segment is mapped once per process
+    and reference counted across the messages using it, it's unmapped when the last is released.
+
+    ### Parameters
+
+    **directory**: str (Optional) Default=/dev/shm
+
+        Directory of the segment files, must be the same directory the publishing components write to.
+    '''
+
+    def __init__(self, directory=None):
+
+        self.directory = directory if directory else get_default_directory()
+
+        # Segment name: [mmap, reference count]
+        self._mappings = {}
+        self._lock = threading.Lock()
+
+        # Counters
+        self.checked_out = 0
+
+    def check_out(self, message):
+        '''
+        Returns a ClaimCheckMessage with the message body read from the claim-check segment of a received
+        reference message (LazyPubSubMessage). The message must be released with release() once processed.
+        '''
+
+        claim_check = message.header['claim_check']
+        segment, size, encoding = claim_check['segment'], claim_check['size'], claim_check['encoding']
+
+        # Only open segment files by name in the claim check directory.
+        if not _segment_name.match(segment):
+            raise Exception('Invalid claim check segment name: {}'.format(segment))
+
+        with self._lock:
+            mapping = self._mappings.get(segment)
+            if mapping is None:
+                mapping = [self._map_segment(segment, size), 0]
+                self._mappings[segment] = mapping
+            mapping[1] += 1
+            self.checked_out += 1
+
+        header = message.header
+        return ClaimCheckMessage(self, segment, memoryview(mapping[0])[:size], encoding, header.get('sdk_version'), header.get('message_id'),
+            header.get('status'), header.get('route'), header.get('expires_at'), header.get('trace'), header.get('is_reply', False))
+
+    def release(self, segment):
+        '''
+        Releases a reference to the segment mapping, unmaps it once the last reference is released.
+        '''
+
+        with self._lock:
+            mapping = self._mappings.get(segment)
+            if mapping is None:
+                return
+            mapping[1] -= 1
+            if mapping[1] > 0:
+                return
+            del self._mappings[segment]
+
+        try:
+            mapping[0].close()
+        except BufferError:
+            # A message handler still holds a view of the segment, it's unmapped once the view is released.
+            pass
+
+    def get_stats(self):
+        '''
+        Returns a dict of the messages checked out and segments currently mapped.
+        '''
+
+        with self._lock:
+            return {
+                'checked_out' : self.checked_out,
+                'mapped' : len(self._mappings)
+            }
+
+    def _map_segment(self, segment, size):
+
+        try:
+            with open(os.path.join(self.directory, segment), 'rb') as segment_file:
+                if os.fstat(segment_file.fileno()).st_size < size:
+                    raise Exception('Claim check segment: {} is smaller than expected size: {}'.format(segment, size))
+                return mmap.mmap(segment_file.fileno(), size, access=mmap.ACCESS_READ)
+
+        except FileNotFoundError:
+            raise Exception('Claim check segment: {} not found, it may have expired before being received.'.format(segment))
+
+class ClaimCheckMessage(PubSubMessage):
+    '''
+    A received claim-check message. The message body is a read only memoryview of the mapped segment
+    for bytes bodies, or is parsed from the mapped segment on first access for JSON bodies.
+
+    Message handlers that keep a bytes message body after returning must copy it, i.e: bytes(message).
+    '''
+
+    __slots__ = ('_reader', '_segment', '_buffer', '_encoding', '_message', '_is_parsed')
+
+    def __init__(self, reader, segment, buffer, encoding, sdk_version, message_id, status, route, expires_at=None, trace=None, is_reply=False):
+
+        self._reader = reader
+        self._segment = segment
+        self._buffer = buffer
+        self._encoding = encoding
+        self._message = None
+        self._is_parsed = False
+        super().__init__(sdk_version, message_id, status, route, None, expires_at, trace, is_reply)
+
+    @property
+    def message(self):
+        '''
+        The message body, a memoryview of the segment for bytes bodies or the parsed JSON body.
+        '''
+
+        if not self._is_parsed:
+            if self._encoding == 'bytes':
+                self._message = self._buffer
+            else:
+                self._message = json.loads(str(self._buffer, 'utf-8'))
+            self._is_parsed = True
+
+        return self._message
+
+    @message.setter
+    def message(self, message):
+        # Set by PubSubMessage.__init__, the body is read from the segment.
+        pass
+
+    def is_sdk_formatted(self):
+        return all(value is not None for value in (self.sdk_version, self.message_id, self.status, self.route))
+
+    def release(self):
+        '''
+        Releases this message's reference to the claim-check segment mapping.
+        '''
+
+        if self._reader is None:
+            return
+
+        self._message = None
+        try:
+            self._buffer.release()
+        except BufferError:
+            # The message handler exported the buffer (i.e: numpy.frombuffer()), the mapping is kept until it's released.
+            pass
+        self._reader.release(self._segment)
+        self._reader = None
+
+    def __repr__(self):
+        return 'ClaimCheckMessage(route={}, message_id={}, segment={}, encoding={})'.format(self.route, self.message_id, self._segment, self._encoding)
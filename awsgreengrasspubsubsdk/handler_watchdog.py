@@ -0,0 +1,168 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Watchdog that detects message handlers running over their execution time budget.
+
+Python threads can't be forcibly stopped so a stuck synchronous message handler can't be
+recovered, but it can be detected. The watchdog tracks in-flight handler calls and logs the
+route, message_id and current stack of any handler that overruns its budget so the
+slow or stuck code can be identified before the message processing thread pool fills.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import sys
+import time
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+class HandlerWatchdog():
+    '''
+    Tracks in-flight message handler calls against their time budget.
+
+    ### Parameters
+
+    **check_interval**: float (Optional) Default=Half the smallest budget watched
+
+        Seconds between checks of in-flight handlers. Handlers that overrun their budget and 
+        complete before the next check are counted and reported when they complete.
+
+    **on_overrun**: function (Optional)
+
+        Called as on_overrun(route, message_id, elapsed, stack) the first time a handler is detected 
+        over its budget. From the watchdog thread with the handler's current stack while it's in flight, 
+        or from the handler thread with stack None if it completed over budget before being detected.
+    '''
+
+    def __init__(self, check_interval=None, on_overrun=None):
+
+        self.check_interval = check_interval
+        self.on_overrun = on_overrun
+
+        # Smallest budget watched, the default check interval is derived from it.
+        self._min_budget = None
+
+        # In flight handler calls by token: [route, message_id, thread_id, start, budget, is_reported]
+        self._in_flight = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Counters by route.
+        self.overruns = {}
+        self.cancelled = {}
+
+    @contextmanager
+    def watch(self, route, message_id, budget):
+        '''
+        Context manager that tracks the enclosed handler call against the budget in seconds.
+        '''
+
+        token = self._start(route, message_id, budget)
+        try:
+            yield
+        finally:
+            self._finish(token)
+
+    def record_cancelled(self, route):
+        '''
+        Counts a handler that was cancelled for overrunning its budget.
+        '''
+
+        with self._lock:
+            self.cancelled[route] = self.cancelled.get(route, 0) + 1
+
+    def get_stats(self):
+        '''
+        Returns a dict of overrun and cancelled counts by route and the number of in-flight handler calls.
+        '''
+
+        with self._lock:
+            return {
+                'overruns' : dict(self.overruns),
+                'cancelled' : dict(self.cancelled),
+                'in_flight' : len(self._in_flight)
+            }
+
+    def _start(self, route, message_id, budget):
+
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._in_flight[token] = [route, message_id, threading.get_ident(), time.monotonic(), budget, False]
+            if self._min_budget is None or budget < self._min_budget:
+                self._min_budget = budget
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='HandlerWatchdog', daemon=True)
+                self._thread.start()
+
+        return token
+
+    def _finish(self, token):
+
+        with self._lock:
+            route, message_id, thread_id, start, budget, is_reported = self._in_flight.pop(token)
+            elapsed = time.monotonic() - start
+            is_undetected = not is_reported and elapsed > budget
+            if is_undetected:
+                self.overruns[route] = self.overruns.get(route, 0) + 1
+
+        if is_reported or is_undetected:
+            log.warning('Message handler completed after overrunning budget. ROUTE: {} - MESSAGE ID: {} - ELAPSED: {:.3f}s - BUDGET: {}s'.format(route, message_id, elapsed, budget))
+
+        if is_undetected and self.on_overrun:
+            try:
+                self.on_overrun(route, message_id, elapsed, None)
+            except Exception as err:
+                log.error('Exception raised from watchdog on_overrun callback. ERROR: {}'.format(err))
+
+    def get_check_interval(self):
+        '''
+        Returns the secs between checks, check_interval if set else half the smallest budget watched (min 10ms).
+        '''
+
+        if self.check_interval:
+            return self.check_interval
+
+        return max(self._min_budget / 2, 0.01) if self._min_budget else 1.0
+
+    def _run(self):
+
+        while True:
+            time.sleep(self.get_check_interval())
+            now = time.monotonic()
+
+            overrun = []
+            with self._lock:
+                for record in self._in_flight.values():
+                    route, message_id, thread_id, start, budget, is_reported = record
+                    if not is_reported and now - start > budget:
+                        record[5] = True
+                        self.overruns[route] = self.overruns.get(route, 0) + 1
+                        overrun.append((route, message_id, thread_id, now - start, budget))
+
+            for route, message_id, thread_id, elapsed, budget in overrun:
+                self._report_overrun(route, message_id, thread_id, elapsed, budget)
+
+    def _report_overrun(self, route, message_id, thread_id, elapsed, budget):
+
+        frame = sys._current_frames().get(thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame else '<handler thread not found>'
+
+        log.error('Message handler overrunning budget. ROUTE: {} - MESSAGE ID: {} - ELAPSED: {:.3f}s - BUDGET: {}s - STACK:\n{}'.format(route, message_id, elapsed, budget, stack))
+
+        if self.on_overrun:
+            try:
+                self.on_overrun(route, message_id, elapsed, stack)
+            except Exception as err:
+                log.error('Exception raised from watchdog on_overrun callback. ERROR: {}'.format(err))
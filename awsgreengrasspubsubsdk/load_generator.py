@@ -0,0 +1,286 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Synthetic load generator that publishes SDK formatted messages at a target rate to drive
+a component under test, and reports the achieved rate, publish latency percentiles and errors.
+
+Messages are built with the PubSubMessageFormatter with routes and message body sizes drawn from
+the given distributions and published with AwsGreengrassPubSubSdkClient.publish_message() from
+concurrent publisher threads. Runs against the Greengrass nucleus from within a component or
+against the in process pubsub_local stand-in transports.
+
+### Usage
+
+```
+gg-pubsub-load-generator --topic my_app/my_thing/ingress --routes MyHandler.telemetry:9,MyHandler.command:1 \\
+    --rate 500 --duration 30 --payload-size 100-4000 --concurrency 4 --transport greengrass
+```
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+
+from awsgreengrasspubsubsdk.pubsub_client import AwsGreengrassPubSubSdkClient
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+def parse_routes(routes):
+    '''
+    Returns a tuple of the (routes, weights) lists from a comma separated list of route[:weight].
+    '''
+
+    route_list, weights = [], []
+    for route in routes.split(','):
+        route, _, weight = route.strip().partition(':')
+        route_list.append(route)
+        weights.append(float(weight) if weight else 1.0)
+
+    return route_list, weights
+
+def parse_payload_size(payload_size):
+    '''
+    Returns a function that returns a message body size in bytes from a payload size distribution of:
+
+    * N: Fixed N bytes.
+    * MIN-MAX: Uniform between MIN and MAX bytes.
+    * exp:MEAN: Exponential with mean MEAN bytes.
+    '''
+
+    if payload_size.startswith('exp:'):
+        mean = float(payload_size[4:])
+        return lambda: int(random.expovariate(1 / mean))
+
+    if '-' in payload_size:
+        min_size, max_size = (int(size) for size in payload_size.split('-', 1))
+        return lambda: random.randint(min_size, max_size)
+
+    size = int(payload_size)
+    return lambda: size
+
+def get_percentile(sorted_values, percentile):
+
+    if not sorted_values:
+        return None
+
+    idx = min(int(len(sorted_values) * percentile / 100), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+class LoadGenerator():
+    '''
+    Publishes SDK formatted messages at a target rate from concurrent publisher threads.
+
+    ### Parameters
+
+    **pubsub_client**: AwsGreengrassPubSubSdkClient
+
+        Activated client to publish with.
+
+    **protocol**: str
+
+        Protocol to publish to: ipc, mqtt or ipc_mqtt.
+
+    **topic**: str
+
+        Topic to publish to.
+
+    **routes**: list
+
+        Message routes to publish to, chosen at random by weights.
+
+    **weights**: list (Optional)
+
+        Relative weight of each route.
+
+    **payload_size**: function (Optional) Default=256 bytes
+
+        Returns the message body size in bytes of each message.
+
+    **rate**: float (Optional) Default=100
+
+        Target total messages per second across all publishers, None or 0 to publish as fast as possible.
+
+    **concurrency**: int (Optional) Default=1
+
+        Number of concurrent publisher threads.
+    '''
+
+    def __init__(self, pubsub_client, protocol, topic, routes, weights=None, payload_size=None, rate=100, concurrency=1):
+
+        self.pubsub_client = pubsub_client
+        self.protocol = protocol
+        self.topic = topic
+        self.routes = routes
+        self.weights = weights
+        self.payload_size = payload_size if payload_size else (lambda: 256)
+        self.rate = rate
+        self.concurrency = concurrency
+
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+        self.published = 0
+
+    def run(self, duration=None, count=None):
+        '''
+        Publishes until duration secs have elapsed or count messages are published and returns the report dict.
+        '''
+
+        if not duration and not count:
+            raise Exception('Load generator requires a duration or message count.')
+
+        started = time.monotonic()
+        deadline = started + duration if duration else None
+        per_publisher = None
+        if count:
+            per_publisher = [count // self.concurrency + (1 if idx < count % self.concurrency else 0) for idx in range(self.concurrency)]
+
+        threads = []
+        for idx in range(self.concurrency):
+            thread = threading.Thread(target=self._publish_messages, name='LoadGenerator-{}'.format(idx),
+                args=(idx, started, deadline, per_publisher[idx] if per_publisher else None), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        return self.get_report(time.monotonic() - started)
+
+    def get_report(self, elapsed):
+        '''
+        Returns a dict of the achieved rate, publish latency percentiles in ms and error counts. Messages are only 
+        counted as published (with their latency) if all protocol legs succeed, each failed leg is counted as an error.
+        '''
+
+        latencies = sorted(self.latencies)
+        error_count = sum(self.errors.values())
+
+        return {
+            'protocol' : self.protocol,
+            'topic' : self.topic,
+            'target_rate' : self.rate,
+            'concurrency' : self.concurrency,
+            'elapsed' : round(elapsed, 3),
+            'published' : self.published,
+            'achieved_rate' : round(self.published / elapsed, 1) if elapsed else 0,
+            'latency_ms' : {
+                'p50' : self._to_ms(get_percentile(latencies, 50)),
+                'p90' : self._to_ms(get_percentile(latencies, 90)),
+                'p99' : self._to_ms(get_percentile(latencies, 99)),
+                'max' : self._to_ms(latencies[-1] if latencies else None)
+            },
+            'errors' : error_count,
+            'error_types' : dict(self.errors)
+        }
+
+    def _publish_messages(self, idx, started, deadline, count):
+
+        formatter = self.pubsub_client.formatter
+        interval = self.concurrency / self.rate if self.rate else 0
+        # Stagger the publishers evenly across the first interval.
+        next_publish = started + interval * idx / self.concurrency
+        sent = 0
+
+        while (count is None or sent < count) and (deadline is None or time.monotonic() < deadline):
+
+            if interval:
+                wait = next_publish - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                next_publish += interval
+
+            route = random.choices(self.routes, self.weights)[0]
+            message = formatter.get_message(route=route, message={'seq' : sent, 'publisher' : idx, 'data' : 'x' * self.payload_size()})
+
+            publish_started = time.perf_counter()
+            try:
+                results = self.pubsub_client.publish_message(self.protocol, message, topic=self.topic)
+                latency = time.perf_counter() - publish_started
+
+                # ipc_mqtt returns rather than raises the errors of failed legs.
+                leg_errors = [err for err in results.values() if err is not None] if isinstance(results, dict) else []
+                with self._lock:
+                    for err in leg_errors:
+                        self._count_error(err)
+                    if not leg_errors:
+                        self.published += 1
+                        self.latencies.append(latency)
+
+            except Exception as err:
+                with self._lock:
+                    self._count_error(err)
+
+            sent += 1
+
+    def _count_error(self, err):
+        '''
+        Counts a publish error by type. Must hold the lock.
+        '''
+
+        error_type = type(err).__name__ if type(err) is not Exception else str(err).split('.')[0]
+        self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def _to_ms(self, secs):
+        return round(secs * 1000, 3) if secs is not None else None
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='AWS Greengrass PubSub SDK synthetic load generator.')
+    parser.add_argument('--topic', required=True, help='Topic to publish to, i.e: the ingress topic of the component under test.')
+    parser.add_argument('--routes', default='default_message_handler', help='Comma separated message routes with optional weights, i.e: MyHandler.a:9,MyHandler.b:1')
+    parser.add_argument('--protocol', choices=['ipc', 'mqtt', 'ipc_mqtt'], default='ipc', help='Protocol to publish to.')
+    parser.add_argument('--rate', type=float, default=100, help='Target messages per second, 0 to publish as fast as possible.')
+    parser.add_argument('--duration', type=float, help='Secs to publish for.')
+    parser.add_argument('--count', type=int, help='Number of messages to publish.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Number of concurrent publishers.')
+    parser.add_argument('--payload-size', default='256', help='Message body size in bytes: N, MIN-MAX (uniform) or exp:MEAN (exponential).')
+    parser.add_argument('--transport', choices=['local', 'greengrass'], default='greengrass', help='PubSub transport to publish on.')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args(args)
+
+    if not args.duration and not args.count:
+        args.duration = 10
+
+    logging.basicConfig(level=logging.WARNING)
+
+    pubsub_client = AwsGreengrassPubSubSdkClient('load_generator', lambda *args: None)
+    logging.getLogger('awsgreengrasspubsubsdk').setLevel(logging.WARNING)
+
+    if args.transport == 'local':
+        from awsgreengrasspubsubsdk.pubsub_local import LocalPubSub, LocalMqttPubSub
+        ipc_class, mqtt_class = LocalPubSub, LocalMqttPubSub
+    else:
+        ipc_class, mqtt_class = None, None
+
+    if args.protocol in ['ipc', 'ipc_mqtt']:
+        pubsub_client.activate_ipc_pubsub(pubsub_class=ipc_class)
+    if args.protocol in ['mqtt', 'ipc_mqtt']:
+        pubsub_client.activate_mqtt_pubsub(pubsub_class=mqtt_class)
+
+    routes, weights = parse_routes(args.routes)
+    load_generator = LoadGenerator(pubsub_client, args.protocol, args.topic, routes, weights,
+        parse_payload_size(args.payload_size), args.rate, args.concurrency)
+    report = load_generator.run(duration=args.duration, count=args.count)
+
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print('Published {} messages in {:.2f}s to {} topic: {}'.format(report['published'], report['elapsed'], report['protocol'], report['topic']))
+    print('  Achieved rate:  {} msg/s (target: {})'.format(report['achieved_rate'], report['target_rate'] if report['target_rate'] else 'max'))
+    print('  Latency (ms):   p50 {p50} - p90 {p90} - p99 {p99} - max {max}'.format(**report['latency_ms']))
+    print('  Errors:         {} {}'.format(report['errors'], report['error_types'] if report['errors'] else ''))
+
+if __name__ == '__main__':
+    main()
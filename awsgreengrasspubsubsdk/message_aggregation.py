@@ -0,0 +1,386 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Windowed aggregation of telemetry messages before they are published to MQTT.
+
+Rather than publishing every raw reading to AWS IoT Core, messages published to an aggregated
+route are added to a time window per (topic, route) and a single summary message of the count, min, max,
+mean and percentiles of each numeric field in the message body is published at the end of each window:
+
+```
+{
+    "window_start": 1700000000.0, "window_end": 1700000010.0, "count": 100000,
+    "fields": {"temperature": {"count": 100000, "min": 20.1, "max": 24.9, "mean": 22.4, "p95": 24.3}}
+}
+```
+
+Windows are tumbling (slide = window) or sliding (a window of readings published every slide secs) and
+are aligned to multiples of slide secs since the epoch. Stats are computed with NumPy if installed, else in Python.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import math
+import time
+import bisect
+import logging
+import threading
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+DEFAULT_STATS = ('count', 'min', 'max', 'mean', 'p50', 'p95')
+
+def parse_stats(stats):
+    '''
+    Returns a list of (stat name, percentile or None) for a list of stat names: count, min, max, mean or pNN (i.e: p95, p99.9).
+    '''
+
+    parsed = []
+    for stat in stats:
+        if stat in ('count', 'min', 'max', 'mean'):
+            parsed.append((stat, None))
+            continue
+
+        try:
+            percentile = float(stat[1:]) if stat.startswith('p') else None
+        except ValueError:
+            percentile = None
+        if percentile is None or not 0 <= percentile <= 100:
+            raise Exception('Unknown aggregation stat: {}. Supported Values: [count || min || max || mean || p0 - p100]'.format(stat))
+        parsed.append((stat, percentile))
+
+    return parsed
+
+def get_stats(values, stats, use_numpy=None):
+    '''
+    Returns a dict of the parsed stats (see parse_stats()) of an array('d') of values.
+    Percentiles are linearly interpolated between the closest ranks, as numpy.percentile().
+    '''
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+
+    count = len(values)
+    percentiles = [percentile for _, percentile in stats if percentile is not None]
+
+    if use_numpy:
+        data = numpy.frombuffer(values, dtype=numpy.float64)
+        results = {
+            'count' : count,
+            'min' : float(data.min()),
+            'max' : float(data.max()),
+            'mean' : float(data.mean())
+        }
+        if percentiles:
+            for percentile, value in zip(percentiles, numpy.percentile(data, percentiles)):
+                results[percentile] = float(value)
+
+    else:
+        data = sorted(values) if percentiles else values
+        results = {
+            'count' : count,
+            'min' : data[0] if percentiles else min(data),
+            'max' : data[-1] if percentiles else max(data),
+            'mean' : math.fsum(data) / count
+        }
+        for percentile in percentiles:
+            rank = (count - 1) * percentile / 100
+            lower = int(rank)
+            upper = min(lower + 1, count - 1)
+            results[percentile] = data[lower] + (data[upper] - data[lower]) * (rank - lower)
+
+    return {name : results[percentile if percentile is not None else name] for name, percentile in stats}
+
+class WindowAggregation():
+    '''
+    Tumbling or sliding window aggregation of the numeric fields of message bodies, per key (i.e: (topic, route)).
+
+    ### Parameters
+
+    **window**: float
+
+        Window length in secs.
+
+    **slide**: float (Optional) Default=window
+
+        Secs between the end of consecutive windows. Equal to window for tumbling windows,
+        less than window for sliding windows that overlap.
+
+    **fields**: list (Optional)
+
+        Message body fields to aggregate. If None, all top level int and float fields of the message body.
+
+    **stats**: list (Optional) Default=['count', 'min', 'max', 'mean', 'p50', 'p95']
+
+        Stats to summarise each field with: count, min, max, mean or pNN percentiles.
+
+    **max_readings**: int (Optional) Default=1000000
+
+        Max values held per key and field, further values in the window are dropped and counted.
+    '''
+
+    def __init__(self, window, slide=None, fields=None, stats=None, max_readings=1000000):
+
+        if window <= 0:
+            raise Exception('Aggregation window must be greater than zero. Received: {}'.format(window))
+
+        slide = slide if slide else window
+        if not 0 < slide <= window:
+            raise Exception('Aggregation slide must be greater than zero and not more than the window of {}. Received: {}'.format(window, slide))
+
+        self.window = window
+        self.slide = slide
+        self.fields = list(fields) if fields else None
+        self.stats = parse_stats(stats if stats else DEFAULT_STATS)
+        self.max_readings = max_readings
+
+        # Key: [next window end, message timestamps array, {field: (timestamps array, values array)}]
+        self._keys = {}
+
+        # Counters
+        self.readings = 0
+        self.summaries = 0
+        self.dropped = 0
+
+    def add(self, key, body, now):
+        '''
+        Adds the numeric fields of a message body to the windows of the key. Not thread safe, the MessageAggregator serialises access.
+        now is clamped to the last reading of the key so the timestamp arrays stay sorted if the clock steps back.
+        '''
+
+        if not isinstance(body, dict):
+            self.dropped += 1
+            return
+
+        state = self._keys.get(key)
+        if state is None:
+            state = [self.get_next_window_end(now), array('d'), {}]
+            self._keys[key] = state
+        elif state[1] and now < state[1][-1]:
+            now = state[1][-1]
+
+        field_values = state[2]
+        for field in self.fields if self.fields else body:
+            value = body.get(field)
+            # bool is an int subclass, but isn't a reading.
+            if value is None or value.__class__ not in (float, int):
+                continue
+
+            readings = field_values.get(field)
+            if readings is None:
+                readings = field_values[field] = (array('d'), array('d'))
+            elif len(readings[1]) >= self.max_readings:
+                self.dropped += 1
+                continue
+
+            readings[0].append(now)
+            readings[1].append(value)
+
+        state[1].append(now)
+        self.readings += 1
+
+    def get_next_window_end(self, now):
+        '''
+        Returns the end of the next window to complete after now, aligned to a multiple of slide secs since the epoch.
+        '''
+
+        return (math.floor(now / self.slide) + 1) * self.slide
+
+    def get_summaries(self, now):
+        '''
+        Returns a list of (key, summary dict) of the windows that ended by now and drops the readings no longer in any window.
+        Windows without readings aren't summarised.
+        '''
+
+        summaries = []
+        for key in list(self._keys):
+            state = self._keys[key]
+            while state[0] <= now:
+                window_end = state[0]
+                window_start = window_end - self.window
+
+                summary_fields = {}
+                for field, (timestamps, values) in state[2].items():
+                    lower = bisect.bisect_left(timestamps, window_start)
+                    upper = bisect.bisect_left(timestamps, window_end)
+                    if upper > lower:
+                        window_values = values if (lower, upper) == (0, len(values)) else values[lower:upper]
+                        summary_fields[field] = get_stats(window_values, self.stats)
+
+                message_timestamps = state[1]
+                count = bisect.bisect_left(message_timestamps, window_end) - bisect.bisect_left(message_timestamps, window_start)
+                if count:
+                    summaries.append((key, {
+                        'window_start' : window_start,
+                        'window_end' : window_end,
+                        'count' : count,
+                        'fields' : summary_fields
+                    }))
+                    self.summaries += 1
+
+                # Drop the readings before the start of the next window.
+                state[0] = window_end + self.slide
+                next_start = state[0] - self.window
+                del message_timestamps[:bisect.bisect_left(message_timestamps, next_start)]
+                for field in list(state[2]):
+                    timestamps, values = state[2][field]
+                    drop = bisect.bisect_left(timestamps, next_start)
+                    if drop == len(timestamps):
+                        del state[2][field]
+                    elif drop:
+                        del timestamps[:drop]
+                        del values[:drop]
+
+                if not message_timestamps:
+                    # Idle key, removed until its next reading.
+                    del self._keys[key]
+                    break
+
+        return summaries
+
+class MessageAggregator():
+    '''
+    Aggregates SDK formatted messages published to aggregated routes and calls on_summary with each window summary
+    from a background thread at the end of each window.
+
+    ### Parameters
+
+    **on_summary**: function
+
+        Called with (aggregation config dict, topic, route, summary dict) for each window summary.
+    '''
+
+    def __init__(self, on_summary):
+
+        self.on_summary = on_summary
+
+        # Route: aggregation config dict with the WindowAggregation.
+        self.routes = {}
+
+        self._lock = threading.Lock()
+        self._routes_updated = threading.Condition(self._lock)
+        self._thread = None
+        self._is_closed = False
+
+        # Last aggregation time and the monotonic time it was taken, see _get_time().
+        self._last_time = 0
+        self._last_monotonic = time.monotonic()
+
+    def set_aggregation(self, route, config):
+        '''
+        Sets (or with config None removes) the aggregation config of a route. The config dict holds the
+        'aggregation' WindowAggregation, the 'protocol' aggregated, the 'topic' aggregated (None for all topics)
+        and 'raw_ipc', True to publish the raw messages to IPC.
+        '''
+
+        with self._lock:
+            if config is None:
+                self.routes.pop(route, None)
+            else:
+                self.routes[route] = config
+
+            if self._thread is None and self.routes:
+                self._thread = threading.Thread(target=self._publish_summaries, name='MessageAggregator', daemon=True)
+                self._thread.start()
+            self._routes_updated.notify()
+
+    def add(self, protocol, topic, message):
+        '''
+        Aggregates an SDK formatted message dict if its route and topic are aggregated on the protocol.
+        Returns a tuple of the (aggregated protocol or None, protocol to still publish the raw message to or None).
+        '''
+
+        config = self.routes.get(message.get('route'))
+        if config is None or (config['topic'] is not None and config['topic'] != topic):
+            return None, protocol
+
+        legs = ['ipc', 'mqtt'] if protocol == 'ipc_mqtt' else [protocol]
+        aggregated = config['protocol']
+        if aggregated not in legs:
+            return None, protocol
+
+        with self._lock:
+            config['aggregation'].add((topic, message['route']), message['message'], self._get_time())
+
+        legs.remove(aggregated)
+        if config['raw_ipc'] and 'ipc' not in legs and aggregated != 'ipc':
+            legs.append('ipc')
+
+        return aggregated, legs[0] if len(legs) == 1 else ('ipc_mqtt' if legs else None)
+
+    def flush(self, now=None):
+        '''
+        Calls on_summary with the summaries of the windows ended by now (default: the current aggregation time).
+        '''
+
+        with self._lock:
+            now = now if now is not None else self._get_time()
+            summaries = [(config, key, summary) for config in self.routes.values() for key, summary in config['aggregation'].get_summaries(now)]
+
+        for config, (topic, route), summary in summaries:
+            try:
+                self.on_summary(config, topic, route, summary)
+            except Exception as err:
+                log.error('Exception publishing message aggregation summary. ERROR: {} - ROUTE: {} - TOPIC: {}'.format(err, route, topic))
+
+    def get_stats(self):
+        '''
+        Returns a dict by route of the readings aggregated, summaries and dropped readings counts and keys active.
+        '''
+
+        with self._lock:
+            return {route : {
+                'readings' : config['aggregation'].readings,
+                'summaries' : config['aggregation'].summaries,
+                'dropped' : config['aggregation'].dropped,
+                'keys' : len(config['aggregation']._keys)
+            } for route, config in self.routes.items()}
+
+    def _get_time(self):
+        '''
+        Returns time.time() unless the wall clock stepped back since the last call, then the last time plus the
+        monotonic secs elapsed so windows keep ending in order until the wall clock catches up. Must hold the lock.
+        '''
+
+        monotonic = time.monotonic()
+        now = max(time.time(), self._last_time + monotonic - self._last_monotonic)
+        self._last_time = now
+        self._last_monotonic = monotonic
+        return now
+
+    def close(self):
+        '''
+        Stops the summary thread, windows not yet ended aren't summarised.
+        '''
+
+        with self._lock:
+            self._is_closed = True
+            self._routes_updated.notify()
+
+    def _publish_summaries(self):
+
+        while True:
+            with self._lock:
+                if self._is_closed:
+                    return
+                now = self._get_time()
+                next_end = min((config['aggregation'].get_next_window_end(now) for config in self.routes.values()), default=None)
+                if next_end is None:
+                    self._routes_updated.wait()
+                    continue
+                if self._routes_updated.wait(next_end - now):
+                    # Routes updated, recalculate the next window end.
+                    continue
+
+            self.flush()
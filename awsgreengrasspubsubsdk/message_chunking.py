@@ -0,0 +1,402 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Chunked transfer of messages larger than the protocol max payload (i.e: the AWS IoT Core 128KB MQTT limit).
+
+The MessageChunker splits the encoded message body (the raw bytes of a bytes body or the JSON of any other body)
+into sequenced chunk messages that each carry the message header fields, a chunk header field and a Base64 slice
+of the encoded body:
+
+```
+"chunk": {"id": "<chunk transfer ID>", "seq": 0, "count": 12, "encoding": "json"}
+```
+
+Chunks are published pipelined with a bounded number of publishes in flight. The receiving ChunkReassembler
+collects the chunks of each message in a bounded reassembly buffer and routes the reassembled message once all
+chunks are received. Incomplete messages are dropped after a timeout or when the buffer is full. Message handlers
+of stream routes are instead dispatched on the first chunk with a ChunkStream that iterates over the encoded body
+as its chunks are received.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import json
+import time
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from awsgreengrasspubsubsdk.pubsub_message import PubSubMessage
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+# AWS IoT Core max MQTT payload.
+MQTT_MAX_PAYLOAD = 128 * 1024
+
+# Max recently completed or dropped chunk IDs remembered to discard their late or redelivered chunks.
+_MAX_FINISHED_IDS = 4096
+
+class MessageChunker():
+    '''
+    Splits SDK formatted messages into chunk message payloads and publishes them pipelined.
+
+    ### Parameters
+
+    **max_payload**: int (Optional) Default=128KB
+
+        Max encoded payload bytes, larger messages are chunked.
+
+    **window**: int (Optional) Default=8
+
+        Max chunk publishes in flight.
+
+    **id_generator**: Object (Optional)
+
+        Generator of chunk transfer IDs with a next_id() method, i.e: PubSubMessageFormatter.id_generator.
+    '''
+
+    def __init__(self, max_payload=MQTT_MAX_PAYLOAD, window=8, id_generator=None):
+
+        if max_payload <= 0:
+            raise Exception('Message chunking max_payload must be greater than zero. Received: {}'.format(max_payload))
+
+        self.max_payload = max_payload
+        self.window = window
+        self.id_generator = id_generator
+
+        # Counters
+        self.chunked = 0
+        self.chunks = 0
+
+    def get_payloads(self, message):
+        '''
+        Returns a list of the encoded payloads to publish for an SDK formatted message dict. This is the single
+        serialised message if it fits within max_payload, else the chunk message payloads. Messages with a
+        bytes, bytearray or memoryview body are always sent as chunks as they can't be serialised to JSON.
+        '''
+
+        body = message['message']
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            encoding = 'bytes'
+            encoded_body = memoryview(body).cast('B')
+        else:
+            payload = bytes(json.dumps(message), 'utf-8')
+            if len(payload) <= self.max_payload:
+                return [payload]
+            encoding = 'json'
+            encoded_body = memoryview(bytes(json.dumps(body), 'utf-8'))
+
+        header = {key : value for key, value in message.items() if key != 'message'}
+        chunk_id = self.id_generator.next_id() if self.id_generator else '{}-{}'.format(message.get('message_id'), time.time())
+        chunk_size = self._get_chunk_size(header, chunk_id, encoding, len(encoded_body))
+        count = max((len(encoded_body) + chunk_size - 1) // chunk_size, 1)
+
+        payloads = []
+        for seq in range(count):
+            # The chunk header field must precede the message body to be read without parsing it.
+            header['chunk'] = {'id' : chunk_id, 'seq' : seq, 'count' : count, 'encoding' : encoding}
+            header['message'] = base64.b64encode(encoded_body[seq * chunk_size:(seq + 1) * chunk_size]).decode('ascii')
+            payload = bytes(json.dumps(header), 'utf-8')
+            if len(payload) > self.max_payload:
+                raise Exception('Message chunk of {} bytes exceeds max_payload of {} bytes. MESSAGE ID: {}'.format(len(payload), self.max_payload, message.get('message_id')))
+            payloads.append(payload)
+
+        self.chunked += 1
+        self.chunks += count
+        return payloads
+
+    def _get_chunk_size(self, header, chunk_id, encoding, body_size):
+        '''
+        Returns the max encoded body bytes per chunk that fit in max_payload after Base64 encoding and the
+        serialised message header. The header is measured with the largest chunk seq and count values possible.
+        '''
+
+        header = dict(header)
+        header['chunk'] = {'id' : chunk_id, 'seq' : body_size, 'count' : body_size, 'encoding' : encoding}
+        header['message'] = ''
+        header_size = len(bytes(json.dumps(header), 'utf-8'))
+
+        chunk_size = (self.max_payload - header_size) // 4 * 3
+        if chunk_size <= 0:
+            raise Exception('Message chunking max_payload of {} bytes is too small for the message header of {} bytes.'.format(self.max_payload, header_size))
+
+        return chunk_size
+
+    def publish_async(self, publish_bytes_async, topic, payloads):
+        '''
+        Publishes the payloads in order with up to window publishes in flight.
+        Returns a Future completed once all are published or with the first publish exception.
+        '''
+
+        future = Future()
+        state = {'next' : 0, 'in_flight' : 0, 'done' : 0, 'is_publishing' : False}
+        lock = threading.Lock()
+
+        def publish_next():
+            # Issues publishes while under the window. Publish futures may complete (and call back into
+            # this) before add_done_callback() returns, so only one caller issues publishes at a time.
+            with lock:
+                if state['is_publishing']:
+                    return
+                state['is_publishing'] = True
+
+            while True:
+                with lock:
+                    if future.done() or state['next'] >= len(payloads) or state['in_flight'] >= self.window:
+                        state['is_publishing'] = False
+                        return
+                    idx = state['next']
+                    state['next'] += 1
+                    state['in_flight'] += 1
+
+                try:
+                    publish_bytes_async(topic, payloads[idx]).add_done_callback(on_published)
+                except Exception as err:
+                    set_exception(err)
+
+        def on_published(publish_future):
+            if publish_future.exception() is not None:
+                set_exception(publish_future.exception())
+                return
+
+            with lock:
+                state['in_flight'] -= 1
+                state['done'] += 1
+                is_complete = state['done'] == len(payloads)
+
+            if is_complete:
+                with lock:
+                    if future.done():
+                        return
+                    future.set_result(None)
+            else:
+                publish_next()
+
+        def set_exception(err):
+            with lock:
+                if future.done():
+                    return
+                future.set_exception(err)
+
+        publish_next()
+        return future
+
+class ChunkStream():
+    '''
+    Iterator over the encoded message body (bytes) of a chunked message as its chunks are received, passed to
+    message handlers of stream routes in place of the message body. Iterating waits up to the reassembly timeout
+    for each next chunk and raises an Exception if it isn't received.
+
+    For JSON message bodies, the iterated bytes are the JSON encoded message body.
+    '''
+
+    def __init__(self, count, encoding, timeout):
+
+        self.count = count
+        self.encoding = encoding
+        self.timeout = timeout
+
+        self._chunks = {}
+        self._next_seq = 0
+        self._available = threading.Condition()
+
+    def __iter__(self):
+
+        while self._next_seq < self.count:
+            with self._available:
+                if not self._available.wait_for(lambda: self._next_seq in self._chunks, self.timeout):
+                    raise Exception('Timeout waiting for message chunk {} of {}.'.format(self._next_seq, self.count))
+                data = self._chunks.pop(self._next_seq)
+                self._next_seq += 1
+            yield data
+
+    def _put(self, seq, data):
+
+        with self._available:
+            if seq >= self._next_seq:
+                self._chunks[seq] = data
+                self._available.notify()
+
+class ChunkReassembler():
+    '''
+    Reassembles received chunk messages in a bounded reassembly buffer.
+
+    ### Parameters
+
+    **max_bytes**: int (Optional) Default=32MB
+
+        Max bytes of incomplete messages held, the oldest incomplete messages are dropped to make room.
+
+    **timeout**: float (Optional) Default=30
+
+        Secs from receiving the first chunk of a message before the incomplete message is dropped.
+
+    **stream_routes**: list (Optional)
+
+        Message routes whose handlers are passed a ChunkStream on receiving the first chunk.
+
+    **max_streams**: int (Optional)
+
+        Max streams dispatched before all their chunks are received. Each holds a message processing worker
+        while later chunks need another worker to be added, so this must be less than the message workers.
+        Further stream route messages are reassembled in the buffer and passed a ChunkStream of all chunks once complete.
+        If None, streams are unlimited.
+    '''
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, timeout=30, stream_routes=None, max_streams=None):
+
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.stream_routes = set(stream_routes) if stream_routes else set()
+        self.max_streams = max_streams
+
+        # (protocol, chunk ID): [started, chunks by seq, bytes held, ChunkStream or None, chunk count] in the order first received.
+        self._messages = OrderedDict()
+        self._bytes = 0
+        self._active_streams = 0
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.reassembled = 0
+        self.streamed = 0
+        self.timed_out = 0
+        self.evicted = 0
+
+    def add(self, protocol, message):
+        '''
+        Adds a received chunk message (LazyPubSubMessage). Returns the reassembled PubSubMessage once all chunks
+        are received, a PubSubMessage with a ChunkStream body on the first chunk of a stream route, else None.
+        '''
+
+        chunk = message.header['chunk']
+        key = (protocol, chunk['id'])
+        seq, count, encoding = chunk['seq'], chunk['count'], chunk['encoding']
+        data = base64.b64decode(message.message)
+
+        now = time.monotonic()
+        dispatch = None
+        with self._lock:
+            self._drop_timed_out(now)
+
+            entry = self._messages.get(key)
+            if entry is None:
+                if key in self._finished:
+                    # Late or redelivered chunk of a message already completed or dropped.
+                    return None
+                stream = None
+                if message.route in self.stream_routes and (self.max_streams is None or self._active_streams < self.max_streams):
+                    stream = ChunkStream(count, encoding, self.timeout)
+                    self._active_streams += 1
+                    self.streamed += 1
+                    dispatch = stream
+                entry = [now, {}, 0, stream, count]
+                self._messages[key] = entry
+
+            if seq in entry[1] or seq >= count:
+                # Duplicate (i.e: QoS 1 redelivery) or invalid chunk.
+                return None
+
+            stream = entry[3]
+            if stream:
+                # Only the chunk seqs are held for streams, the data is passed to the stream.
+                entry[1][seq] = True
+            else:
+                entry[1][seq] = data
+                entry[2] += len(data)
+                self._bytes += len(data)
+                self._evict(key)
+
+            # The message may have been evicted to make room for this chunk.
+            is_complete = len(entry[1]) == count and key in self._messages
+            if is_complete:
+                self._remove(key)
+
+        if stream:
+            stream._put(seq, data)
+            if dispatch is None:
+                return None
+            body = dispatch
+
+        elif is_complete and message.route in self.stream_routes:
+            # Stream route message buffered over max_streams, the stream handler won't wait for any chunk.
+            body = ChunkStream(count, encoding, self.timeout)
+            for idx in range(count):
+                body._put(idx, entry[1][idx])
+            with self._lock:
+                self.streamed += 1
+
+        elif is_complete:
+            encoded_body = b''.join(entry[1][idx] for idx in range(count))
+            body = encoded_body if encoding == 'bytes' else json.loads(encoded_body)
+            with self._lock:
+                self.reassembled += 1
+
+        else:
+            return None
+
+        return PubSubMessage(message.sdk_version, message.message_id, message.status, message.route, body, message.expires_at, message.trace, message.is_reply)
+
+    def get_stats(self):
+        '''
+        Returns a dict of messages reassembled, streamed, timed out and evicted and the incomplete messages and bytes held.
+        '''
+
+        with self._lock:
+            return {
+                'reassembled' : self.reassembled,
+                'streamed' : self.streamed,
+                'timed_out' : self.timed_out,
+                'evicted' : self.evicted,
+                'incomplete' : len(self._messages),
+                'bytes' : self._bytes
+            }
+
+    def _remove(self, key):
+        '''
+        Removes an entry from the reassembly buffer. Must hold the lock.
+        '''
+
+        entry = self._messages.pop(key)
+        self._bytes -= entry[2]
+        if entry[3] is not None:
+            self._active_streams -= 1
+
+        self._finished[key] = True
+        if len(self._finished) > _MAX_FINISHED_IDS:
+            self._finished.popitem(last=False)
+
+        return entry
+
+    def _drop_timed_out(self, now):
+        '''
+        Drops the incomplete messages first received more than timeout secs ago. Must hold the lock.
+        '''
+
+        while self._messages:
+            key, entry = next(iter(self._messages.items()))
+            if now - entry[0] < self.timeout:
+                return
+            self._remove(key)
+            self.timed_out += 1
+            log.warning('Dropped incomplete chunked message after timeout. Received {} of {} chunks. CHUNK ID: {}'.format(len(entry[1]), entry[4], key[1]))
+
+    def _evict(self, current_key):
+        '''
+        Drops the oldest incomplete messages while the buffer is over max_bytes. Must hold the lock.
+        '''
+
+        while self._bytes > self.max_bytes and self._messages:
+            key = next(iter(self._messages))
+            self._remove(key)
+            self.evicted += 1
+            log.warning('Dropped incomplete chunked message, reassembly buffer full. CHUNK ID: {}'.format(key[1]))
+            if key == current_key:
+                return
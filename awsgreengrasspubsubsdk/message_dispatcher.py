@@ -0,0 +1,445 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Priority dispatcher for processing received PubSub messages.
+
+Replaces a single FIFO ThreadPoolExecutor with priority lanes so control plane
+messages (i.e: health checks or reboot commands) are dispatched ahead of bulk
+telemetry. A number of reserved workers only process high priority messages so
+high priority latency stays bounded even when all other workers are busy.
+
+With min_workers set, the number of general workers is autoscaled between min_workers and
+max_workers from the observed handler concurrency, latency and queue depth of each scale interval.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+# Message priority classes, lower values are dispatched first.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+_priority_names = {
+    'high' : PRIORITY_HIGH,
+    'normal' : PRIORITY_NORMAL,
+    'low' : PRIORITY_LOW
+}
+
+# Queue wait and dequeue time of the message being processed by each worker thread.
+_worker_state = threading.local()
+
+def get_queue_timing():
+    '''
+    Returns a tuple of the (secs waited in the dispatch queue, time.monotonic() taken from the queue) of the 
+    message being processed by the calling worker thread or (0, None) if not called from a PriorityDispatcher worker.
+    '''
+    return getattr(_worker_state, 'queue_wait', 0), getattr(_worker_state, 'dequeued_at', None)
+
+def get_priority(priority):
+    '''
+    Returns the priority class for a priority name ('high', 'normal' or 'low') or value.
+    '''
+
+    if priority in _priority_names:
+        return _priority_names[priority]
+
+    if priority in _priority_names.values():
+        return priority
+
+    raise Exception('Unknown message priority: {}. Supported Values: [high || normal || low]'.format(priority))
+
+class PriorityDispatcher():
+    '''
+    Executor with priority lanes that is a drop-in for the ThreadPoolExecutor submit() / shutdown() calls.
+
+    Worker threads are started on demand up to max_workers general workers that take the highest
+    priority message waiting, plus reserved_workers that only take high priority messages.
+
+    ### Parameters
+
+    **max_workers**: int (Optional) Default=min(32, os.cpu_count() + 4)
+
+        Max general worker threads.
+
+    **reserved_workers**: int (Optional) Default=1
+
+        Worker threads reserved for high priority messages, in addition to max_workers.
+
+    **classifier**: function (Optional)
+
+        Called as classifier(*args) with the args of each submit() without an explicit
+        priority and returns the priority class for it. Defaults to PRIORITY_NORMAL.
+
+    **expiry_check**: function (Optional)
+
+        Called as expiry_check(queued_secs, *args) with the secs a message waited in the queue and 
+        the args of its submit() when a worker takes it. Returns True to drop the expired message 
+        without processing it, its future is cancelled.
+
+    **min_workers**: int (Optional)
+
+        If set, autoscale the general workers between min_workers and max_workers. Each scale_interval the
+        workers needed is the average handler concurrency over the interval / target_utilisation, plus the workers
+        to process any queued messages within the next interval at the observed handler latency.
+        Workers are added as soon as more are needed and removed once fewer are needed for scale_down_intervals
+        consecutive intervals. If None, workers are started on demand up to max_workers and kept.
+
+    **scale_interval**: float (Optional) Default=1.0
+
+        Secs between autoscaling evaluations.
+
+    **scale_down_intervals**: int (Optional) Default=3
+
+        Consecutive intervals fewer workers are needed before scaling down.
+
+    **target_utilisation**: float (Optional) Default=0.75
+
+        Target fraction of time each worker is busy.
+    '''
+
+    def __init__(self, max_workers=None, reserved_workers=1, classifier=None, expiry_check=None, 
+                 min_workers=None, scale_interval=1.0, scale_down_intervals=3, target_utilisation=0.75):
+
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+        if min_workers is not None and not 1 <= min_workers <= max_workers:
+            raise Exception('Message dispatcher min_workers must be between 1 and max_workers: {}. Received: {}'.format(max_workers, min_workers))
+
+        self.max_workers = max_workers
+        self.reserved_workers = reserved_workers
+        self.classifier = classifier
+        self.expiry_check = expiry_check
+
+        # Count of queued messages dropped by the expiry_check.
+        self.expired = 0
+
+        # Autoscaling config and the current max general workers.
+        self.min_workers = min_workers
+        self.is_autoscaling = min_workers is not None and min_workers < max_workers
+        self.scale_interval = scale_interval
+        self.scale_down_intervals = scale_down_intervals
+        self.target_utilisation = target_utilisation
+        self.workers = min_workers if self.is_autoscaling else max_workers
+
+        # Autoscaling observations of the current interval and scaling events.
+        self._interval_started = time.monotonic()
+        self._interval_submitted = 0
+        self._interval_completed = 0
+        self._interval_busy = 0
+        self._interval_queue_wait = 0
+        self._scale_down_count = 0
+        self.scale_ups = 0
+        self.scale_downs = 0
+        self.scaling_events = deque(maxlen=100)
+
+        # One FIFO lane per priority class.
+        self._lanes = [deque(), deque(), deque()]
+
+        self._lock = threading.Lock()
+        self._general_available = threading.Condition(self._lock)
+        self._reserved_available = threading.Condition(self._lock)
+
+        self._threads = []
+        self._general_threads = 0
+        self._reserved_threads = 0
+        self._general_idle = 0
+        self._reserved_idle = 0
+        self._is_shutdown = False
+
+    def submit(self, fn, *args, priority=None, **kwargs):
+        '''
+        Queues fn(*args, **kwargs) for dispatch and returns a concurrent.futures.Future of the result.
+        '''
+
+        if priority is None:
+            priority = self.classifier(*args) if self.classifier else PRIORITY_NORMAL
+
+        future = Future()
+        with self._lock:
+            if self._is_shutdown:
+                raise RuntimeError('Cannot submit to PriorityDispatcher after shutdown.')
+
+            now = time.monotonic()
+            if self.is_autoscaling and now - self._interval_started >= self.scale_interval:
+                self._evaluate_scaling(now)
+
+            self._lanes[priority].append((future, fn, args, kwargs, now))
+            self._interval_submitted += 1
+            self._wake_worker(priority)
+
+        return future
+
+    def set_expiry_check(self, expiry_check):
+        '''
+        Sets the function called to drop expired messages when taken from the queue, None to disable.
+        '''
+        self.expiry_check = expiry_check
+
+    def get_queue_depths(self):
+        '''
+        Returns a dict of the number of messages waiting in each priority lane.
+        '''
+
+        with self._lock:
+            return {name : len(self._lanes[priority]) for name, priority in _priority_names.items()}
+
+    def get_worker_stats(self):
+        '''
+        Returns a dict of the current max general workers, the general and reserved worker threads running 
+        and busy, the autoscaling bounds and counts of scale ups and downs and a list of recent scaling events.
+        '''
+
+        with self._lock:
+            return {
+                'workers' : self.workers,
+                'min_workers' : self.min_workers if self.is_autoscaling else self.max_workers,
+                'max_workers' : self.max_workers,
+                'general_threads' : self._general_threads,
+                'general_busy' : self._general_threads - self._general_idle,
+                'reserved_threads' : self._reserved_threads,
+                'queued' : sum(len(lane) for lane in self._lanes),
+                'scale_ups' : self.scale_ups,
+                'scale_downs' : self.scale_downs,
+                'scaling_events' : list(self.scaling_events)
+            }
+
+    def shutdown(self, wait=True):
+        '''
+        Stops accepting new messages and stops workers once queued messages are processed.
+        '''
+
+        with self._lock:
+            self._is_shutdown = True
+            self._general_available.notify_all()
+            self._reserved_available.notify_all()
+            threads = list(self._threads)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _wake_worker(self, priority):
+        '''
+        Wakes or starts a worker to take a newly queued message. Must hold the lock.
+        '''
+
+        if self._general_idle:
+            self._general_idle -= 1
+            self._general_available.notify()
+
+        elif priority == PRIORITY_HIGH and self._reserved_idle:
+            self._reserved_idle -= 1
+            self._reserved_available.notify()
+
+        elif self._general_threads < self.workers:
+            self._general_threads += 1
+            self._start_worker(False)
+
+        elif priority == PRIORITY_HIGH and self._reserved_threads < self.reserved_workers:
+            self._reserved_threads += 1
+            self._start_worker(True)
+
+    def _start_worker(self, is_reserved):
+
+        thread = threading.Thread(target=self._worker, args=(is_reserved,), daemon=True,
+            name='PriorityDispatcher-{}-{}'.format('reserved' if is_reserved else 'general',
+                self._reserved_threads if is_reserved else self._general_threads))
+
+        self._threads.append(thread)
+        thread.start()
+
+    def _next_item(self, is_reserved):
+        '''
+        Returns the next queued message for a worker or None if there are none it can take. Must hold the lock.
+        '''
+
+        if is_reserved:
+            lanes = self._lanes[:1]
+        else:
+            lanes = self._lanes
+
+        for lane in lanes:
+            if lane:
+                return lane.popleft()
+
+        return None
+
+    def _evaluate_scaling(self, now):
+        '''
+        Sets the general workers needed from the observations of the interval just ended. Must hold the lock.
+        '''
+
+        elapsed = now - self._interval_started
+        queued = sum(len(lane) for lane in self._lanes)
+        latency = self._interval_busy / self._interval_completed if self._interval_completed else None
+
+        # Workers to keep the average concurrency at the target utilisation.
+        concurrency = self._interval_busy / elapsed
+        needed = math.ceil(concurrency / self.target_utilisation)
+
+        # Plus the workers to process the queued messages within the next interval.
+        if queued:
+            busy = self._general_threads - self._general_idle
+            backlog = math.ceil(queued * latency / self.scale_interval) if latency else 1
+            needed = max(needed, busy + backlog)
+
+        needed = min(max(needed, self.min_workers), self.max_workers)
+
+        if needed > self.workers:
+            self._scale_down_count = 0
+            self._set_workers(needed, 'up', queued, latency, concurrency)
+
+        elif needed < self.workers and not queued:
+            # Hysteresis, only scale down once fewer workers are needed for consecutive intervals.
+            self._scale_down_count += 1
+            if self._scale_down_count >= self.scale_down_intervals:
+                self._scale_down_count = 0
+                self._set_workers(needed, 'down', queued, latency, concurrency)
+
+        else:
+            self._scale_down_count = 0
+
+        self._interval_started = now
+        self._interval_submitted = 0
+        self._interval_completed = 0
+        self._interval_busy = 0
+        self._interval_queue_wait = 0
+
+    def _set_workers(self, workers, direction, queued, latency, concurrency):
+        '''
+        Sets the max general workers and records the scaling event. Must hold the lock.
+        '''
+
+        self.scaling_events.append({
+            'time' : time.time(),
+            'direction' : direction,
+            'from' : self.workers,
+            'to' : workers,
+            'queued' : queued,
+            'latency_ms' : round(latency * 1000, 3) if latency is not None else None,
+            'concurrency' : round(concurrency, 3)
+        })
+        log.info('Scaling message workers {} from {} to {}. QUEUED: {} - HANDLER LATENCY: {}s - CONCURRENCY: {:.2f}'.format(direction, self.workers, workers, queued, latency, concurrency))
+
+        self.workers = workers
+        if direction == 'up':
+            self.scale_ups += 1
+            # Start workers for the queued messages.
+            for _ in range(min(queued, workers - self._general_threads)):
+                self._general_threads += 1
+                self._start_worker(False)
+        else:
+            self.scale_downs += 1
+            # Idle workers over the new size exit when woken.
+            self._general_idle = 0
+            self._general_available.notify_all()
+
+    def _is_expired(self, queue_wait, args):
+        '''
+        Returns True and counts the message if the expiry_check drops it. Messages are processed if the check raises.
+        '''
+
+        try:
+            if not self.expiry_check(queue_wait, *args):
+                return False
+        except Exception as err:
+            log.error('Exception raised from message expiry check. ERROR: {}'.format(err))
+            return False
+
+        with self._lock:
+            self.expired += 1
+        return True
+
+    def _worker(self, is_reserved):
+
+        available = self._reserved_available if is_reserved else self._general_available
+        is_autoscaling = self.is_autoscaling and not is_reserved
+        handler_secs = None
+
+        while True:
+            with self._lock:
+                if is_autoscaling:
+                    if handler_secs is not None:
+                        self._interval_completed += 1
+                        self._interval_busy += handler_secs
+                        handler_secs = None
+                    if self._exit_surplus_worker():
+                        return
+
+                item = self._next_item(is_reserved)
+                while item is None:
+                    if self._is_shutdown:
+                        return
+
+                    # The idle count is decremented by the thread that notifies this worker.
+                    if is_reserved:
+                        self._reserved_idle += 1
+                    else:
+                        self._general_idle += 1
+
+                    if not is_autoscaling:
+                        available.wait()
+
+                    # Autoscaled idle workers wake each interval to evaluate scaling when no messages are received.
+                    elif not available.wait(self.scale_interval):
+                        # Not notified, so still counted as idle. Clamped as a notify racing the timeout also decrements it.
+                        self._general_idle = max(self._general_idle - 1, 0)
+                        now = time.monotonic()
+                        if now - self._interval_started >= self.scale_interval:
+                            self._evaluate_scaling(now)
+
+                    if is_autoscaling and self._exit_surplus_worker():
+                        return
+                    item = self._next_item(is_reserved)
+
+            future, fn, args, kwargs, queued_at = item
+
+            dequeued_at = time.monotonic()
+            queue_wait = dequeued_at - queued_at
+            if self.expiry_check and self._is_expired(queue_wait, args):
+                future.cancel()
+                continue
+
+            _worker_state.queue_wait = queue_wait
+            _worker_state.dequeued_at = dequeued_at
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as err:
+                future.set_exception(err)
+            else:
+                future.set_result(result)
+
+            if is_autoscaling:
+                handler_secs = time.monotonic() - dequeued_at
+
+    def _exit_surplus_worker(self):
+        '''
+        Returns True and removes the calling general worker if there are more than the current max workers. Must hold the lock.
+        '''
+
+        if self._general_threads <= self.workers:
+            return False
+
+        self._general_threads -= 1
+        self._threads.remove(threading.current_thread())
+        return True
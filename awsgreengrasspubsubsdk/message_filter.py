@@ -0,0 +1,220 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Per subscription sampling and decimation filters for received PubSub messages.
+
+Filters are evaluated on the IPC / MQTT stream thread against the raw received payload
+before it is decoded or submitted for processing, so messages that are filtered out
+never reach the message processing threads. Chunked messages (see message_chunking) are
+filtered as one message on their first chunk and the other chunks follow that decision.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from awsgreengrasspubsubsdk.pubsub_message import PubSubMessage, scan_header, HEADER_SCAN_BYTES
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+# Default max keys the every_nth / max_rate state is held for.
+MAX_FILTER_KEYS = 10000
+
+# Max chunked message IDs the filter decision is held for.
+_MAX_CHUNK_IDS = 4096
+
+class SubscriptionFilter():
+    '''
+    Sampling / decimation filter for messages received on a subscription.
+    A message is accepted only if it passes all of the configured filters.
+
+    ### Parameters
+
+    **every_nth**: int (Optional)
+
+        Accept only every Nth message per key, starting with the first.
+
+    **max_rate**: float (Optional)
+
+        Accept at most max_rate messages per second per key. i.e: max_rate=1 for at most one message per second.
+
+    **key**: str or function (Optional) Default='topic'
+
+        Key the every_nth and max_rate filters are applied per:
+
+        * topic: The received topic (i.e: per topic for MQTT wildcard subscriptions).
+        * route: The message route, scanned from the message header without parsing the message body.
+        * function: Called as key(topic, payload) with the raw received payload and returns the key.
+
+    **topic_predicate**: function (Optional)
+
+        Called as topic_predicate(topic), only messages on topics it returns True for are accepted.
+
+    **max_keys**: int (Optional) Default=10000
+
+        Max keys the every_nth count and max_rate time are held for, the least recently received keys 
+        are dropped (and restart their count) beyond this.
+
+    ### Usage
+
+    ```
+    pubsub_client.subscribe_to_topic('ipc', 'my/sensor/topic', message_filter={'max_rate' : 1, 'key' : 'route'})
+    ```
+    '''
+
+    def __init__(self, every_nth=None, max_rate=None, key='topic', topic_predicate=None, max_keys=MAX_FILTER_KEYS):
+
+        if every_nth is not None and every_nth < 1:
+            raise Exception('Subscription filter every_nth must be 1 or greater. Received: {}'.format(every_nth))
+
+        if max_rate is not None and max_rate <= 0:
+            raise Exception('Subscription filter max_rate must be greater than zero. Received: {}'.format(max_rate))
+
+        if not (key in ['topic', 'route'] or callable(key)):
+            raise Exception('Unknown subscription filter key: {}. Supported Values: [topic || route || function]'.format(key))
+
+        self.every_nth = every_nth
+        self.min_interval = 1 / max_rate if max_rate else None
+        self.key = key
+        self.topic_predicate = topic_predicate
+        self.max_keys = max_keys
+
+        # Message count and last accepted time by key, in least recently received order.
+        self._counts = OrderedDict()
+        self._last_accepted = OrderedDict()
+
+        # Filter decision by chunk ID of chunked messages.
+        self._chunks = OrderedDict()
+
+        # Counters
+        self.received = 0
+        self.filtered = 0
+
+        # Messages are accepted from the subscription stream thread and publishing threads (IPC loopback).
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, message_filter):
+        '''
+        Returns a SubscriptionFilter from a dict of SubscriptionFilter parameters or the given SubscriptionFilter.
+        '''
+
+        if message_filter is None or isinstance(message_filter, SubscriptionFilter):
+            return message_filter
+
+        if isinstance(message_filter, dict):
+            return cls(**message_filter)
+
+        raise Exception('Unsupported message filter: {}. Expected SubscriptionFilter or dict of its parameters.'.format(message_filter))
+
+    def accept(self, topic, payload):
+        '''
+        Returns True if the message should be processed, False if it's filtered out.
+        Thread safe, called from the subscription stream thread and from publishing threads for IPC loopback.
+        '''
+
+        with self._lock:
+            chunk = _get_chunk(payload)
+            if chunk is None:
+                return self._accept(topic, payload)
+
+            # Chunks follow the decision on the first chunk of their message, 
+            # chunks received before it are passed on for reassembly.
+            is_accepted = self._chunks.get(chunk['id'])
+            if is_accepted is None:
+                if chunk['seq'] != 0:
+                    return True
+                is_accepted = self._chunks[chunk['id']] = self._accept(topic, payload)
+                if len(self._chunks) > _MAX_CHUNK_IDS:
+                    self._chunks.popitem(last=False)
+            return is_accepted
+
+    def _accept(self, topic, payload):
+
+        self.received += 1
+
+        if self.topic_predicate and not self.topic_predicate(topic):
+            self.filtered += 1
+            return False
+
+        if self.every_nth or self.min_interval:
+            key = self._get_key(topic, payload)
+
+            if self.every_nth:
+                count = self._counts.pop(key, 0)
+                self._set_key_state(self._counts, key, count + 1)
+                if count % self.every_nth:
+                    self.filtered += 1
+                    return False
+
+            if self.min_interval:
+                now = time.monotonic()
+                last = self._last_accepted.get(key)
+                if last is not None and now - last < self.min_interval:
+                    self._last_accepted.move_to_end(key)
+                    self.filtered += 1
+                    return False
+                self._last_accepted.pop(key, None)
+                self._set_key_state(self._last_accepted, key, now)
+
+        return True
+
+    def get_stats(self):
+        '''
+        Returns a dict of the received and filtered message counts.
+        '''
+
+        return {
+            'received' : self.received,
+            'filtered' : self.filtered
+        }
+
+    def _set_key_state(self, states, key, value):
+        '''
+        Sets the key state as the most recently received and drops the least recently received keys over max_keys. Must hold the lock.
+        '''
+
+        states[key] = value
+        while len(states) > self.max_keys:
+            states.popitem(last=False)
+
+    def _get_key(self, topic, payload):
+
+        if self.key == 'topic':
+            return topic
+
+        if self.key == 'route':
+            # Messages delivered by the client IPC loopback aren't serialised.
+            if isinstance(payload, PubSubMessage):
+                return payload.route
+            scanned = scan_header(payload)
+            return scanned[0].get('route') if scanned else None
+
+        return self.key(topic, payload)
+
+def _get_chunk(payload):
+    '''
+    Returns the chunk header field of a raw chunk message payload, else None. Only payloads 
+    with a chunk field in their header scan prefix are scanned.
+    '''
+
+    if isinstance(payload, (bytes, bytearray)):
+        if payload.find(b'"chunk"', 0, HEADER_SCAN_BYTES) < 0:
+            return None
+    elif isinstance(payload, str):
+        if payload.find('"chunk"', 0, HEADER_SCAN_BYTES) < 0:
+            return None
+    elif not isinstance(payload, memoryview):
+        # i.e: PubSubMessage delivered by IPC loopback, never chunked.
+        return None
+
+    scanned = scan_header(payload)
+    chunk = scanned[0].get('chunk') if scanned else None
+    return chunk if isinstance(chunk, dict) and 'id' in chunk and 'seq' in chunk else None
@@ -10,7 +10,9 @@ __status__ = "Development"
 __copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
 __author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
 
-from datetime import datetime
+import time
+from awsgreengrasspubsubsdk.message_id import MonotonicIdGenerator
+from awsgreengrasspubsubsdk.pubsub_message import PubSubMessage
 
 class PubSubMessageFormatter():
     '''
@@ -22,6 +24,23 @@ class PubSubMessageFormatter():
     '''
     
     sdk_version = __version__
+
+    # Default message_id generator, shared by all formatters and thread safe.
+    id_generator = MonotonicIdGenerator()
+
+    def set_id_generator(self, id_generator):
+        '''
+        Sets the generator of default message_id values for this formatter. 
+        
+        ### Parameters
+
+        **id_generator**: Object
+
+            Any object with a next_id() method that returns a unique message ID. 
+            i.e: message_id.MonotonicIdGenerator (default) or message_id.TimestampIdGenerator 
+            for the legacy %Y%m%d%H%M%S%f timestamp format.
+        '''
+        self.id_generator = id_generator
     
     def get_message(self, **kwargs):
         '''
@@ -29,10 +48,11 @@ class PubSubMessageFormatter():
         
         ### Parameters  
 
-        **message_id** : str, (Optional) Default=Current Timestamp  
+        **message_id** : str, (Optional) Default=Generated ID  
         
             Unique message ID to aid tracking across request / response message patterns. 
-            If None or missing, a current timestamp is generated for this value in the format: %Y%m%d%H%M%S%f
+            If None or missing, a unique time sortable ID is generated by the formatter id_generator. 
+            See message_id.MonotonicIdGenerator.
             
         **status** : int (Optional) Default=200  
         
@@ -49,6 +69,20 @@ class PubSubMessageFormatter():
         
             Dict, Array or any JSON serializable object containing the payload of this message.
             If None or missing, an empty dict is generated for this value.
+
+        **ttl** : float (Optional) Default=None  
+
+            Time to live in secs. Sets the message expires_at to ttl secs from now.
+
+        **expires_at** : float (Optional) Default=None  
+
+            Epoch time in secs after which receiving components drop the message rather than process it. 
+            Only added to the message if ttl or expires_at is given.
+
+        **encode_arrays** : bool (Optional) Default=False  
+
+            If True, array.array and NumPy array values in the message are encoded as compact Base64 typed buffers 
+            rather than needing to be converted to JSON lists. See array_codec.encode_array().
                 
         ### Usage:
 
@@ -60,6 +94,8 @@ class PubSubMessageFormatter():
         ```
         get_message(message={"param01" : "message param01"})
         get_message(message_id=123456, route="health_check_response",  message={"status" : "System OK"})
+        get_message(route="set_valve_position", message={"position" : 50}, ttl=5)
+        get_message(route="process_samples", message={"samples" : array('d', samples)}, encode_arrays=True)
         ```
         
         ### Returns
@@ -80,10 +116,53 @@ class PubSubMessageFormatter():
        
         '''
 
+        message_id, status, route, message = self._get_message_values(kwargs)
+        expires_at = self._get_expires_at(kwargs)
+ 
+        # Return a well formatted PubSub REQUEST
+        retval =  {
+            'sdk_version' : self.sdk_version,
+            'message_id' : message_id,                  # Message Timestamp / ID to track the request flow.
+            'status' : status,                          # Message status code.
+            'route' : route                             # Message handler function name that will process message on receiving system. 
+        }
+
+        # Optional header fields must precede the message body to be read without parsing it.
+        if expires_at is not None:
+            retval['expires_at'] = expires_at           # Epoch secs after which receivers drop the message.
+
+        retval['message'] = message                     # Optional message payload / data object.
+        
+        return retval
+
+    def get_pubsub_message(self, **kwargs):
+        '''
+        Returns a well formatted PubSub Message as a pubsub_message.PubSubMessage object rather than a dict. 
+        
+        Takes the same parameters and applies the same defaults as get_message(). The PubSubMessage 
+        uses less memory than the message dict and can be passed directly to the PubSub client 
+        publish_message() and publish_many() calls.
+        
+        e.g:  
+
+        ```
+        get_pubsub_message(message_id=123456, route="health_check_response",  message={"status" : "System OK"})
+        ```
+        '''
+
+        message_id, status, route, message = self._get_message_values(kwargs)
+        return PubSubMessage(self.sdk_version, message_id, status, route, message, self._get_expires_at(kwargs))
+
+    def _get_message_values(self, kwargs):
+        '''
+        Returns the (message_id, status, route, message) values from the given kwargs with defaults applied. 
+        '''
+
         # Set message_id or default value
-        message_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
         if('message_id' in kwargs and kwargs['message_id']):
             message_id = kwargs['message_id']
+        else:
+            message_id = self.id_generator.next_id()
 
         # Set status or default value
         status = 200
@@ -99,17 +178,26 @@ class PubSubMessageFormatter():
         message = {}
         if('message' in kwargs and kwargs['message']):
             message = kwargs['message'] 
- 
-        # Return a well formatted PubSub REQUEST
-        retval =  {
-            'sdk_version' : self.sdk_version,
-            'message_id' : message_id,                  # Message Timestamp / ID to track the request flow.
-            'status' : status,                          # Message status code.
-            'route' : route,                            # Message handler function name that will process message on receiving system. 
-            'message': message                          # Optional message payload / data object.
-        }
-        
-        return retval
+
+        # Encode array values in the message as typed buffers.
+        if kwargs.get('encode_arrays'):
+            from awsgreengrasspubsubsdk.array_codec import encode_arrays
+            message = encode_arrays(message)
+
+        return message_id, status, route, message
+
+    def _get_expires_at(self, kwargs):
+        '''
+        Returns the message expires_at epoch time from the given ttl or expires_at kwargs or None if neither given.
+        '''
+
+        if kwargs.get('expires_at') is not None:
+            return kwargs['expires_at']
+
+        if kwargs.get('ttl') is not None:
+            return round(time.time() + kwargs['ttl'], 3)
+
+        return None
 
     def get_error_message(self, **kwargs):
         '''
@@ -122,10 +210,10 @@ class PubSubMessageFormatter():
         
         ### Parameters  
 
-        **message_id** : str, (Optional) Default=Current Timestamp  
+        **message_id** : str, (Optional) Default=Generated ID  
         
             Unique message ID to aid tracking across request / response message patterns. 
-            If None or missing, a current timestamp is generated for this value in the format: %Y%m%d%H%M%S%f
+            If None or missing, a unique time sortable ID is generated by the formatter id_generator. 
             
         **message** : Object (preferred Dict), (Optional) default={}  
         
@@ -162,14 +250,5 @@ class PubSubMessageFormatter():
         
         '''
         
-        # Set message_id or default value
-        message_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
-        if('message_id' in kwargs and kwargs['message_id']):
-            message_id = kwargs['message_id']
-            
-        # Set message object or default value  
-        message = {}
-        if('message' in kwargs and kwargs['message']):
-            message = kwargs['message'] 
-        
-        return self.get_message(message_id=message_id, status=500, route='default_error_handler', message=message)
+        # get_message() applies the default message_id and message values if not provided.
+        return self.get_message(message_id=kwargs.get('message_id'), status=500, route='default_error_handler', message=kwargs.get('message'))
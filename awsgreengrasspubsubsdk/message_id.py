@@ -0,0 +1,91 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Message ID generators for the PubSubMessageFormatter default message_id.
+
+Any object with a next_id() method that returns a unique ID can be set as the
+formatter ID generator with PubSubMessageFormatter.set_id_generator().
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import os
+import time
+import random
+import binascii
+import itertools
+from datetime import datetime
+
+# Maps the Base64 alphabet to a URL safe alphabet in ASCII order so encoded IDs sort the same as their value.
+_SORTABLE_BASE64 = bytes.maketrans(
+    b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/', 
+    b'-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz')
+_REVERSE_BASE64 = bytes.maketrans(
+    b'-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz', 
+    b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/')
+
+class MonotonicIdGenerator():
+    '''
+    Thread safe generator of unique, time sortable message IDs (ULID / Snowflake style).
+
+    Each ID is 120 bits encoded as a 20 character URL safe, sortable Base64 string of:
+
+    * 48 bit millisecond timestamp: Wall clock time at generator start advanced by a monotonic clock
+      so IDs never go backwards when the system clock is adjusted.
+
+    * 48 bit node ID: Random per process (and re-generated in forked child processes) so
+      IDs are unique across threads and processes on the device.
+
+    * 24 bit counter: Process wide sequence, unique for up to 16M IDs generated within the same millisecond.
+
+    IDs sort by generation time and IDs generated by the same thread are strictly increasing. 
+    No locks are taken, the counter is an atomic itertools.count().
+    '''
+
+    def __init__(self):
+
+        self._epoch_ms = int(time.time() * 1000) - int(time.monotonic() * 1000)
+        self._init_node()
+
+        # Re-generate the node ID in forked child processes so parent and child don't share it.
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._init_node)
+
+    def _init_node(self):
+        self._node_bits = random.SystemRandom().getrandbits(48) << 24
+        self._counter = itertools.count()
+
+    def next_id(self):
+        '''
+        Returns the next unique message ID.
+        '''
+
+        value = ((self._epoch_ms + int(time.monotonic() * 1000)) << 72) | self._node_bits | (next(self._counter) & 0xFFFFFF)
+        return binascii.b2a_base64(value.to_bytes(15, 'big'), newline=False).translate(_SORTABLE_BASE64).decode('ascii')
+
+    @staticmethod
+    def get_timestamp(message_id):
+        '''
+        Returns the millisecond epoch timestamp encoded in a message ID generated by this class.
+        '''
+
+        value = int.from_bytes(binascii.a2b_base64(message_id.encode('ascii').translate(_REVERSE_BASE64)), 'big')
+        return value >> 72
+
+class TimestampIdGenerator():
+    '''
+    Generates message IDs as the current local timestamp in the format: %Y%m%d%H%M%S%f.
+
+    This was the SDK default message ID prior to MonotonicIdGenerator and is provided
+    for backwards compatibility. IDs are not guaranteed unique across threads or processes.
+    '''
+
+    def next_id(self):
+        '''
+        Returns the current timestamp as the message ID.
+        '''
+        return datetime.now().strftime("%Y%m%d%H%M%S%f")
@@ -0,0 +1,272 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Compiles message body schemas registered per message route into validators that
+the PubSub client runs before routing a message to its message handler.
+
+Supported schemas:
+
+* JSON Schema (dict): Validated with the jsonschema library if installed, otherwise
+  with a built in validator supporting the type, enum, const, properties, required,
+  additionalProperties, items, minItems, maxItems, minimum, maximum, minLength and maxLength keywords.
+
+* Dataclass (type): The message body must be a dict with all required fields of the
+  dataclass and values matching the field type annotations.
+
+* Callable: Any function that takes the message body and returns False or raises
+  an exception if the message body is invalid.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import typing
+
+try:
+    import dataclasses
+except ImportError:
+    dataclasses = None
+
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
+_json_types = {
+    'object' : dict,
+    'array' : list,
+    'string' : str,
+    'integer' : int,
+    'number' : (int, float),
+    'boolean' : bool,
+    'null' : type(None)
+}
+
+def compile_schema(schema):
+    '''
+    Compiles the given schema into a validator function that takes a message body
+    and raises a ValueError describing the first failure if it is invalid.
+
+    ### Parameters
+
+    **schema**: dict, dataclass type or callable
+
+        JSON Schema dict, dataclass type or validator function.
+    '''
+
+    if isinstance(schema, dict):
+        if jsonschema is not None:
+            return _compile_jsonschema(schema)
+        return _compile_json_schema(schema, 'message')
+
+    if dataclasses is not None and isinstance(schema, type) and dataclasses.is_dataclass(schema):
+        return _compile_dataclass(schema, 'message')
+
+    if callable(schema):
+        return _compile_callable(schema)
+
+    raise Exception('Unsupported message schema: {}. Expected JSON Schema dict, dataclass or callable.'.format(schema))
+
+###############################################
+# JSON Schema
+
+def _compile_jsonschema(schema):
+    '''
+    Compiles the schema with the installed jsonschema library.
+    '''
+
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+
+    def validate(message):
+        error = jsonschema.exceptions.best_match(validator.iter_errors(message))
+        if error is not None:
+            raise ValueError('message{}: {}'.format(''.join('[{!r}]'.format(item) for item in error.absolute_path), error.message))
+
+    return validate
+
+def _compile_json_schema(schema, path):
+    '''
+    Compiles the built in JSON Schema subset into a list of check functions.
+    '''
+
+    checks = []
+
+    if 'type' in schema:
+        type_names = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        expected = tuple(t for name in type_names for t in (_json_types[name] if isinstance(_json_types[name], tuple) else (_json_types[name],)))
+        # bool is an int subclass so must be excluded unless boolean is expected.
+        allow_bool = 'boolean' in type_names
+        def check_type(value, path):
+            if not isinstance(value, expected) or (isinstance(value, bool) and not allow_bool):
+                raise ValueError('{}: expected type {} but received {}'.format(path, schema['type'], type(value).__name__))
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        enum = schema['enum']
+        def check_enum(value, path):
+            if value not in enum:
+                raise ValueError('{}: {!r} is not one of {}'.format(path, value, enum))
+        checks.append(check_enum)
+
+    if 'const' in schema:
+        const = schema['const']
+        def check_const(value, path):
+            if value != const:
+                raise ValueError('{}: expected {!r}'.format(path, const))
+        checks.append(check_const)
+
+    for keyword, compare, description in (('minimum', lambda v, l: v < l, 'less than minimum'), ('maximum', lambda v, l: v > l, 'greater than maximum')):
+        if keyword in schema:
+            def check_range(value, path, limit=schema[keyword], compare=compare, description=description):
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and compare(value, limit):
+                    raise ValueError('{}: {} is {} {}'.format(path, value, description, limit))
+            checks.append(check_range)
+
+    for keyword, compare, value_type in (('minLength', lambda v, l: v < l, str), ('maxLength', lambda v, l: v > l, str),
+                                         ('minItems', lambda v, l: v < l, list), ('maxItems', lambda v, l: v > l, list)):
+        if keyword in schema:
+            def check_length(value, path, limit=schema[keyword], compare=compare, value_type=value_type, keyword=keyword):
+                if isinstance(value, value_type) and compare(len(value), limit):
+                    raise ValueError('{}: length {} fails {} {}'.format(path, len(value), keyword, limit))
+            checks.append(check_length)
+
+    if 'required' in schema:
+        required = schema['required']
+        def check_required(value, path):
+            if isinstance(value, dict):
+                for field in required:
+                    if field not in value:
+                        raise ValueError('{}: missing required field {!r}'.format(path, field))
+        checks.append(check_required)
+
+    if 'properties' in schema:
+        properties = {name : _compile_json_schema(sub_schema, None) for name, sub_schema in schema['properties'].items()}
+        additional = schema.get('additionalProperties', True)
+        def check_properties(value, path):
+            if isinstance(value, dict):
+                for name, field_value in value.items():
+                    if name in properties:
+                        properties[name](field_value, '{}[{!r}]'.format(path, name))
+                    elif additional is False:
+                        raise ValueError('{}: unexpected field {!r}'.format(path, name))
+        checks.append(check_properties)
+
+    if 'items' in schema and isinstance(schema['items'], dict):
+        items = _compile_json_schema(schema['items'], None)
+        def check_items(value, path):
+            if isinstance(value, list):
+                for idx, item in enumerate(value):
+                    items(item, '{}[{}]'.format(path, idx))
+        checks.append(check_items)
+
+    def validate(value, path=path):
+        for check in checks:
+            check(value, path)
+
+    return validate
+
+###############################################
+# Dataclass
+
+def _compile_dataclass(schema, path):
+    '''
+    Compiles a dataclass into a list of (field name, is required, type check) tuples.
+    '''
+
+    type_hints = typing.get_type_hints(schema)
+    fields = []
+    for field in dataclasses.fields(schema):
+        is_required = field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING
+        fields.append((field.name, is_required, _compile_type_check(type_hints.get(field.name, typing.Any))))
+
+    def validate(message, path=path):
+        if not isinstance(message, dict):
+            raise ValueError('{}: expected object for {} but received {}'.format(path, schema.__name__, type(message).__name__))
+
+        for name, is_required, type_check in fields:
+            if name in message:
+                if type_check:
+                    type_check(message[name], '{}[{!r}]'.format(path, name))
+            elif is_required:
+                raise ValueError('{}: missing required field {!r}'.format(path, name))
+
+    return validate
+
+def _compile_type_check(annotation):
+    '''
+    Returns a type check function for a dataclass field annotation or None if the annotation isn't checked.
+    Supports plain types, nested dataclasses, Optional / Union and List / Dict of these.
+    '''
+
+    if annotation is typing.Any:
+        return None
+
+    if dataclasses is not None and isinstance(annotation, type) and dataclasses.is_dataclass(annotation):
+        return _compile_dataclass(annotation, None)
+
+    origin = getattr(annotation, '__origin__', None)
+
+    if origin is typing.Union:
+        checks = [_compile_type_check(arg) for arg in annotation.__args__]
+        if None in checks:
+            return None
+        def check_union(value, path):
+            for check in checks:
+                try:
+                    check(value, path)
+                    return
+                except ValueError:
+                    pass
+            raise ValueError('{}: {!r} does not match {}'.format(path, value, annotation))
+        return check_union
+
+    if origin in (list, typing.List):
+        item_check = _compile_type_check(annotation.__args__[0]) if getattr(annotation, '__args__', None) else None
+        def check_list(value, path):
+            if not isinstance(value, list):
+                raise ValueError('{}: expected list but received {}'.format(path, type(value).__name__))
+            if item_check:
+                for idx, item in enumerate(value):
+                    item_check(item, '{}[{}]'.format(path, idx))
+        return check_list
+
+    if origin in (dict, typing.Dict):
+        def check_dict(value, path):
+            if not isinstance(value, dict):
+                raise ValueError('{}: expected dict but received {}'.format(path, type(value).__name__))
+        return check_dict
+
+    if annotation is type(None):
+        expected = (type(None),)
+    elif annotation is float:
+        # JSON numbers without a fraction are parsed as int.
+        expected = (int, float)
+    elif isinstance(annotation, type):
+        expected = (annotation,)
+    else:
+        # Unsupported annotation (i.e: TypeVar or forward reference), only checks the field is present.
+        return None
+
+    def check_type(value, path):
+        if not isinstance(value, expected) or (isinstance(value, bool) and bool not in expected):
+            raise ValueError('{}: expected {} but received {}'.format(path, annotation.__name__, type(value).__name__))
+    return check_type
+
+###############################################
+# Callable
+
+def _compile_callable(schema):
+    '''
+    Wraps a user validator function, treating a False return as invalid.
+    '''
+
+    def validate(message):
+        if schema(message) is False:
+            raise ValueError('message failed validation by {}'.format(getattr(schema, '__name__', schema)))
+
+    return validate
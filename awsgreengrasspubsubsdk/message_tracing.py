@@ -0,0 +1,313 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+End to end latency tracing of PubSub messages between components.
+
+When tracing is enabled, published SDK messages carry a trace context header field:
+
+```
+"trace": {"trace_id": "<32 hex>", "span_id": "<16 hex>", "sent_at": <epoch secs>}
+```
+
+The receiving client records a span for each traced message with the time spent in each stage:
+
+* transport_ms: From sent_at to received by this client (across components, so subject to clock differences).
+* queue_wait_ms: Waiting in the message processing queue.
+* decode_ms: Decoding, expiry and schema validation before dispatch to the handler.
+* handler_ms: Running the message handler (and issuing any auto reply).
+
+Messages published from within a message handler continue the trace of the message being
+handled. Spans are exported as OpenTelemetry spans if the opentelemetry-api package is
+installed, else to a LocalSpanLog of recent spans and an optional JSON lines span log file.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import os
+import json
+import time
+import random
+import logging
+import binascii
+import threading
+from collections import deque
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+def _new_id(num_bytes):
+    return binascii.hexlify(os.urandom(num_bytes)).decode('ascii')
+
+class LocalSpanLog():
+    '''
+    Span exporter that holds the most recent spans in memory and optionally appends them to a JSON lines file.
+
+    ### Parameters
+
+    **span_log_file**: str (Optional)
+
+        Path of a file to append each completed span to as a line of JSON.
+
+    **max_spans**: int (Optional) Default=10000
+
+        Max recent spans held in memory.
+    '''
+
+    def __init__(self, span_log_file=None, max_spans=10000):
+
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._file = open(span_log_file, 'a') if span_log_file else None
+
+    def start(self, span, parent):
+        '''
+        Assigns the span ID (and trace ID of a new trace) of a started span.
+        '''
+
+        span['span_id'] = _new_id(8)
+        if span['trace_id'] is None:
+            span['trace_id'] = _new_id(16)
+
+    def end(self, span):
+        '''
+        Records a completed span.
+        '''
+
+        with self._lock:
+            self.spans.append(span)
+            if self._file:
+                self._file.write(json.dumps(span) + '\n')
+                self._file.flush()
+
+    def get_spans(self):
+        '''
+        Returns a list of the recent completed spans.
+        '''
+
+        with self._lock:
+            return list(self.spans)
+
+    def close(self):
+
+        if self._file:
+            self._file.close()
+
+class OpenTelemetrySpanExporter():
+    '''
+    Span exporter that records spans with the OpenTelemetry tracer provider configured by the component.
+    Requires the opentelemetry-api package.
+    '''
+
+    def __init__(self):
+
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer('awsgreengrasspubsubsdk', __version__)
+
+    def start(self, span, parent):
+        '''
+        Starts an OpenTelemetry span as a child of the parent span or of the remote span in the received trace context.
+        '''
+
+        trace = self._trace
+        if parent is not None:
+            context = trace.set_span_in_context(parent['_otel_span'])
+        elif span['trace_id'] is not None:
+            remote_parent = trace.SpanContext(trace_id=int(span['trace_id'], 16), span_id=int(span['parent_span_id'], 16),
+                is_remote=True, trace_flags=trace.TraceFlags(trace.TraceFlags.SAMPLED))
+            context = trace.set_span_in_context(trace.NonRecordingSpan(remote_parent))
+        else:
+            # New trace, parented to any span the component has active.
+            context = None
+
+        kind = trace.SpanKind.PRODUCER if span['kind'] == 'producer' else trace.SpanKind.CONSUMER
+        otel_span = self._tracer.start_span(span['name'], context=context, kind=kind, start_time=int(span['start'] * 1e9))
+
+        span_context = otel_span.get_span_context()
+        span['_otel_span'] = otel_span
+        span['span_id'] = format(span_context.span_id, '016x')
+        span['trace_id'] = format(span_context.trace_id, '032x')
+
+    def end(self, span):
+        '''
+        Sets the span attributes and stage timing events and ends the OpenTelemetry span.
+        '''
+
+        trace = self._trace
+        otel_span = span.pop('_otel_span')
+
+        for key, value in span['attributes'].items():
+            otel_span.set_attribute(key, value)
+
+        for key in ['transport_ms', 'queue_wait_ms', 'decode_ms', 'handler_ms', 'publish_ms']:
+            if key in span:
+                otel_span.set_attribute('pubsub.{}'.format(key), span[key])
+
+        if 'received_at' in span:
+            otel_span.add_event('received', timestamp=int(span['received_at'] * 1e9))
+        if 'dispatched_at' in span:
+            otel_span.add_event('dispatched', timestamp=int(span['dispatched_at'] * 1e9))
+
+        if span.get('error'):
+            otel_span.set_status(trace.Status(trace.StatusCode.ERROR, span['error']))
+
+        otel_span.end(end_time=int(span['end'] * 1e9))
+
+def get_span_exporter(exporter=True, span_log_file=None):
+    '''
+    Returns a span exporter for the given exporter option:
+
+    * True / 'auto': OpenTelemetrySpanExporter if opentelemetry-api is installed, else LocalSpanLog.
+    * 'opentelemetry': OpenTelemetrySpanExporter.
+    * 'local': LocalSpanLog.
+    * Any object with start(span, parent) and end(span) methods.
+    '''
+
+    if exporter is True or exporter == 'auto':
+        try:
+            return OpenTelemetrySpanExporter()
+        except ImportError:
+            return LocalSpanLog(span_log_file)
+
+    if exporter == 'opentelemetry':
+        return OpenTelemetrySpanExporter()
+
+    if exporter == 'local':
+        return LocalSpanLog(span_log_file)
+
+    if hasattr(exporter, 'start') and hasattr(exporter, 'end'):
+        return exporter
+
+    raise Exception('Unknown message tracing exporter: {}. Supported Values: [auto || opentelemetry || local || exporter object]'.format(exporter))
+
+class MessageTracer():
+    '''
+    Adds trace context to published messages and records spans of published and received traced messages.
+
+    ### Parameters
+
+    **exporter**: Object
+
+        Span exporter, i.e: LocalSpanLog or OpenTelemetrySpanExporter. See get_span_exporter().
+
+    **sample_rate**: float (Optional) Default=1.0
+
+        Fraction of new traces started by publishing outside of a traced message handler that are traced.
+        Messages received with trace context and messages published while handling them are always traced.
+    '''
+
+    def __init__(self, exporter, sample_rate=1.0):
+
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+        # Span of the traced message being handled by this thread.
+        self._local = threading.local()
+
+    def get_current_span(self):
+        '''
+        Returns the span of the traced message being handled by the calling thread or None.
+        '''
+        return getattr(self._local, 'span', None)
+
+    def inject(self, message, protocol, topic):
+        '''
+        Returns a tuple of the (message dict with trace context added, started publish span)
+        for an SDK formatted message dict, or the (message, None) if the message isn't sampled.
+        The trace field is added ahead of the message body so it is read from the header without parsing the body.
+        '''
+
+        parent = self.get_current_span()
+        if parent is None and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return message, None
+
+        span = self._start_span('publish {}'.format(message.get('route')), 'producer',
+            parent['trace_id'] if parent else None, parent['span_id'] if parent else None, time.time(), parent,
+            {'messaging.system' : protocol, 'messaging.destination' : topic, 'messaging.message_id' : str(message.get('message_id'))})
+        if span is None:
+            return message, None
+
+        traced = {key : value for key, value in message.items() if key != 'message'}
+        traced['trace'] = {
+            'trace_id' : span['trace_id'],
+            'span_id' : span['span_id'],
+            'sent_at' : round(span['start'], 6)
+        }
+        traced['message'] = message['message']
+        return traced, span
+
+    def start_receive_span(self, protocol, topic, route, message_id, trace_context, queue_wait=0, dequeued_at=None):
+        '''
+        Starts the span of a received traced message when it is dispatched to the message handler
+        and sets it as the calling thread's current span. Returns the span or None if the trace context isn't valid.
+
+        queue_wait and dequeued_at are the message dispatcher queue timing, see message_dispatcher.get_queue_timing().
+        '''
+
+        try:
+            trace_id, parent_span_id, sent_at = trace_context['trace_id'], trace_context['span_id'], trace_context['sent_at']
+        except (TypeError, KeyError):
+            return None
+
+        dispatched_at = time.time()
+        decode = time.monotonic() - dequeued_at if dequeued_at is not None else 0
+        received_at = dispatched_at - decode - queue_wait
+        span = self._start_span(route, 'consumer', trace_id, parent_span_id, received_at, None,
+            {'messaging.system' : protocol, 'messaging.destination' : topic, 'messaging.message_id' : str(message_id)})
+        if span is None:
+            return None
+
+        span['sent_at'] = sent_at
+        span['received_at'] = received_at
+        span['dispatched_at'] = dispatched_at
+        span['transport_ms'] = round((received_at - sent_at) * 1000, 3)
+        span['queue_wait_ms'] = round(queue_wait * 1000, 3)
+        span['decode_ms'] = round(decode * 1000, 3)
+
+        span['_previous_span'] = self.get_current_span()
+        self._local.span = span
+        return span
+
+    def end_span(self, span, error=None):
+        '''
+        Ends a span started by inject() or start_receive_span() and exports it.
+        '''
+
+        span['end'] = time.time()
+        if span['kind'] == 'consumer':
+            span['handler_ms'] = round((span['end'] - span['dispatched_at']) * 1000, 3)
+            self._local.span = span.pop('_previous_span')
+        else:
+            span['publish_ms'] = round((span['end'] - span['start']) * 1000, 3)
+
+        if error is not None:
+            span['error'] = str(error)
+
+        try:
+            self.exporter.end(span)
+        except Exception as err:
+            log.error('Exception exporting message trace span. ERROR: {}'.format(err))
+
+    def _start_span(self, name, kind, trace_id, parent_span_id, start, parent, attributes):
+
+        span = {
+            'name' : name,
+            'kind' : kind,
+            'trace_id' : trace_id,
+            'span_id' : None,
+            'parent_span_id' : parent_span_id,
+            'start' : start,
+            'attributes' : attributes
+        }
+
+        try:
+            self.exporter.start(span, parent)
+        except Exception as err:
+            log.error('Exception starting message trace span. ERROR: {}'.format(err))
+            return None
+
+        return span
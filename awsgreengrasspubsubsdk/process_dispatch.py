@@ -0,0 +1,185 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Multi-process dispatch of message handlers for CPU bound message processing.
+
+Message handlers run in the PubSub client process are limited to about one CPU core
+by the Python GIL. A ProcessHandlerPool runs a message handler class in a pool of worker
+processes, each with its own instance of the handler, so CPU bound handlers scale across cores.
+
+The unparsed message body is sent to the worker which parses it, large message bodies
+are passed in shared memory rather than through the worker pipe. Handler return values
+are returned to the PubSub client process which publishes any reply on its IPC / MQTT connection.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import sys
+import json
+import asyncio
+import inspect
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from awsgreengrasspubsubsdk.pubsub_message import PubSubMessage, LazyPubSubMessage
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8, message bodies are always sent through the worker pipe.
+    shared_memory = None
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+# Message bodies of this many bytes or more are passed to workers in shared memory.
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+# The message handler instance of this worker process.
+_worker_handler = None
+
+class ProcessHandlerPool():
+    '''
+    Pool of worker processes that each hold an instance of a message handler class.
+
+    ### Parameters
+
+    **message_handler**: Object or class
+
+        Message handler instance, pickled once to each worker process, or class
+        that is instantiated with no arguments once in each worker process.
+
+    **max_workers**: int (Optional) Default=os.cpu_count()
+
+        Number of worker processes.
+
+    **shared_memory_threshold**: int (Optional) Default=64KB
+
+        Message bodies of this many bytes or more are passed to workers in shared memory.
+
+    Workers are started with the forkserver start method where available so they don't inherit the
+    client's IPC connection threads. The message handler class must be importable by the worker,
+    a handler class defined in the component main module needs the main module guarded with
+    if __name__ == '__main__'.
+    '''
+
+    def __init__(self, message_handler, max_workers=None, shared_memory_threshold=SHARED_MEMORY_THRESHOLD):
+
+        # ProcessPoolExecutor initializer added in Python 3.7.
+        if sys.version_info < (3, 7):
+            raise Exception('Process message handler workers require Python 3.7 or later.')
+
+        start_methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context('forkserver') if 'forkserver' in start_methods else None
+
+        self.shared_memory_threshold = shared_memory_threshold
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+            initializer=_init_worker, initargs=(message_handler,))
+
+    def call(self, method_name, is_message_object_handler, protocol, topic, message):
+        '''
+        Calls the named message handler function in a worker process and blocks until it returns.
+        Returns the handler return value or raises the handler exception.
+        '''
+
+        header = (message.sdk_version, message.message_id, message.status, message.route)
+        body, shm = self._get_body_ref(message)
+        try:
+            future = self.executor.submit(_call_worker_handler, method_name, is_message_object_handler, protocol, topic, header, body)
+            return future.result()
+
+        finally:
+            if shm:
+                shm.close()
+                shm.unlink()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _get_body_ref(self, message):
+        '''
+        Returns a tuple of the (message body reference to send to the worker, shared memory block or None).
+        The unparsed message body is sent if available, else the parsed message body. Memoryview message 
+        bodies (i.e: claim-check segments) can't be pickled so are copied to the worker as bytes.
+        '''
+
+        encoding = 'json'
+        raw_body = message.get_raw_body() if isinstance(message, LazyPubSubMessage) else None
+        if raw_body is None:
+            if not isinstance(message.message, memoryview):
+                return ('object', message.message), None
+            encoding = 'bytes'
+            raw_body = message.message.cast('B') if message.message.format != 'B' else message.message
+
+        if isinstance(raw_body, str):
+            raw_body = raw_body.encode('utf-8')
+
+        size = len(raw_body)
+        if shared_memory is None or size < self.shared_memory_threshold:
+            return (encoding, bytes(raw_body)), None
+
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = raw_body
+        return ('shared_memory', shm.name, size, encoding), shm
+
+def _init_worker(message_handler):
+    '''
+    Worker process initializer, creates the worker message handler instance.
+    '''
+
+    global _worker_handler
+    _worker_handler = message_handler() if isinstance(message_handler, type) else message_handler
+
+def _load_body(body):
+    '''
+    Returns the message body from the body reference sent by the ProcessHandlerPool.
+    '''
+
+    if body[0] in ('object', 'bytes'):
+        return body[1]
+
+    if body[0] == 'json':
+        return _decoder.raw_decode(str(body[1], 'utf-8'))[0]
+
+    shm = shared_memory.SharedMemory(name=body[1])
+    try:
+        view = shm.buf[:body[2]]
+        try:
+            if body[3] == 'bytes':
+                return bytes(view)
+            text = str(view, 'utf-8')
+        finally:
+            view.release()
+    finally:
+        shm.close()
+
+    return _decoder.raw_decode(text)[0]
+
+def _call_worker_handler(method_name, is_message_object_handler, protocol, topic, header, body):
+    '''
+    Calls the message handler function in the worker process, runs coroutines to completion.
+    '''
+
+    message = _load_body(body)
+    method = getattr(_worker_handler, method_name)
+
+    if is_message_object_handler:
+        result = method(protocol, topic, PubSubMessage(*header, message))
+    else:
+        sdk_version, message_id, status, route = header
+        result = method(protocol, topic, message_id, status, route, message)
+
+    if inspect.isawaitable(result):
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(result)
+        finally:
+            loop.close()
+
+    return result
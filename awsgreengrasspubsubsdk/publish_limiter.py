@@ -0,0 +1,283 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Token bucket rate limiting for the IPC and MQTT publish path.
+
+AWS IoT Core enforces per connection publish rate limits and publishes over the limit
+are throttled and surface as publish exceptions. The PublishRateLimiter smooths bursts
+of publishes to within a global and / or per topic rate before they reach the service.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import time
+import logging
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+# Actions when a publish exceeds the rate limit.
+LIMIT_MODES = ('block', 'queue', 'drop')
+
+class TokenBucket():
+    '''
+    Token bucket that refills at rate tokens per second up to burst tokens. Not thread safe,
+    the PublishRateLimiter serialises access to its buckets.
+
+    ### Parameters
+
+    **rate**: float
+
+        Sustained rate in tokens (publishes) per second.
+
+    **burst**: float (Optional) Default=rate (min 1)
+
+        Max tokens that can accumulate, the largest burst published without delay.
+    '''
+
+    def __init__(self, rate, burst=None):
+
+        if rate <= 0:
+            raise Exception('Publish rate limit must be greater than zero. Received: {}'.format(rate))
+
+        self.rate = rate
+        self.burst = burst if burst else max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def get_wait(self, now):
+        '''
+        Refills the bucket and returns the secs until a token is available (0 if available now).
+        '''
+
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+class PublishRateLimiter():
+    '''
+    Rate limits publishes against a global and per topic token buckets.
+
+    ### Parameters
+
+    **mode**: str (Optional) Default='block'
+
+        Action when a publish exceeds the rate limit:
+
+        * block: The publishing thread waits until the publish is within the rate limit.
+        * queue: The publish is queued and issued from a background thread at the rate limit, in order per topic. 
+          Only publishes over their limits are queued, publishes to topics within their limits aren't delayed 
+          behind them. The publish future completes when the queued publish does.
+        * drop: The publish is discarded and counted, the publish future completes with an Exception.
+
+    **max_queue**: int (Optional) Default=1000
+
+        Max queued publishes in queue mode, publishes beyond this raise an Exception.
+    '''
+
+    def __init__(self, mode='block', max_queue=1000):
+
+        self.global_bucket = None
+        self.topic_buckets = {}
+        self.max_queue = max_queue
+        self.set_mode(mode)
+
+        # Queued publishes by topic, in the order topics are served.
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._queue_available = threading.Condition(self._lock)
+        self._queue_thread = None
+
+        # Counters
+        self.throttled = 0
+        self.dropped = 0
+
+    ###############################################
+    # Setters
+    def set_mode(self, mode):
+
+        if mode not in LIMIT_MODES:
+            raise Exception('Unknown publish rate limit mode: {}. Supported Values: [block || queue || drop]'.format(mode))
+
+        self.mode = mode
+
+    def set_rate_limit(self, rate, burst=None, topic=None):
+        '''
+        Sets the rate limit in publishes per second for the given topic or the global limit if topic is None.
+        Set rate to None to remove the limit.
+        '''
+
+        if burst is not None and burst < 1:
+            raise Exception('Publish rate limit burst must be 1 or greater. Received: {}'.format(burst))
+
+        bucket = TokenBucket(rate, burst) if rate else None
+
+        if topic is None:
+            self.global_bucket = bucket
+        elif bucket:
+            self.topic_buckets[topic] = bucket
+        else:
+            self.topic_buckets.pop(topic, None)
+
+    def get_stats(self):
+        '''
+        Returns a dict of throttled and dropped publish counts and the current queue depth.
+        '''
+
+        with self._lock:
+            return {
+                'throttled' : self.throttled,
+                'dropped' : self.dropped,
+                'queued' : self._queued
+            }
+
+    ###############################################
+    # Rate limited publish
+    def publish(self, topic, publish_async):
+        '''
+        Calls publish_async() within the rate limit for the topic and returns its publish response future.
+        '''
+
+        with self._lock:
+            # Publishes wait behind any already queued to the topic so message order is kept.
+            wait = self._get_wait(topic) if topic not in self._queues else 1
+            if not wait:
+                self._consume(topic)
+
+            elif self.mode == 'drop':
+                self.dropped += 1
+                log.debug('Publish rate limit exceeded, dropping publish to topic: {}'.format(topic))
+                future = Future()
+                future.set_exception(Exception('Publish rate limit exceeded, publish dropped. TOPIC: {}'.format(topic)))
+                return future
+
+            elif self.mode == 'queue':
+                self.throttled += 1
+                return self._enqueue(topic, publish_async)
+
+            else:
+                self.throttled += 1
+                while wait:
+                    self._lock.release()
+                    try:
+                        time.sleep(wait)
+                    finally:
+                        self._lock.acquire()
+                    wait = self._get_wait(topic) if topic not in self._queues else wait
+                self._consume(topic)
+
+        return publish_async()
+
+    def _get_wait(self, topic):
+        '''
+        Returns the secs until the global and topic buckets both have a token. Must hold the lock.
+        '''
+
+        now = time.monotonic()
+        wait = 0
+        if self.global_bucket:
+            wait = self.global_bucket.get_wait(now)
+
+        bucket = self.topic_buckets.get(topic)
+        if bucket:
+            wait = max(wait, bucket.get_wait(now))
+
+        return wait
+
+    def _consume(self, topic):
+
+        if self.global_bucket:
+            self.global_bucket.consume()
+
+        bucket = self.topic_buckets.get(topic)
+        if bucket:
+            bucket.consume()
+
+    def _enqueue(self, topic, publish_async):
+        '''
+        Queues a publish for the queue thread and returns a future for its outcome. Must hold the lock.
+        '''
+
+        if self._queued >= self.max_queue:
+            raise Exception('Publish rate limit queue full. Max Queue: {} - TOPIC: {}'.format(self.max_queue, topic))
+
+        future = Future()
+        queue = self._queues.get(topic)
+        if queue is None:
+            queue = self._queues[topic] = deque()
+        queue.append((publish_async, future))
+        self._queued += 1
+        self._queue_available.notify()
+
+        if self._queue_thread is None:
+            self._queue_thread = threading.Thread(target=self._drain_queue, name='PublishRateLimiter', daemon=True)
+            self._queue_thread.start()
+
+        return future
+
+    def _drain_queue(self):
+        '''
+        Issues queued publishes in order per topic as tokens become available, serving the topics in turn.
+        '''
+
+        while True:
+            ready = []
+            with self._lock:
+                while not self._queues:
+                    self._queue_available.wait()
+
+                wait = None
+                for topic in list(self._queues):
+                    queue = self._queues[topic]
+                    topic_wait = self._get_wait(topic)
+                    if topic_wait:
+                        wait = topic_wait if wait is None else min(wait, topic_wait)
+                        continue
+
+                    self._consume(topic)
+                    ready.append(queue.popleft())
+                    self._queued -= 1
+                    if queue:
+                        self._queues.move_to_end(topic)
+                    else:
+                        del self._queues[topic]
+
+                if not ready:
+                    # Woken early by a publish queued to another topic.
+                    self._queue_available.wait(wait)
+                    continue
+
+            for publish_async, future in ready:
+                try:
+                    _chain_future(publish_async(), future)
+                except Exception as err:
+                    future.set_exception(err)
+
+def _chain_future(source, target):
+    '''
+    Completes the target future with the outcome of the source future.
+    '''
+
+    def on_done(source):
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
+    source.add_done_callback(on_done)
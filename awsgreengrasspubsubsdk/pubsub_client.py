@@ -10,17 +10,24 @@ __status__ = "Development"
 __copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
 __author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
 
-import os, sys, json, inspect, logging
+import os, sys, json, time, inspect, logging, functools, threading
+from collections import OrderedDict
 
-from awsgreengrasspubsubsdk.pubsub_ipc import IpcPubSub
-from awsgreengrasspubsubsdk.pubsub_mqtt import MqttPubSub
+# Start of the SDK import time reported in get_startup_timings().
+_import_started = time.perf_counter()
+
+# The IPC / MQTT clients (and awsiot SDK), message_schema, process_dispatch and asyncio are imported 
+# on first use to keep them off the import path for fast component startup.
 from awsgreengrasspubsubsdk.message_formatter import PubSubMessageFormatter
+from awsgreengrasspubsubsdk.pubsub_message import PubSubMessage, LazyPubSubMessage, scan_header
+from awsgreengrasspubsubsdk.handler_watchdog import HandlerWatchdog
+from awsgreengrasspubsubsdk.publish_limiter import PublishRateLimiter
+from awsgreengrasspubsubsdk.message_filter import SubscriptionFilter
+from awsgreengrasspubsubsdk.pubsub_local import topic_matches
+from awsgreengrasspubsubsdk.message_dispatcher import PriorityDispatcher, PRIORITY_NORMAL, get_priority, get_queue_timing
 
-# Init / Config the logger.
+# Init the logger.
 log = logging.getLogger(__name__)
-logging.basicConfig(format="[%(name)s.%(funcName)s():%(lineno)d] - [%(levelname)s] - %(message)s", 
-                    stream=sys.stdout, 
-                    level=logging.INFO)
 
 class AwsGreengrassPubSubSdkClient():
     '''
@@ -73,6 +80,13 @@ class AwsGreengrassPubSubSdkClient():
         '''
         
         super().__init__()
+
+        construct_started = time.perf_counter()
+
+        # Config the logger on construction rather than on import. No effect if the component already configured logging.
+        logging.basicConfig(format="[%(name)s.%(funcName)s():%(lineno)d] - [%(levelname)s] - %(message)s", 
+                            stream=sys.stdout, 
+                            level=logging.INFO)
         
          #######################################################
         # Set Thing Name and Log the start of the process
@@ -91,11 +105,85 @@ class AwsGreengrassPubSubSdkClient():
         # There are the required paramaters for a method in a registered message_handler class to 
         # be considered as a valid message route by this SDK.
         self.handler_required_params = ['protocol', 'topic', 'message_id', 'status', 'route', 'message']
+        # Alternatively, methods with these parameters are passed the message as a single PubSubMessage object. 
+        self.handler_message_object_params = ['protocol', 'topic', 'pubsub_message']
+        # Routes of message handlers that take a PubSubMessage object.
+        self.message_object_routes = set()
+        self.is_default_handler_message_object = self._is_message_object_handler(default_message_handler)
+        # Compiled message body validators by route.
+        self.message_validators = {}
+
+        # Message handler execution time budgets by route and the watchdog that detects overruns.
+        self.handler_timeouts = {}
+        self.cancel_on_timeout_routes = set()
+        self.default_handler_timeout = None
+        self.handler_watchdog = HandlerWatchdog()
+
+        # Message priority classes by route and by topic and the priority dispatcher 
+        # shared by the IPC and MQTT clients to process received messages.
+        self.route_priorities = {}
+        self.topic_priorities = {}
+        self.message_dispatcher = PriorityDispatcher(classifier=self._get_message_priority)
+
+        # Reply routes of message handlers with auto reply enabled and the topic replies are published to.
+        self.reply_routes = {}
+        self.reply_topic = None
+
+
+        # Max age in secs by route (and default) of received messages waiting to be dispatched 
+        # and counts by stage and route of expired messages dropped.
+        self.route_max_ages = {}
+        self.default_max_age = None
+        self.expired_messages = {'queue' : {}, 'router' : {}}
+        self.expired_lock = threading.Lock()
+
+        # Worker process pool and function name by route of message handlers run in worker processes.
+        self.process_routes = {}
+
+        # Publish rate limiters by protocol.
+        self.publish_rate_limiters = {}
+
+        # IPC loopback mode and the (subscription topic, message ID) of messages delivered by loopback and also published 
+        # to IPC with the count of echoes expected back from IPC for each.
+        self.ipc_loopback = None
+        self.loopback_message_ids = OrderedDict()
+        self.loopback_lock = threading.Lock()
 
         # Set the initial IPC / MQTT activated modes
         self.is_ipc_active = False
         self.is_mqtt_active = False
 
+        # Zero copy receive mode and topic to route mapping for binary (non-JSON) payloads.
+        self.zero_copy_receive = False
+        self.binary_message_routes = {}
+
+        # If True, message handlers receive the message body as a LazyMessageBody that is parsed on first access.
+        self.lazy_message_parsing = False
+
+        # Traffic capture of received and published messages, see set_traffic_capture().
+        self.traffic_capture = None
+
+        # End to end message tracing, see set_message_tracing().
+        self.message_tracer = None
+
+        # Claim-check store of large IPC message bodies published and reader of received claim-check messages.
+        self.claim_check_store = None
+        self.claim_check_reader = None
+        self.claim_check_directory = None
+
+        # Chunking of messages over the protocol max payload, the protocols chunked and reassembler of received chunks.
+        self.message_chunker = None
+        self.chunk_protocols = set()
+        self.chunk_reassembler = None
+
+        # Windowed aggregation of messages published to aggregated routes, see set_message_aggregation().
+        self.message_aggregator = None
+
+        # Decoding of encoded arrays in received message bodies, see set_array_decoding().
+        self.array_decoding = False
+        self.array_decoding_routes = None
+        self.array_decoding_numpy = None
+
         #######################################################
         # Parse SDK config and / or set local topics / parameters to default.
         log.info('Setting SDK Default PubSub Topics...')
@@ -108,19 +196,25 @@ class AwsGreengrassPubSubSdkClient():
         self.egress_topic = '{}/{}/egress'.format(self.base_topic, self.thing_name)
         log.info('Egress topic: {}'.format(self.egress_topic ))
 
+        # Auto reply messages are published to the egress topic by default.
+        self.reply_topic = self.egress_topic
+
         # Set the subscribe topics for the SDK
         self.ipc_subscribe_topics = [self.ingress_topic ]
         self.mqtt_subscribe_topics = [self.ingress_topic ]
-        
-        log.info('Setting SDK Default PubSub Topics Complete.')
 
-        log.info('Initialising PubSub message formats....')
+        # Subscription message filters by protocol and topic.
+        self.message_filters = {'ipc' : {}, 'mqtt' : {}}
         
-        # Build and log test message types for user examples and to validate messages has initialised. 
-        test_request = self.formatter.get_message(message_id=123456, status_code=200, route='default_message_handler', message={"param01" : "message param01"})
-        log.info('Built test Request Message: {}'.format(test_request))
+        log.info('Setting SDK Default PubSub Topics Complete.')
 
-        log.info('Initialising PubSub Message Formats Complete.')
+        # Startup timings in secs, see get_startup_timings().
+        self.construct_started = construct_started
+        self.startup_timings = {
+            'import' : _import_completed - _import_started,
+            'construct' : time.perf_counter() - construct_started
+        }
+        self.is_first_message_received = False
         
         # Completed initialising Greengrass PubSub SDK.
         log.info('Initialising AWS Greengrass V2 PubSub SDK Complete.')
@@ -129,18 +223,91 @@ class AwsGreengrassPubSubSdkClient():
     ### Register message_handler classes to route messages
     ##################################################
 
-    def register_message_handler(self, message_handler_class):
+    def register_message_handler(self, message_handler_class, schemas=None, timeouts=None, cancel_on_timeout=False, priority=None, auto_reply=None, process_workers=None):
         '''
         Registers a message handler class to route messages too.
         A message_handler is any user defined class that contains named functions 
         that this SDK will route messages to based on the route value in the message.
+
+        Message handling functions have the parameters (protocol, topic, message_id, status, route, message) 
+        or (protocol, topic, pubsub_message) to receive the message as a single pubsub_message.PubSubMessage object.
+
+        ### Parameters
+
+        **message_handler_class**: Object
+
+            Instance of the user defined message handler class. 
+            With process_workers, can be the class itself to be instantiated with no arguments in each worker process.
+
+        **schemas**: dict (Optional)
+
+            Dict of message handler function name: schema to validate the message body against before routing. 
+            The schema can be a JSON Schema dict, dataclass or validator function, see message_schema.compile_schema(). 
+            Schemas are compiled once on registration and messages that fail validation are published to the 
+            error topic and never reach the message handler.
+
+            e.g: schemas={'set_sensor_config' : {'type' : 'object', 'required' : ['sensor_id']}}
+
+        **timeouts**: float or dict (Optional)
+
+            Execution time budget in seconds for all message handler functions in the class or a dict of 
+            function name: budget. Handlers running over budget are logged with their route, message_id and 
+            current stack and counted per route, see get_handler_stats().
+
+        **cancel_on_timeout**: bool (Optional) Default=False
+
+            If True, async (coroutine) message handler functions are cancelled when they overrun their budget. 
+            Synchronous handlers can't be cancelled and are only reported.
+
+        **priority**: str or dict (Optional)
+
+            Dispatch priority ('high', 'normal' or 'low') for all message handler functions in the class or 
+            a dict of function name: priority. High priority messages are dispatched ahead of any queued 
+            normal and low priority messages and have reserved worker capacity, see set_message_workers().
+
+            e.g: priority={'health_check_request' : 'high'}
+
+        **auto_reply**: bool or dict (Optional) Default=False
+
+            If True, the value returned by each message handler function is published as the message body of 
+            a reply with the same message_id as the received message and route of the received route + '_response' 
+            (i.e: MyHandler.health_check_request_response), back on the protocol it was received on 
+            to the reply topic (see set_reply_topic()). If the handler raises, an error reply is published with 
+            status=500 and message={'error' : str(err)}. Handlers that return None don't reply and handlers 
+            can return a PubSubMessage to set the reply status and route. Alternatively, a dict of 
+            function name: reply route enables auto reply for just those functions with the given reply route.
+
+            Replies are issued without waiting for the publish response so the message processing 
+            thread is released as soon as the handler returns. Replies are published with the is_reply header 
+            field set and received messages with is_reply set are never replied to, so a component 
+            subscribed to its own reply topic doesn't reply to its replies.
+
+            e.g: auto_reply={'health_check_request' : 'MyHandler.health_check_response'}
+
+        **process_workers**: int or bool (Optional)
+
+            Runs the message handler functions in a pool of this many worker processes (or os.cpu_count() if True) 
+            for CPU bound handlers that are limited by the GIL. The handler is pickled once to (or instantiated once in) 
+            each worker process, so must not reference the PubSub client. To publish the handler return values 
+            as replies from this process, set auto_reply. Large message bodies are passed to workers in shared memory, 
+            see process_dispatch.ProcessHandlerPool.
         '''
 
         # Scan the message_handler class for non private functions that are assumed to
         # be valid message handling functions for this SDK based on the route field.
 
         # Get all callable methods in the provided class
-        class_name = type(message_handler_class).__name__
+        if isinstance(message_handler_class, type):
+            if not process_workers:
+                raise Exception('Message handler class must be registered as an instance unless run in process_workers. CLASS: {}'.format(message_handler_class.__name__))
+            class_name = message_handler_class.__name__
+        else:
+            class_name = type(message_handler_class).__name__
+
+        process_pool = None
+        if process_workers:
+            from awsgreengrasspubsubsdk.process_dispatch import ProcessHandlerPool
+            process_pool = ProcessHandlerPool(message_handler_class, None if process_workers is True else process_workers)
         all_handler_methods = [func for func in dir(message_handler_class) if callable(getattr(message_handler_class, func))]
         
         # For each method, ,check if is non private and has the SDK specified required input paramaters
@@ -160,26 +327,695 @@ class AwsGreengrassPubSubSdkClient():
                         is_valid_method=False
                         break
 
+                handler_route = '{}.{}'.format(class_name, method_name)
+                if not is_valid_method and self._is_message_object_handler(method):
+                    is_valid_method=True
+                    self.message_object_routes.add(handler_route)
+
                 if is_valid_method:
-                    handler_route = '{}.{}'.format(class_name, method_name)
                     self.message_handlers[handler_route] = method
                     log.info('Adding Message Handler Function: {}'.format(method_name))
 
+                    if process_pool:
+                        self.process_routes[handler_route] = (process_pool, method_name)
+
+                    if schemas and method_name in schemas:
+                        from awsgreengrasspubsubsdk.message_schema import compile_schema
+                        self.message_validators[handler_route] = compile_schema(schemas[method_name])
+                        log.info('Adding Message Schema Validator for: {}'.format(method_name))
+
+                    timeout = timeouts.get(method_name) if isinstance(timeouts, dict) else timeouts
+                    if timeout:
+                        self.handler_timeouts[handler_route] = timeout
+                        if cancel_on_timeout:
+                            self.cancel_on_timeout_routes.add(handler_route)
+                        log.info('Setting Message Handler Timeout for: {} to {}s'.format(method_name, timeout))
+
+                    reply_route = auto_reply.get(method_name) if isinstance(auto_reply, dict) else ('{}_response'.format(handler_route) if auto_reply else None)
+                    if reply_route:
+                        self.reply_routes[handler_route] = reply_route
+                        log.info('Setting Message Handler Auto Reply for: {} with route: {}'.format(method_name, reply_route))
+
+                    method_priority = priority.get(method_name) if isinstance(priority, dict) else priority
+                    if method_priority:
+                        self.route_priorities[handler_route] = get_priority(method_priority)
+                        log.info('Setting Message Handler Priority for: {} to {}'.format(method_name, method_priority))
+
         log.info('Registering Message Handler Class: {} - Complete'.format(class_name))
 
+    def _is_message_object_handler(self, method):
+        '''
+        Returns True if the given method takes the message as a single PubSubMessage object. 
+        '''
+
+        try:
+            method_params = inspect.signature(method).parameters
+        except (TypeError, ValueError):
+            return False
+
+        return all(param in method_params for param in self.handler_message_object_params)
+
+    ##################################################
+    ### SDK Config Setters
+    ##################################################
+
+    def set_zero_copy_receive(self, zero_copy_receive, binary_message_routes=None):
+        '''
+        Opt-in receive mode that keeps the received payload buffer rather than copying it into a str. 
+        Must be set before calling activate_ipc_pubsub() / activate_mqtt_pubsub() to take effect on that protocol.
+        
+        In this mode, JSON payloads are parsed directly from the received buffer and any non-JSON (binary) payloads 
+        such as images or waveforms are routed to message handlers with the message parameter as a memoryview 
+        of the received buffer (and message_id = None, status = 200). The handler decides if and how to decode it.
+
+        ### Parameters
+
+        **zero_copy_receive**: bool   
+
+            True to enable zero copy receive mode.
+
+        **binary_message_routes**: dict (Optional)   
+
+            Dict of subscribed topic: route used to route binary payloads received on that topic. 
+            Binary payloads on topics without a route are forwarded to the default_message_handler.
+
+        ### Usage
+
+        ```
+        pubsub_client.set_zero_copy_receive(True, {'my/camera/frames' : 'MyImageHandler.process_frame'})
+        ```
+        '''
+
+        self.zero_copy_receive = zero_copy_receive
+        if binary_message_routes:
+            self.binary_message_routes.update(binary_message_routes)
+
+    def set_default_handler_timeout(self, default_handler_timeout):
+        '''
+        Sets the execution time budget in seconds for the default_message_handler and any 
+        registered message handler without its own timeout. None (default) to not track handler time.
+        '''
+
+        self.default_handler_timeout = default_handler_timeout
+
+    def get_handler_stats(self):
+        '''
+        Returns a dict of message handler budget overrun and cancelled counts by route 
+        and the current number of in-flight handlers being tracked.
+        '''
+
+        return self.handler_watchdog.get_stats()
+
+    def set_handler_watchdog(self, check_interval=None, on_overrun=None):
+        '''
+        Configures the watchdog that detects message handlers overrunning their timeouts budget.
+
+        ### Parameters
+
+        **check_interval**: float (Optional) Default=Half the smallest handler budget   
+
+            Seconds between checks of in-flight handlers. Handlers that complete over budget 
+            before the next check are counted when they complete.
+
+        **on_overrun**: function (Optional)   
+
+            Called as on_overrun(route, message_id, elapsed, stack) the first time a handler is detected 
+            over its budget, stack is None if the handler completed before being detected in flight.
+        '''
+
+        self.handler_watchdog.check_interval = check_interval
+        self.handler_watchdog.on_overrun = on_overrun
+
+    def set_reply_topic(self, reply_topic):
+        '''
+        Sets the topic that message handler auto replies are published to. Default is the SDK egress topic. 
+        See register_message_handler() auto_reply.
+        '''
+
+        self.reply_topic = reply_topic
+
+    def set_topic_priority(self, topic, priority):
+        '''
+        Sets the dispatch priority of all messages received on a subscribed topic, takes precedence over route priorities. 
+
+        ### Parameters
+
+        **topic**: str   
+
+            The subscribed IPC or MQTT topic.
+
+        **priority**: str   
+
+            Message priority: [high || normal || low]
+        '''
+
+        self.topic_priorities[topic] = get_priority(priority)
+
+    def set_message_max_age(self, max_age, route=None):
+        '''
+        Sets the max secs a received message can wait in the message processing queue before it's dropped 
+        rather than processed, so after a backlog (i.e: a reconnect or message burst) workers skip stale 
+        telemetry and commands that no longer matter. Dropped messages are counted in get_expired_message_stats().
+
+        Once set, the queue also drops messages past the expires_at time set by the sender in the message header 
+        (see PubSubMessageFormatter.get_message() ttl / expires_at). Expired messages are always dropped by the 
+        message router, before schema validation and the message handler, whether or not a max age is set.
+
+        ### Parameters
+
+        **max_age**: float   
+
+            Max secs a message waits in the queue, None to remove the max age of the route.
+
+        **route**: str (Optional) Default=None   
+
+            Message route to set the max age for. If None, sets the default max age for all routes.
+        '''
+
+        if route is None:
+            self.default_max_age = max_age
+        elif max_age is None:
+            self.route_max_ages.pop(route, None)
+        else:
+            self.route_max_ages[route] = max_age
+
+        self.message_dispatcher.set_expiry_check(self._is_queued_message_expired)
+
+    def get_expired_message_stats(self):
+        '''
+        Returns a dict of the count of expired messages dropped by route from the message processing queue and by the message router.
+        '''
+
+        with self.expired_lock:
+            return {stage : dict(counts) for stage, counts in self.expired_messages.items()}
+
+    def set_message_workers(self, max_workers=None, reserved_workers=1, min_workers=None, scale_interval=1.0, scale_down_intervals=3):
+        '''
+        Sets the number of threads processing received messages. 
+        Must be set before calling activate_ipc_pubsub() / activate_mqtt_pubsub() to take effect.
+
+        With min_workers set, the number of workers is autoscaled between min_workers and max_workers 
+        from the observed message handler concurrency, latency and queue depth. Workers are added as soon 
+        as more are needed and removed only once fewer are needed for scale_down_intervals consecutive intervals.
+        See get_message_worker_stats() for the current number of workers and scaling events.
+
+        ### Parameters
+
+        **max_workers**: int (Optional) Default=min(32, os.cpu_count() + 4)   
+
+            Max worker threads that process messages of any priority, highest priority first.
+
+        **reserved_workers**: int (Optional) Default=1   
+
+            Additional worker threads that only process high priority messages so 
+            high priority latency is bounded when all other workers are busy.
+
+        **min_workers**: int (Optional)   
+
+            Min worker threads when autoscaling. If None, workers are started on demand up to max_workers and kept.
+
+        **scale_interval**: float (Optional) Default=1.0   
+
+            Secs between autoscaling evaluations.
+
+        **scale_down_intervals**: int (Optional) Default=3   
+
+            Consecutive intervals fewer workers are needed before scaling down.
+        '''
+
+        if self.is_ipc_active or self.is_mqtt_active:
+            raise Exception('Message workers must be set before activating IPC / MQTT PubSub.')
+
+        self.message_dispatcher = PriorityDispatcher(max_workers, reserved_workers, classifier=self._get_message_priority, 
+            expiry_check=self.message_dispatcher.expiry_check, min_workers=min_workers, 
+            scale_interval=scale_interval, scale_down_intervals=scale_down_intervals)
+
+        if self.chunk_reassembler:
+            self.chunk_reassembler.max_streams = self._get_max_chunk_streams()
+
+    def get_message_worker_stats(self):
+        '''
+        Returns a dict of the current max workers, worker threads running and busy, messages queued, 
+        autoscaling bounds, counts of scale ups and downs and a list of recent scaling events.
+        '''
+
+        return self.message_dispatcher.get_worker_stats()
+
+    def set_publish_rate_limit(self, protocol, rate, burst=None, topic=None, mode=None, max_queue=1000):
+        '''
+        Rate limits publishes on the given protocol with a token bucket to smooth bursts to within 
+        the AWS IoT Core (or any other) publish limits rather than having publishes throttled by the service.
+        Can be set before or after activating the protocol. 
+
+        ### Parameters
+
+        **protocol**: str   
+
+            The protocol to rate limit: [ipc || mqtt || ipc_mqtt]
+
+        **rate**: float   
+
+            Publishes per second. None to remove the limit.
+
+        **burst**: float (Optional) Default=rate (min 1)   
+
+            Max publishes issued without delay after an idle period, must be 1 or greater.
+
+        **topic**: str (Optional)   
+
+            Limit only applies to publishes to this topic. If None, sets the global limit 
+            for the protocol, topic limits are applied in addition to the global limit.
+
+        **mode**: str (Optional) Default='block'   
+
+            Action when a publish exceeds the rate limit, applies to all limits of the protocol:
+
+            * block: The publish call blocks until within the rate limit.
+            * queue: The publish is queued (up to max_queue) and issued in order per topic at the rate limit from a background 
+              thread. Publishes to other topics within their limits aren't delayed behind the queued publishes.
+            * drop: The publish is discarded, counted in get_publish_stats() and fails with an Exception.
+
+        ### Usage
+
+        ```
+        pubsub_client.set_publish_rate_limit('mqtt', 100, mode='queue')
+        pubsub_client.set_publish_rate_limit('mqtt', 1, burst=5, topic='my/telemetry/topic')
+        ```
+        '''
+
+        if protocol == 'ipc_mqtt':
+            self.set_publish_rate_limit('ipc', rate, burst, topic, mode, max_queue)
+            self.set_publish_rate_limit('mqtt', rate, burst, topic, mode, max_queue)
+            return
+
+        if protocol not in ['ipc', 'mqtt']:
+            raise Exception('Unknown protocol: {}. Supported Values: [ipc || mqtt || ipc_mqtt]'.format(protocol))
+
+        if protocol not in self.publish_rate_limiters:
+            self.publish_rate_limiters[protocol] = PublishRateLimiter(mode if mode else 'block', max_queue)
+            if protocol == 'ipc' and self.is_ipc_active:
+                self.ipc_pubsub.set_rate_limiter(self.publish_rate_limiters[protocol])
+            elif protocol == 'mqtt' and self.is_mqtt_active:
+                self.mqtt_pubsub.set_rate_limiter(self.publish_rate_limiters[protocol])
+
+        rate_limiter = self.publish_rate_limiters[protocol]
+        if mode:
+            rate_limiter.set_mode(mode)
+        rate_limiter.max_queue = max_queue
+        rate_limiter.set_rate_limit(rate, burst, topic)
+
+    def get_publish_stats(self):
+        '''
+        Returns a dict by protocol of rate limited publish counts (throttled and dropped) and current queue depth.
+        '''
+
+        return {protocol : rate_limiter.get_stats() for protocol, rate_limiter in self.publish_rate_limiters.items()}
+
+    def set_ipc_loopback(self, ipc_loopback):
+        '''
+        Opt-in to deliver messages published to IPC topics this component subscribes to directly to the 
+        local message router in process, without serialising them or the round trip through the Greengrass nucleus. 
+        Applies to publish_message() and publish_many(). SDK formatted message dicts (or PubSubMessage objects)
+        are delivered as a PubSubMessage that references the published message body, so message handlers 
+        must not modify a received message body that the publisher also uses.
+
+        Subscription message filters and priorities are applied to loopback messages as to IPC received messages 
+        and as from IPC, loopback messages are routed with the subscription topic (filter) they matched. 
+
+        ### Parameters
+
+        **ipc_loopback**: str   
+
+            Loopback mode:
+
+            * None: Disabled (default), all messages are published to IPC.
+            * only: Messages to locally subscribed topics are only delivered locally, not published to IPC.
+            * also: Messages to locally subscribed topics are delivered locally and published to IPC for any 
+              other subscribing components. The copy received back from IPC is discarded.
+        '''
+
+        if ipc_loopback not in [None, 'only', 'also']:
+            raise Exception('Unknown IPC loopback mode: {}. Supported Values: [None || only || also]'.format(ipc_loopback))
+
+        self.ipc_loopback = ipc_loopback
+
+    def set_traffic_capture(self, traffic_capture):
+        '''
+        Captures received and published messages to an append-only file that can be replayed into 
+        a client through the local stand-in transports with traffic_capture.replay_capture(). 
+        Records are written from a background thread, published message objects are serialised 
+        on that thread so must not be modified after publishing.
+
+        ### Parameters
+
+        **traffic_capture**: str or traffic_capture.TrafficCapture   
+
+            Path of the capture file to append to, a TrafficCapture or None to stop capturing. 
+            Stopping doesn't close the TrafficCapture, call its close() to write any queued records.
+        '''
+
+        if isinstance(traffic_capture, str):
+            from awsgreengrasspubsubsdk.traffic_capture import TrafficCapture
+            traffic_capture = TrafficCapture(traffic_capture)
+
+        self.traffic_capture = traffic_capture
+
+    def set_message_tracing(self, tracing, span_log_file=None, sample_rate=1.0):
+        '''
+        Enables end to end latency tracing of SDK formatted messages. Published messages carry a trace context 
+        (trace_id, span_id and sent_at time) in the message header and received traced messages are recorded 
+        as spans with the transport, queue wait, decode and message handler stage timings in ms. Messages 
+        published from a message handler continue the trace of the message it's handling. 
+        
+        When disabled, publish and receive only check that tracing is off.
+
+        ### Parameters
+
+        **tracing**: bool, str or exporter object   
+
+            * False / None: Disable tracing (default).
+            * True / auto: Export spans with OpenTelemetry if the opentelemetry-api package is installed, else to a local span log.
+            * opentelemetry: Export spans with the OpenTelemetry tracer provider configured by the component.
+            * local: Hold recent spans in memory, see get_trace_spans(), and append them to span_log_file if given.
+            * An exporter object, see message_tracing.LocalSpanLog.
+
+        **span_log_file**: str (Optional)   
+
+            JSON lines file the local span log appends completed spans to.
+
+        **sample_rate**: float (Optional) Default=1.0   
+
+            Fraction of new traces started by this component that are traced. Received traced messages are always traced.
+        '''
+
+        if not tracing:
+            self.message_tracer = None
+            return
+
+        from awsgreengrasspubsubsdk.message_tracing import MessageTracer, get_span_exporter
+        self.message_tracer = MessageTracer(get_span_exporter(tracing, span_log_file), sample_rate)
+
+    def get_trace_spans(self):
+        '''
+        Returns a list of the recent completed spans (as dicts) held by the local span log, empty if not tracing to a local span log.
+        '''
+
+        if self.message_tracer and hasattr(self.message_tracer.exporter, 'get_spans'):
+            return self.message_tracer.exporter.get_spans()
+
+        return []
+
+    def set_claim_check(self, threshold=1024 * 1024, ttl=60, directory=None, mode=0o600):
+        '''
+        Enables claim-check transfer of large message bodies published to IPC for components on the same device. 
+        Message bodies over the threshold, and bytes, bytearray or memoryview message bodies of any size, are written 
+        once to a shared memory (/dev/shm) segment and only a small reference message is published to IPC. The receiving component maps the segment and its message 
+        handler is passed a read only memoryview of the segment (bytes, bytearray or memoryview message bodies) 
+        or the message body parsed from it (JSON message bodies) without the body passing through the Greengrass nucleus. 
+
+        Receiving claim-check messages needs no configuration unless a different directory is used. Segments 
+        are deleted after the ttl so receivers must process the reference message within it. Applies to the 
+        IPC leg of publish_message() and publish_many(), MQTT and IPC loopback are passed the full message. 
+
+        ### Parameters
+
+        **threshold**: int (Optional) Default=1MB   
+
+            Message bodies of this many bytes or more are claim-checked, None to disable.
+
+        **ttl**: float (Optional) Default=60   
+
+            Secs before a segment is deleted.
+
+        **directory**: str (Optional) Default=/dev/shm   
+
+            Directory of the segment files, the publishing and receiving components must use the same directory.
+
+        **mode**: int (Optional) Default=0o600   
+
+            File mode of the segments. Segments bypass the IPC topic authorization policies, by default only components 
+            running as the same user can read them. To share segments with components running as other users, 
+            use a directory only those users can access with mode=0o640.
+        '''
+
+        from awsgreengrasspubsubsdk.claim_check import ClaimCheckStore
+
+        if self.claim_check_store:
+            self.claim_check_store.close()
+
+        self.claim_check_directory = directory
+        self.claim_check_store = ClaimCheckStore(threshold, ttl, directory, mode) if threshold is not None else None
+
+    def get_claim_check_stats(self):
+        '''
+        Returns a dict of the claim-check store (published) and reader (received) stats.
+        '''
+
+        return {
+            'store' : self.claim_check_store.get_stats() if self.claim_check_store else None,
+            'reader' : self.claim_check_reader.get_stats() if self.claim_check_reader else None
+        }
+
+    def set_message_chunking(self, max_payload=128 * 1024, protocols=('mqtt',), window=8, reassembly_max_bytes=32 * 1024 * 1024, reassembly_timeout=30, stream_routes=None):
+        '''
+        Enables transparent chunking of SDK formatted messages larger than max_payload (i.e: the AWS IoT Core 128KB 
+        MQTT payload limit) published with publish_message() and auto replies. The message body is split into 
+        sequenced chunk messages that are published pipelined and reassembled by the receiving client before routing.
+        Messages with a bytes, bytearray or memoryview body are always sent as chunks on the chunked protocols.
+
+        Receiving chunked messages needs no configuration, this also sets the reassembly buffer limits and stream routes.
+
+        ### Parameters
+
+        **max_payload**: int (Optional) Default=128KB   
+
+            Max payload bytes published, larger messages are chunked.
+
+        **protocols**: list (Optional) Default=('mqtt',)   
+
+            Protocols to chunk messages published to, 'ipc' and / or 'mqtt'.
+
+        **window**: int (Optional) Default=8   
+
+            Max chunk publishes in flight per message.
+
+        **reassembly_max_bytes**: int (Optional) Default=32MB   
+
+            Max bytes of incomplete received messages held, the oldest are dropped to make room.
+
+        **reassembly_timeout**: float (Optional) Default=30   
+
+            Secs to receive all chunks of a message before the incomplete message is dropped.
+
+        **stream_routes**: list (Optional)   
+
+            Routes of message handlers that are dispatched on receiving the first chunk and passed a 
+            message_chunking.ChunkStream to iterate over the encoded message body bytes as its chunks are received, 
+            rather than the reassembled message body. Each stream holds a message processing worker until it completes, 
+            so streams dispatched before all chunks are received are limited to one less than the message workers. 
+            Further stream route messages are passed a ChunkStream once all their chunks are received.
+        '''
+
+        from awsgreengrasspubsubsdk.message_chunking import MessageChunker, ChunkReassembler
+
+        for protocol in protocols:
+            if protocol not in ['ipc', 'mqtt']:
+                raise Exception('Unknown message chunking protocol {}. Supported Values: [ipc || mqtt]'.format(protocol))
+
+        self.message_chunker = MessageChunker(max_payload, window, self.formatter.id_generator)
+        self.chunk_protocols = set(protocols)
+        self.chunk_reassembler = ChunkReassembler(reassembly_max_bytes, reassembly_timeout, stream_routes, self._get_max_chunk_streams())
+
+    def get_message_chunking_stats(self):
+        '''
+        Returns a dict of the messages chunked and chunks published and the received chunk reassembly stats.
+        '''
+
+        return {
+            'chunked' : self.message_chunker.chunked if self.message_chunker else 0,
+            'chunks' : self.message_chunker.chunks if self.message_chunker else 0,
+            'reassembly' : self.chunk_reassembler.get_stats() if self.chunk_reassembler else None
+        }
+
+    def set_message_aggregation(self, route, window, slide=None, fields=None, stats=None, 
+                                topic=None, protocol='mqtt', summary_route=None, summary_topic=None, raw_ipc=False):
+        '''
+        Aggregates SDK formatted messages published with publish_message() to the given route in time windows per topic 
+        and publishes a single summary message per window rather than each raw message. The summary message body 
+        is the window_start, window_end, count of messages and a dict of the stats of each numeric message body field:
+
+        {'window_start': 1700000000.0, 'window_end': 1700000010.0, 'count': 10000, 'fields': {'temp': {'count': 10000, 'min': 20.1, ...}}}
+
+        Stats are computed with NumPy if installed.
+
+        ### Parameters
+
+        **route**: str   
+
+            Message route to aggregate.
+
+        **window**: float   
+
+            Window length in secs. None to remove the aggregation of the route.
+
+        **slide**: float (Optional) Default=window   
+
+            Secs between window summaries. Equal to window for tumbling windows or less than window for overlapping sliding windows.
+
+        **fields**: list (Optional)   
+
+            Message body fields to aggregate. If None, all top level int and float fields of the message body.
+
+        **stats**: list (Optional) Default=message_aggregation.DEFAULT_STATS: ('count', 'min', 'max', 'mean', 'p50', 'p95')   
+
+            Stats of each field: count, min, max, mean or pNN percentiles i.e: p99.
+
+        **topic**: str (Optional)   
+
+            Only aggregate messages published to this topic. If None, messages published to any topic are aggregated per topic.
+
+        **protocol**: str (Optional) Default='mqtt'   
+
+            Protocol aggregated, [ipc || mqtt]. For messages published to ipc_mqtt, the other protocol receives the raw messages.
+
+        **summary_route**: str (Optional) Default=route + '_summary'   
+
+            Route of the summary messages.
+
+        **summary_topic**: str (Optional) Default=The topic the messages were published to   
+
+            Topic summary messages are published to.
+
+        **raw_ipc**: bool (Optional) Default=False   
+
+            If True, raw messages published to mqtt only are still published to IPC for local components.
+
+        ### Usage
+
+        ```
+        pubsub_client.set_message_aggregation('MyHandler.telemetry', 60, fields=['temperature', 'pressure'], stats=['mean', 'max', 'p99'], raw_ipc=True)
+        ```
+        '''
+
+        from awsgreengrasspubsubsdk.message_aggregation import MessageAggregator, WindowAggregation, DEFAULT_STATS
+
+        if self.message_aggregator is None:
+            if window is None:
+                return
+            self.message_aggregator = MessageAggregator(self._publish_aggregation_summary)
+
+        if window is None:
+            self.message_aggregator.set_aggregation(route, None)
+            return
+
+        if protocol not in ['ipc', 'mqtt']:
+            raise Exception('Unknown message aggregation protocol: {}. Supported Values: [ipc || mqtt]'.format(protocol))
+
+        self.message_aggregator.set_aggregation(route, {
+            'aggregation' : WindowAggregation(window, slide, fields, stats if stats else DEFAULT_STATS),
+            'topic' : topic,
+            'protocol' : protocol,
+            'summary_route' : summary_route if summary_route else '{}_summary'.format(route),
+            'summary_topic' : summary_topic,
+            'raw_ipc' : raw_ipc
+        })
+
+    def get_message_aggregation_stats(self):
+        '''
+        Returns a dict by aggregated route of the messages aggregated, summaries published, dropped messages and active topics.
+        '''
+
+        return self.message_aggregator.get_stats() if self.message_aggregator else {}
+
+    def _publish_aggregation_summary(self, config, topic, route, summary):
+
+        message = self.formatter.get_message(route=config['summary_route'], message=summary)
+        self.publish_message(config['protocol'], message, topic=config['summary_topic'] if config['summary_topic'] else topic)
+
+    def set_array_decoding(self, array_decoding, routes=None, use_numpy=None):
+        '''
+        Opt-in to decode the encoded arrays (see array_codec.encode_array() and the PubSubMessageFormatter 
+        get_message() encode_arrays parameter) in received message bodies before they are passed to message handlers.
+        Arrays are decoded without creating a Python object per element. Message body schema validation 
+        is applied to the encoded message body.
+
+        ### Parameters
+
+        **array_decoding**: bool   
+
+            True to decode arrays in received message bodies.
+
+        **routes**: list (Optional)   
+
+            Only decode arrays in messages to these routes. If None, arrays are decoded in messages to all routes.
+
+        **use_numpy**: bool (Optional) Default=True if NumPy is installed   
+
+            If True, arrays are decoded to read only NumPy arrays of the encoded shape. If False, to (flat) array.array.
+        '''
+
+        self.array_decoding = array_decoding
+        self.array_decoding_routes = set(routes) if routes else None
+        self.array_decoding_numpy = use_numpy
+
+    def get_startup_timings(self):
+        '''
+        Returns a dict of the component startup stage durations in seconds to track cold start time:
+
+        * import: Importing the SDK client module.
+        * construct: Constructing this client.
+        * activate_ipc / activate_mqtt: Activating each protocol (if activated).
+        * first_message: From the start of constructing this client to receiving the first message (once received).
+        '''
+
+        return dict(self.startup_timings)
+
+    def set_lazy_message_parsing(self, lazy_message_parsing):
+        '''
+        Opt-in to pass the message body to message handlers as a LazyMessageBody that is only parsed 
+        when the handler first accesses it. Messages routed to handlers that ignore or drop the 
+        message body (i.e: a default_message_handler that only logs the route) are never parsed.
+
+        The LazyMessageBody supports dict style read access (message['key'], message.get('key'), dict(message)) 
+        for JSON object message bodies, use message.value for the parsed body of any other type.
+
+        The message header fields (sdk_version, message_id, status and route) are always extracted 
+        without parsing the message body.
+
+        ### Parameters
+
+        **lazy_message_parsing**: bool   
+
+            True to enable lazy message body parsing.
+        '''
+
+        self.lazy_message_parsing = lazy_message_parsing
+
     ##################################################
     ### Activate calls for PubSub (IPC / MQTT) Clients
     ##################################################
     
-    def activate_ipc_pubsub(self):
+    def activate_ipc_pubsub(self, pubsub_class=None):
         '''
         Activate and initialise the IPC PubSub subscribers and publisher.
         Will start receiving and processing messages in IPC subscribed topics
         immediately on calling this function.
+
+        ### Parameters
+
+        **pubsub_class**: class (Optional) Default=pubsub_ipc.IpcPubSub
+
+            IPC client class, i.e: pubsub_local.LocalPubSub to run against an in process stand-in for the Greengrass nucleus.
         '''
         
+        activate_started = time.perf_counter()
+
+        if pubsub_class is None:
+            from awsgreengrasspubsubsdk.pubsub_ipc import IpcPubSub
+            pubsub_class = IpcPubSub
+
         log.info('Initialising IPC Topic PubSub inter-service messaging.')
-        self.ipc_pubsub = IpcPubSub(self._received_message_callback, self.ipc_subscribe_topics)
+        self.ipc_pubsub = pubsub_class(self._received_message_callback, self.ipc_subscribe_topics, zero_copy_receive=self.zero_copy_receive, executor=self.message_dispatcher, rate_limiter=self.publish_rate_limiters.get('ipc'), message_filters=self.message_filters['ipc'], echo_check=self._is_loopback_echo_payload)
         
         # Publish a 200 OK message to indicate IPC is activated
         succ_msg = self.formatter.get_message(message={"event" : "IPC Client Activated"})
@@ -187,16 +1023,29 @@ class AwsGreengrassPubSubSdkClient():
         
         # Is IpcPubSub initilises successfully then set the is_ipc_active=True
         self.is_ipc_active = True
+        self.startup_timings['activate_ipc'] = time.perf_counter() - activate_started
     
-    def activate_mqtt_pubsub(self):
+    def activate_mqtt_pubsub(self, pubsub_class=None):
         '''
         Activate and initialise the MQTT PubSub subscribers and publisher.
         Will start receiving and processing messages in MQTT subscribed topics
         immediately on calling this function.
+
+        ### Parameters
+
+        **pubsub_class**: class (Optional) Default=pubsub_mqtt.MqttPubSub
+
+            MQTT client class, i.e: pubsub_local.LocalMqttPubSub to run against an in process stand-in for AWS IoT Core.
         '''
         
+        activate_started = time.perf_counter()
+
+        if pubsub_class is None:
+            from awsgreengrasspubsubsdk.pubsub_mqtt import MqttPubSub
+            pubsub_class = MqttPubSub
+
         log.info('Initialising IPC MQTT IoT Core PubSub messaging.')
-        self.mqtt_pubsub = MqttPubSub(self._received_message_callback, self.mqtt_subscribe_topics)
+        self.mqtt_pubsub = pubsub_class(self._received_message_callback, self.mqtt_subscribe_topics, zero_copy_receive=self.zero_copy_receive, executor=self.message_dispatcher, rate_limiter=self.publish_rate_limiters.get('mqtt'), message_filters=self.message_filters['mqtt'])
         
         # Publish a 200 OK message to indicate IPC is activated
         succ_msg = self.formatter.get_message(message={"event" : "MQTT Client Activated"})
@@ -204,6 +1053,7 @@ class AwsGreengrassPubSubSdkClient():
         
         # Is IpcPubSub initilises successfully then set the is_mqtt_active=True
         self.is_mqtt_active = True
+        self.startup_timings['activate_mqtt'] = time.perf_counter() - activate_started
     
     ##################################################
     ### PubSub Received Message Callback
@@ -213,57 +1063,173 @@ class AwsGreengrassPubSubSdkClient():
         '''
         Callback for all (IPC and MQTT) PubSub Client received messages.
         Provides initial message validation and passing to PubSub topic routers.
-        Expects message payload provided is JSON formatted. 
+        Expects message payload provided is JSON formatted or, in zero copy receive mode, 
+        a memoryview of the received buffer.
         '''
 
         try:
 
-            # Debug Log incoming message
-            log.debug('Received PubSub Message. Protocol: {} - Topic: {} - Message: {}'.format(protocol, topic, payload))
+            # Debug Log incoming message, only formatted if debug enabled as it includes the full payload.
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Received PubSub Message. Protocol: {} - Topic: {} - Message: {}'.format(protocol, topic, payload))
+
+            if not self.is_first_message_received:
+                self._record_first_message()
+
+            if self.traffic_capture:
+                self.traffic_capture.record('received', protocol, topic, payload, self._get_received_time())
             
             ########################################################
             #### Message Parsing and SDK Message format parameter validation
+
+            # In zero copy receive mode, pass binary (non-JSON) payloads through to handlers as received.
+            if isinstance(payload, memoryview) and not self._is_json_object_payload(payload):
+                self._binary_message_router(protocol, topic, payload)
+                return
             
-            # Parse the message to JSON. If not JSON or not valid message format 
-            # for this SDK then route to the custom message processor.
-            message = self._parse_json_message(payload)
+            # Extract the message header fields for routing, the message body is only parsed when needed. 
+            # If not JSON or not valid message format for this SDK then publish an error.
+            message = LazyPubSubMessage(payload)
+
+            # Reassemble chunked messages, the message is routed once all chunks are received.
+            claim_check_message = None
+            if 'chunk' in message.header:
+                message = self._get_chunk_reassembler().add(protocol, message)
+                if message is None:
+                    return
+
+                # Discard the IPC copy of a chunked message already delivered by IPC loopback, 
+                # other messages are discarded by the IPC subscription handler.
+                if protocol == 'ipc' and self.loopback_message_ids and self._is_loopback_echo(topic, message.message_id):
+                    return
+
+            # Read the message body of claim-check reference messages from the shared memory segment.
+            elif 'claim_check' in message.header:
+                message = claim_check_message = self._get_claim_check_reader().check_out(message)
             
-            if self._is_sdk_formatted_message(message):
-                self._sdk_formatted_message_router(protocol, topic, message)
-            else:
-                raise Exception('Message received not meeting AWS Greengrass PubSub SDK required format.')
+            try:
+                if message.is_sdk_formatted():
+                    self._sdk_formatted_message_router(protocol, topic, message)
+                else:
+                    raise Exception('Message received not meeting AWS Greengrass PubSub SDK required format.')
+
+            finally:
+                if claim_check_message:
+                    claim_check_message.release()
 
         except Exception as err:
             err_msg = 'Exception raised from _received_message_callback. ERROR MESSAGE: {} - TOPIC: {} - PAYLOAD: {}'.format(err, topic, payload)
             self.publish_error('ipc_mqtt', err_msg)
     
+    def _get_claim_check_reader(self):
+
+        if self.claim_check_reader is None:
+            from awsgreengrasspubsubsdk.claim_check import ClaimCheckReader
+            self.claim_check_reader = ClaimCheckReader(self.claim_check_directory)
+
+        return self.claim_check_reader
+
+    def _get_chunk_reassembler(self):
+
+        if self.chunk_reassembler is None:
+            from awsgreengrasspubsubsdk.message_chunking import ChunkReassembler
+            self.chunk_reassembler = ChunkReassembler(max_streams=self._get_max_chunk_streams())
+
+        return self.chunk_reassembler
+
+    def _get_max_chunk_streams(self):
+        '''
+        Returns the max chunk streams dispatched before all chunks are received, one less than the (min) general
+        message workers so a worker is always free to receive the chunks of the streams in progress.
+        '''
+
+        dispatcher = self.message_dispatcher
+        return (dispatcher.min_workers if dispatcher.is_autoscaling else dispatcher.max_workers) - 1
+
+    def _record_first_message(self):
+        '''
+        Records and logs the startup timings on receiving the first message.
+        '''
+
+        self.is_first_message_received = True
+        self.startup_timings['first_message'] = time.perf_counter() - self.construct_started
+        log.info('Startup Timings (ms): {}'.format(', '.join('{}: {:.1f}'.format(stage, secs * 1000) for stage, secs in self.startup_timings.items())))
+
+    def _get_received_time(self):
+        '''
+        Returns the time.time() the message being processed was received by the transport callback,
+        so excludes the time it waited in the message dispatcher queue.
+        '''
+
+        queue_wait, dequeued_at = get_queue_timing()
+        if dequeued_at is None:
+            return time.time()
+
+        return time.time() - (time.monotonic() - dequeued_at + queue_wait)
+
     ##################################################
     ### Message Parse / Validate / Version helpers
     ################################################## 
     
-    def _parse_json_message(self, payload):
+    def _get_message_priority(self, protocol, topic, payload):
         '''
-            Try to Parse a message as JSON. If parses; return the object, if not return False. 
+        Classifies a received message into its dispatch priority by topic then by route. 
+        Called on the IPC / MQTT stream thread so only scans the message header when route priorities are set.
         '''
-        try:
-            return json.loads(payload)
-            
-        except ValueError as e:
-            return False
 
-    def _is_sdk_formatted_message(self, message):
+        if topic in self.topic_priorities:
+            return self.topic_priorities[topic]
+
+        if self.route_priorities:
+            if isinstance(payload, PubSubMessage):
+                return self.route_priorities.get(payload.route, PRIORITY_NORMAL)
+            scanned = scan_header(payload)
+            if scanned:
+                return self.route_priorities.get(scanned[0].get('route'), PRIORITY_NORMAL)
+
+        return PRIORITY_NORMAL
+
+    def _is_queued_message_expired(self, queued_secs, protocol, topic, payload):
         '''
-        Tests if a given message is well-formatted as per this SDK message formats
+        Message dispatcher expiry check, returns True if a queued message is older than the max age of 
+        its route or past its expires_at time. Only scans the message header, the body isn't parsed.
         '''
 
-        sdk_message_values = [ 'sdk_version', 'message_id', 'status', 'route', 'message']
-        for sdk_message_value in sdk_message_values:
-            if not sdk_message_value in message.keys():
+        if isinstance(payload, PubSubMessage):
+            route, expires_at = payload.route, payload.expires_at
+        else:
+            scanned = scan_header(payload)
+            if not scanned:
                 return False
-        
-        # If all required message parameters present then return True.
-        return True
-        
+            route, expires_at = scanned[0].get('route'), scanned[0].get('expires_at')
+
+        max_age = self.route_max_ages.get(route, self.default_max_age)
+        if (max_age is not None and queued_secs > max_age) or (expires_at is not None and expires_at < time.time()):
+            self._count_expired_message('queue', route)
+            return True
+
+        return False
+
+    def _count_expired_message(self, stage, route):
+
+        with self.expired_lock:
+            counts = self.expired_messages[stage]
+            counts[route] = counts.get(route, 0) + 1
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Dropped expired message from {} for route: {}'.format(stage, route))
+
+    def _is_json_object_payload(self, payload):
+        '''
+            Returns True if the first non-whitespace byte of a memoryview payload opens a JSON object. 
+        '''
+
+        for byte in payload[:64]:
+            if byte not in b' \t\r\n':
+                return byte == ord('{')
+
+        return False
+
     def _is_same_major_version(self, source_version, target_version):
         '''
             Simple (but easily fooled) method to check two semantic versions
@@ -275,11 +1241,78 @@ class AwsGreengrassPubSubSdkClient():
         target = target_version.split('.')
         return source[0] == target[0]
         
-    def _get_sdk_message_values(self, message):
+    def _get_sdk_message_header_values(self, message):
+        '''
+        Return the header values of the given (expected SDK well-formatted) message as a tuple.
+        '''
+        return (message.sdk_version, message.message_id, message.status, message.route)
+
+    def _get_sdk_message_payload(self, message):
+        '''
+        Return the message body of the given (expected SDK well-formatted) message. 
+        Returns a LazyMessageBody that parses on first access if lazy message parsing is enabled.
+        '''
+
+        if self.lazy_message_parsing and isinstance(message, LazyPubSubMessage):
+            return message.lazy_message()
+
+        return message.message
+
+    def _call_message_handler(self, protocol, topic, route, message):
+        '''
+        Calls the message handler registered for the route or the default_message_handler 
+        with the parameters the handler accepts.
+        '''
+
+        # Get a hook to the preferred message_handler or default_message_handler if no route match            
+        if route in self.message_handlers:
+            selected_handler = self.message_handlers[route]
+            is_message_object_handler = route in self.message_object_routes
+        else:
+            selected_handler = self.default_message_handler
+            is_message_object_handler = self.is_default_handler_message_object
+
+        timeout = self.handler_timeouts.get(route, self.default_handler_timeout)
+        if not timeout:
+            return self._invoke_message_handler(selected_handler, is_message_object_handler, protocol, topic, route, message, None)
+
+        cancel_timeout = timeout if route in self.cancel_on_timeout_routes else None
+        with self.handler_watchdog.watch(route, message.message_id, timeout):
+            return self._invoke_message_handler(selected_handler, is_message_object_handler, protocol, topic, route, message, cancel_timeout)
+
+    def _invoke_message_handler(self, selected_handler, is_message_object_handler, protocol, topic, route, message, cancel_timeout):
         '''
-        Return the given (expected SDK well-formatted) message as a tuple.
+        Calls the message handler and runs it to completion if it is a coroutine function. 
+        Coroutines are cancelled after cancel_timeout seconds if given. 
+        Handlers registered with process_workers are called in a worker process.
         '''
-        return (message['sdk_version'], message['message_id'], message['status'], message['route'], message['message'])
+
+        if route in self.process_routes:
+            process_pool, method_name = self.process_routes[route]
+            return process_pool.call(method_name, is_message_object_handler, protocol, topic, message)
+
+        if is_message_object_handler:
+            result = selected_handler(protocol, topic, message)
+        else:
+            result = selected_handler(protocol, topic, message.message_id, message.status, message.route, self._get_sdk_message_payload(message))
+
+        if not inspect.isawaitable(result):
+            return result
+
+        # Run async message handlers in an event loop on this message processing thread.
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            if cancel_timeout:
+                return loop.run_until_complete(asyncio.wait_for(result, cancel_timeout))
+            return loop.run_until_complete(result)
+
+        except asyncio.TimeoutError:
+            self.handler_watchdog.record_cancelled(route)
+            raise Exception('Message handler cancelled after overrunning budget of {}s. ROUTE: {} - MESSAGE ID: {}'.format(cancel_timeout, route, message.message_id))
+
+        finally:
+            loop.close()
             
     ##################################################
     ### Message Routers.
@@ -293,34 +1326,137 @@ class AwsGreengrassPubSubSdkClient():
         '''
 
         try:
-            log.debug('_sdk_formatted_message_router: Received SDK Formatted PubSub message on topic: {} -  Message: {}'.format(topic, message))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('_sdk_formatted_message_router: Received SDK Formatted PubSub message on topic: {} -  Message: {}'.format(topic, message))
             
-            # Decompose the (expected) message parameter values
-            message_sdk_version, message_id, status, route, message_payload = self._get_sdk_message_values(message)
+            # Decompose the (expected) message header values, the message body isn't parsed until routed.
+            message_sdk_version, message_id, status, route = self._get_sdk_message_header_values(message)
+
+            # Drop messages that expired before being routed.
+            if message.expires_at is not None and message.is_expired():
+                self._count_expired_message('router', route)
+                return
             
             # Validate the receiving message was from a supported SDK version.
             sdk_version = self.formatter.sdk_version
             if not self._is_same_major_version(message_sdk_version, sdk_version):
                 raise Exception('Received PubSub SDK Message Version: {} but needing major version installed: {}'.format(message_sdk_version, sdk_version))
                     
-            # Get a hook to the preferred message_handler or default_message_handler if no route match            
-            selected_handler = self.default_message_handler
-            if route in self.message_handlers.keys():
-                selected_handler = self.message_handlers[route]
+            # Validate the message body before routing to the message handler.
+            if route in self.message_validators:
+                try:
+                    self.message_validators[route](message.message)
+                except ValueError as validation_error:
+                    raise Exception('Message failed schema validation for route: {} - MESSAGE ID: {} - {}'.format(route, message_id, validation_error))
+
+            # Decode arrays in the message body.
+            if self.array_decoding and (self.array_decoding_routes is None or route in self.array_decoding_routes):
+                message = self._decode_message_arrays(message)
+
+            # Record the stage timings of traced messages, messages published by the handler continue the trace.
+            span = None
+            if self.message_tracer and message.trace is not None:
+                span = self.message_tracer.start_receive_span(protocol, topic, route, message_id, message.trace, *get_queue_timing())
 
             # Route the message to best matching message handler found.
-            selected_handler(protocol, topic, message_id, status, route, message_payload)
+            span_error = None
+            try:
+                try:
+                    result = self._call_message_handler(protocol, topic, route, message)
+
+                except Exception as handler_err:
+                    span_error = handler_err
+                    if route in self.reply_routes and not message.is_reply:
+                        self._publish_reply(protocol, message_id, self.reply_routes[route], 500, {'error' : str(handler_err)})
+                    raise
+
+                if route in self.reply_routes and result is not None and not message.is_reply:
+                    self._publish_reply(protocol, message_id, self.reply_routes[route], 200, result)
+
+            except Exception as err:
+                span_error = span_error if span_error else err
+                raise
+
+            finally:
+                # The span is always ended so this thread's trace context is restored for the next message.
+                if span:
+                    self.message_tracer.end_span(span, span_error)
         
         except Exception as err:
             err_msg = 'Exception raised from _sdk_formatted_message_router. ERROR MESSAGE: {} - PROTOCOL: {} - TOPIC: {} - PAYLOAD: {}'.format(err, protocol, topic, message)
             self.publish_error('ipc_mqtt', err_msg)
 
 
+    def _decode_message_arrays(self, message):
+        '''
+        Returns a PubSubMessage with the encoded arrays in the message body decoded.
+        '''
+
+        from awsgreengrasspubsubsdk.array_codec import decode_arrays
+
+        body = message.message
+        if body.__class__ not in (dict, list):
+            return message
+
+        return PubSubMessage(message.sdk_version, message.message_id, message.status, message.route, 
+            decode_arrays(body, self.array_decoding_numpy), message.expires_at, message.trace, message.is_reply)
+
+    def _publish_reply(self, protocol, message_id, reply_route, status, result):
+        '''
+        Issues a message handler auto reply on the protocol the message was received on without waiting 
+        on the publish response. Publish failures are logged from the publish response callback.
+        '''
+
+        if isinstance(result, PubSubMessage):
+            reply = PubSubMessage(result.sdk_version, message_id, result.status, result.route, result.message, result.expires_at, result.trace)
+        else:
+            reply = self.formatter.get_pubsub_message(message_id=message_id, status=status, route=reply_route, message=result)
+
+        # Receivers don't auto reply to replies.
+        reply.is_reply = True
+        reply = reply.to_dict()
+
+        topic = self.reply_topic
+
+        span = None
+        if self.message_tracer:
+            reply, span = self.message_tracer.inject(reply, protocol, topic)
+        try:
+            future = self._publish_message_async(protocol, topic, reply)
+
+        except Exception as err:
+            log.error('Exception raised publishing auto reply. ERROR: {} - PROTOCOL: {} - TOPIC: {} - MESSAGE ID: {}'.format(err, protocol, topic, message_id))
+            if span:
+                self.message_tracer.end_span(span, err)
+            return
+
+        def on_published(future):
+            if span:
+                self.message_tracer.end_span(span, future.exception())
+            if future.exception() is not None:
+                log.error('Auto reply publish failed. ERROR: {} - PROTOCOL: {} - TOPIC: {} - MESSAGE ID: {}'.format(future.exception(), protocol, topic, message_id))
+
+        future.add_done_callback(on_published)
+
+    def _binary_message_router(self, protocol, topic, payload):
+        '''
+            Routes binary (non-JSON) payloads received in zero copy receive mode to the message handler 
+            configured for the topic in binary_message_routes or the default_message_handler.
+        '''
+
+        try:
+            route = self.binary_message_routes.get(topic)
+            self._call_message_handler(protocol, topic, route, PubSubMessage(None, None, 200, route, payload))
+
+        except Exception as err:
+            err_msg = 'Exception raised from _binary_message_router. ERROR MESSAGE: {} - PROTOCOL: {} - TOPIC: {} - PAYLOAD LENGTH: {}'.format(err, protocol, topic, payload.nbytes)
+            self.publish_error('ipc_mqtt', err_msg)
+
     ##################################################
     ### Publish Message / Publish Errors Functions. 
     ##################################################
 
-    def publish_message(self, protocol, message, topic=None):
+    def publish_message(self, protocol, message, topic=None, ipc_timeout=None, mqtt_timeout=None):
         '''
         Publishes a JSON message to the respective AWS Greengrass Protocol (IPC or MQTT) Clients.
         
@@ -336,39 +1472,517 @@ class AwsGreengrassPubSubSdkClient():
             
             * mqtt: Publish to MQTT message bus.
             
-            * ipc_mqtt: Publish to both IPC and MQTT message buses respectively.
+            * ipc_mqtt: Publish to both IPC and MQTT message buses concurrently.
 
         **message**: Object (preferred dict)   
         
             Dict, Array or any object able to be JSON serialised containing data to be published with the response message. 
-            Typically expected to be a JSON object created by the AWS Greengrass SDK messageformatter.
+            Typically expected to be a JSON object or PubSubMessage created by the AWS Greengrass SDK messageformatter.
             
         **topic**: str (Optional) Default: Component Egress Topic (i.e: base-pubsub-topic/THING_NAME/egress )
             
             The topic to publish this message to on the selected protocol client
+
+        **ipc_timeout**: float (Optional) Default: IPC client default timeout (10 secs)  
+
+            Time to wait for the IPC publish to complete.
+
+        **mqtt_timeout**: float (Optional) Default: MQTT client default timeout (10 secs)  
+
+            Time to wait for the MQTT publish to complete.
+
+        ### Returns
+
+        Dict of the outcome of each protocol leg published, keyed by protocol with value None if successful 
+        or the Exception raised by that leg. i.e: {'ipc': None, 'mqtt': Exception('Timeout occurred ...')}
+
+        For protocol = ipc or mqtt, a failed publish raises the Exception as well. 
+        For protocol = ipc_mqtt, both legs are issued at once and each waits against its own timeout 
+        so a slow MQTT leg doesn't hold up IPC delivery, failed legs are logged and returned but not raised.
+        Legs of messages added to an aggregation window (see set_message_aggregation()) are returned as None.
             
         '''
         
         # If topic not set, default it to the components egress topic. 
         if topic == None:
             topic = self.egress_topic
+
+        # Convert PubSubMessage objects to the message dict to serialise.
+        if isinstance(message, PubSubMessage):
+            message = message.to_dict()
+
+        # Add messages to aggregated routes to the aggregation window in place of publishing to the aggregated protocol.
+        if self.message_aggregator and self.message_aggregator.routes and isinstance(message, dict) and 'message' in message:
+            aggregated, protocol = self.message_aggregator.add(protocol, topic, message)
+            if aggregated:
+                if protocol is None:
+                    return {aggregated : None}
+                results = self.publish_message(protocol, message, topic, ipc_timeout, mqtt_timeout)
+                results[aggregated] = None
+                return results
+
+        # Add the trace context to SDK formatted messages if message tracing is enabled.
+        span = None
+        if self.message_tracer and isinstance(message, dict) and 'message' in message:
+            message, span = self.message_tracer.inject(message, protocol, topic)
         
         # Debug the PubSub publish 
-        log.debug('Publishing Message. Topic: {} - Message: {}'.format(topic, message))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Publishing Message. Topic: {} - Message: {}'.format(topic, message))
+
+        if self.traffic_capture:
+            self.traffic_capture.record('published', protocol, topic, message)
+
+        if span is None:
+            return self._publish_message_legs(protocol, topic, message, ipc_timeout, mqtt_timeout)
+
+        try:
+            results = self._publish_message_legs(protocol, topic, message, ipc_timeout, mqtt_timeout)
+        except Exception as err:
+            self.message_tracer.end_span(span, err)
+            raise
+
+        self.message_tracer.end_span(span, next((err for err in results.values() if err), None))
+        return results
+
+    def _publish_message_legs(self, protocol, topic, message, ipc_timeout, mqtt_timeout):
+        '''
+        Publishes the message dict to local loopback subscribers and the IPC and / or MQTT clients for publish_message().
+        '''
+
+        # Deliver to local IPC subscribers in process if IPC loopback is enabled.
+        is_loopback_only = protocol in ['ipc', 'ipc_mqtt'] and self.ipc_loopback and self._publish_loopback(topic, message)
+
+        # Publish a claim-check reference to IPC in place of a large message body, 
+        # else the message payload the claim-check store serialised to size it.
+        ipc_message = message
+        payload = None
+        if self.claim_check_store and protocol in ['ipc', 'ipc_mqtt'] and not is_loopback_only and isinstance(message, dict) and 'message' in message:
+            ipc_message = self.claim_check_store.check_in(message)
+            if isinstance(ipc_message, bytes):
+                payload, ipc_message = ipc_message, message
 
         # Publish the message to the AWS Greengrass IPC or MQTT SDKs
         if protocol == 'ipc':
-            self.ipc_pubsub.publish_to_topic(topic, message)
+            if not is_loopback_only:
+                if 'ipc' in self.chunk_protocols or payload is not None:
+                    self.ipc_pubsub.wait_for_publish(self._publish_message_async('ipc', topic, ipc_message, payload), topic, ipc_message, ipc_timeout)
+                else:
+                    self.ipc_pubsub.publish_to_topic(topic, ipc_message, ipc_timeout)
+            return {'ipc' : None}
+
+        elif protocol == 'mqtt':
+            if 'mqtt' in self.chunk_protocols:
+                self.mqtt_pubsub.wait_for_publish(self._publish_message_async('mqtt', topic, message), topic, message, mqtt_timeout)
+            else:
+                self.mqtt_pubsub.publish_to_mqtt(topic, message, mqtt_timeout)
+            return {'mqtt' : None}
+            
+        elif protocol == 'ipc_mqtt':
+            # A leg to a protocol client that isn't activated fails without preventing the publish to the other.
+            results = {'ipc' : None} if is_loopback_only else {}
+            legs = []
+            if not is_loopback_only and not self._is_leg_inactive('ipc', 'ipc', results):
+                legs.append(('ipc', functools.partial(self._publish_message_async, 'ipc', topic, ipc_message, payload), 
+                    self.ipc_pubsub.wait_for_publish, topic, ipc_message, self._get_publish_timeout('ipc', ipc_timeout)))
+            if not self._is_leg_inactive('mqtt', 'mqtt', results):
+                legs.append(('mqtt', functools.partial(self._publish_message_async, 'mqtt', topic, message, payload), 
+                    self.mqtt_pubsub.wait_for_publish, topic, message, self._get_publish_timeout('mqtt', mqtt_timeout)))
+            results.update(self._publish_legs_concurrently(legs))
+            return results
+
+        else:
+            raise Exception('Publish requested for unknown protocol {}. Supported Values: [ipc || mqtt || ipc_mqtt]'.format(protocol))
+
+    def _publish_message_async(self, protocol, topic, message, payload=None):
+        '''
+        Issues the publish of a message to the IPC or MQTT client and returns its response future. 
+        Messages are chunked if message chunking is enabled for the protocol. If given, payload is the 
+        already JSON encoded message, published as is unless it must be chunked.
+        '''
+
+        pubsub = self.ipc_pubsub if protocol == 'ipc' else self.mqtt_pubsub
+        publish_bytes_async = pubsub.publish_bytes_to_topic_async if protocol == 'ipc' else pubsub.publish_bytes_to_mqtt_async
+
+        if payload is not None and (protocol not in self.chunk_protocols or len(payload) <= self.message_chunker.max_payload):
+            return publish_bytes_async(topic, payload)
+
+        if protocol not in self.chunk_protocols or not (isinstance(message, dict) and 'message' in message):
+            if protocol == 'ipc':
+                return pubsub.publish_to_topic_async(topic, message)
+            return pubsub.publish_to_mqtt_async(topic, message)
+
+        payloads = self.message_chunker.get_payloads(message)
+        if len(payloads) == 1:
+            return publish_bytes_async(topic, payloads[0])
+
+        return self.message_chunker.publish_async(publish_bytes_async, topic, payloads)
+
+    def publish_many(self, protocol, topics, message, ipc_timeout=None, mqtt_timeout=None):
+        '''
+        Publishes the same JSON message to multiple topics on the respective AWS Greengrass Protocol (IPC or MQTT) Clients.
+        
+        The message is serialised once and the encoded bytes reused for every topic. All publishes are 
+        issued concurrently and each waits against its protocol timeout.
+        
+        ### Parameters  
+
+        **protocol**: str   
+        
+            The protocol client (IPC or MQTT) to publish the message too.
+            
+            Supported values:   
+            
+            * ipc: Publish to IPC message bus.
+            
+            * mqtt: Publish to MQTT message bus.
+            
+            * ipc_mqtt: Publish to both IPC and MQTT message buses concurrently.
+
+        **topics**: list   
+        
+            The topics to publish this message to on the selected protocol client.
+
+        **message**: Object (preferred dict)   
+        
+            Dict, Array or any object able to be JSON serialised. 
+            Typically expected to be a JSON object or PubSubMessage created by the AWS Greengrass SDK messageformatter.
+
+        **ipc_timeout**: float (Optional) Default: IPC client default timeout (10 secs)  
+
+            Time to wait for each IPC publish to complete.
+
+        **mqtt_timeout**: float (Optional) Default: MQTT client default timeout (10 secs)  
+
+            Time to wait for each MQTT publish to complete.
+
+        ### Returns
+
+        Dict keyed by protocol of dicts keyed by topic with value None if successful or the Exception raised 
+        publishing to that topic. i.e: {'ipc': {'my/topic': None, 'my/audit/topic': Exception('...')}}
+
+        Failed topics are logged and returned, not raised. Messages with a bytes body raise an Exception 
+        for the mqtt and ipc_mqtt protocols, bytes bodies can only be published to IPC with claim-check enabled.
+        
+        '''
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Publishing Message to Many Topics. Topics: {} - Message: {}'.format(topics, message))
+
+        if protocol == 'ipc':
+            protocols = ['ipc']
+        elif protocol == 'mqtt':
+            protocols = ['mqtt']
+        elif protocol == 'ipc_mqtt':
+            protocols = ['ipc', 'mqtt']
+        else:
+            raise Exception('Publish requested for unknown protocol {}. Supported Values: [ipc || mqtt || ipc_mqtt]'.format(protocol))
+
+        # Serialise once and share the encoded bytes across all topics.
+        if isinstance(message, PubSubMessage):
+            message = message.to_dict()
+
+        # Bytes message bodies are only published by IPC claim-check, they can't be JSON serialised for MQTT.
+        if 'mqtt' in protocols and isinstance(message, dict) and isinstance(message.get('message'), (bytes, bytearray, memoryview)):
+            raise Exception('Unsupported message body type: {} for protocol {}. Bytes message bodies are only supported on IPC with claim-check enabled, use publish_bytes() to publish an encoded payload to MQTT.'.format(type(message['message']).__name__, protocol))
+
+        # One trace span covers the publish to all topics.
+        span = None
+        if self.message_tracer and isinstance(message, dict) and 'message' in message:
+            message, span = self.message_tracer.inject(message, protocol, ','.join(topics))
+
+        # One claim-check segment is shared by the IPC publish to all topics. 
+        # Messages under the threshold reuse the payload the claim-check store serialised.
+        payload = None
+        ipc_payload = None
+        if self.claim_check_store and 'ipc' in protocols and isinstance(message, dict) and 'message' in message:
+            ipc_message = self.claim_check_store.check_in(message)
+            if isinstance(ipc_message, bytes):
+                payload = ipc_message
+            else:
+                ipc_payload = bytes(json.dumps(ipc_message), "utf-8")
+
+        if payload is None and (ipc_payload is None or 'mqtt' in protocols):
+            payload = bytes(json.dumps(message), "utf-8")
+        if ipc_payload is None:
+            ipc_payload = payload
+
+        # On the IPC only claim-check path the claim-check reference is the payload sent.
+        if self.traffic_capture:
+            for topic in topics:
+                self.traffic_capture.record('published', protocol, topic, ipc_payload if payload is None else payload)
+
+        legs = []
+        inactive = {}
+        for leg_protocol in protocols:
+            if self._is_leg_inactive(leg_protocol, leg_protocol, inactive):
+                continue
+            pubsub = self.ipc_pubsub if leg_protocol == 'ipc' else self.mqtt_pubsub
+            timeout = self._get_publish_timeout(leg_protocol, ipc_timeout if leg_protocol == 'ipc' else mqtt_timeout)
+            for topic in topics:
+                if leg_protocol == 'ipc' and self.ipc_loopback and self._publish_loopback(topic, message):
+                    continue
+                publish_bytes_async = pubsub.publish_bytes_to_topic_async if leg_protocol == 'ipc' else pubsub.publish_bytes_to_mqtt_async
+                legs.append(((leg_protocol, topic), functools.partial(publish_bytes_async, topic, ipc_payload if leg_protocol == 'ipc' else payload), 
+                    pubsub.wait_for_publish, topic, message, timeout))
+
+        results = {leg_protocol : {} for leg_protocol in protocols}
+        if 'ipc' in protocols:
+            # Topics delivered by IPC loopback only have no IPC publish leg.
+            results['ipc'] = {topic : None for topic in topics}
+        for leg_protocol, err in inactive.items():
+            results[leg_protocol] = {topic : err for topic in topics}
+        for (leg_protocol, topic), outcome in self._publish_legs_concurrently(legs).items():
+            results[leg_protocol][topic] = outcome
+
+        if span:
+            self.message_tracer.end_span(span, next((err for topic_results in results.values() for err in topic_results.values() if err), None))
+
+        return results
+
+    def publish_bytes(self, protocol, payload, topic=None, validate=None, ipc_timeout=None, mqtt_timeout=None):
+        '''
+        Publishes an already encoded payload to the respective AWS Greengrass Protocol (IPC or MQTT) Clients 
+        without decoding or re-serialising it. Intended for gateways forwarding payloads received from 
+        serial devices or other topics.
+        
+        ### Parameters  
+
+        **protocol**: str   
+        
+            The protocol client (IPC or MQTT) to publish the message too.
+            
+            Supported values:   
+            
+            * ipc: Publish to IPC message bus.
+            
+            * mqtt: Publish to MQTT message bus.
+            
+            * ipc_mqtt: Publish to both IPC and MQTT message buses concurrently.
+
+        **payload**: bytes, bytearray or memoryview   
+        
+            The encoded payload to forward. Is passed through to the protocol client without being copied.
+            
+        **topic**: str (Optional) Default: Component Egress Topic (i.e: base-pubsub-topic/THING_NAME/egress )
+            
+            The topic to publish this payload to on the selected protocol client
+
+        **validate**: str (Optional) Default: None  
+
+            Light weight check of the payload before publishing, doesn't parse the full payload.
+
+            * None: No validation.
+
+            * json: Payload looks like a JSON object or array (checks the enclosing brackets only).
+
+            * sdk: Payload looks like an SDK formatted message (JSON object with sdk_version and route fields in the message header).
+
+        **ipc_timeout** / **mqtt_timeout**: float (Optional) Default: Protocol client default timeout (10 secs)  
+
+            Time to wait for the respective publish to complete.
+
+        ### Returns
+
+        As per publish_message(), dict of the outcome of each protocol leg.
+
+        '''
+        
+        # If topic not set, default it to the components egress topic. 
+        if topic == None:
+            topic = self.egress_topic
+
+        if validate:
+            self._validate_payload(payload, validate)
+
+        if self.traffic_capture:
+            self.traffic_capture.record('published', protocol, topic, payload)
+
+        if protocol == 'ipc':
+            self.ipc_pubsub.publish_bytes_to_topic(topic, payload, ipc_timeout)
+            return {'ipc' : None}
 
         elif protocol == 'mqtt':
-            self.mqtt_pubsub.publish_to_mqtt(topic, message)
+            self.mqtt_pubsub.publish_bytes_to_mqtt(topic, payload, mqtt_timeout)
+            return {'mqtt' : None}
             
         elif protocol == 'ipc_mqtt':
-            self.ipc_pubsub.publish_to_topic(topic, message)
-            self.mqtt_pubsub.publish_to_mqtt(topic, message)
+            payload_desc = '<{} bytes>'.format(len(payload))
+            results = {}
+            legs = []
+            if not self._is_leg_inactive('ipc', 'ipc', results):
+                legs.append(('ipc', functools.partial(self.ipc_pubsub.publish_bytes_to_topic_async, topic, payload), 
+                    self.ipc_pubsub.wait_for_publish, topic, payload_desc, self._get_publish_timeout('ipc', ipc_timeout)))
+            if not self._is_leg_inactive('mqtt', 'mqtt', results):
+                legs.append(('mqtt', functools.partial(self.mqtt_pubsub.publish_bytes_to_mqtt_async, topic, payload), 
+                    self.mqtt_pubsub.wait_for_publish, topic, payload_desc, self._get_publish_timeout('mqtt', mqtt_timeout)))
+            results.update(self._publish_legs_concurrently(legs))
+            return results
 
         else:
-            raise Exception('Publish requested for unknown protocol {}. Supported Values: [ipc || mqtt || ipc_mqtt]',format(protocol))
+            raise Exception('Publish requested for unknown protocol {}. Supported Values: [ipc || mqtt || ipc_mqtt]'.format(protocol))
+
+    def _publish_loopback(self, topic, message):
+        '''
+        Delivers an SDK formatted message to each local IPC subscription matching the topic through the 
+        message dispatcher. Returns True if the message was delivered and in loopback only mode, so shouldn't be published to IPC.
+        '''
+
+        if not (isinstance(message, dict) and 'message' in message and all(field in message for field in LazyPubSubMessage.header_fields)):
+            return False
+
+        subscriptions = [subscription for subscription in self.ipc_subscribe_topics if topic_matches(subscription, topic)]
+        if not subscriptions:
+            return False
+
+        pubsub_message = PubSubMessage.from_dict(message)
+
+        for subscription in subscriptions:
+            # Each subscription receives its own echo, discarded before its message filter is applied.
+            if self.ipc_loopback == 'also':
+                self._add_loopback_message_id(subscription, pubsub_message.message_id)
+
+            message_filter = self.message_filters['ipc'].get(subscription)
+            if message_filter and not message_filter.accept(subscription, pubsub_message):
+                continue
+            self.message_dispatcher.submit(self._sdk_formatted_message_router, 'ipc', subscription, pubsub_message)
+
+        return self.ipc_loopback == 'only'
+
+    def _add_loopback_message_id(self, subscription, message_id):
+        '''
+        Records a message ID delivered by loopback to the subscription that will be received back from IPC.
+        Keyed by subscription topic as IPC passes received messages with the subscription topic and 
+        auto replies reuse the message ID of the message replied to.
+        '''
+
+        key = (subscription, message_id)
+        with self.loopback_lock:
+            self.loopback_message_ids[key] = self.loopback_message_ids.get(key, 0) + 1
+            # Bound the IDs held if echoes are never received (i.e: IPC not activated).
+            while len(self.loopback_message_ids) > 10000:
+                self.loopback_message_ids.popitem(last=False)
+
+    def _is_loopback_echo_payload(self, subscription, payload):
+        '''
+        Echo check called by the IPC subscription handlers with each received payload before the message filter. 
+        Returns True for the IPC copy of a message already delivered by IPC loopback. Chunks are checked once reassembled.
+        '''
+
+        if not self.loopback_message_ids:
+            return False
+
+        scanned = scan_header(payload)
+        if scanned is None or 'chunk' in scanned[0]:
+            return False
+
+        return self._is_loopback_echo(subscription, scanned[0]['message_id'])
+
+    def _is_loopback_echo(self, subscription, message_id):
+        '''
+        Returns True if the message ID was already delivered by loopback to the subscription and consumes one expected echo.
+        '''
+
+        key = (subscription, message_id)
+        with self.loopback_lock:
+            echo_count = self.loopback_message_ids.get(key)
+            if not echo_count:
+                return False
+            if echo_count == 1:
+                del self.loopback_message_ids[key]
+            else:
+                self.loopback_message_ids[key] = echo_count - 1
+            return True
+
+    def _validate_payload(self, payload, validate):
+        '''
+        Light weight structural validation of an encoded payload. Only inspects the 
+        payload boundaries and message header so is cheap for large payloads.
+        '''
+
+        view = memoryview(payload)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+
+        # Strip leading / trailing whitespace by index to avoid copying the payload.
+        start, end = 0, len(view)
+        while start < end and view[start] in b' \t\r\n':
+            start += 1
+        while end > start and view[end - 1] in b' \t\r\n':
+            end -= 1
+
+        if end - start < 2 or (view[start], view[end - 1]) not in ((ord('{'), ord('}')), (ord('['), ord(']'))):
+            raise Exception('Payload failed {} validation. Not a JSON object or array.'.format(validate))
+
+        if validate == 'sdk':
+            # SDK formatted messages serialise the header fields ahead of the message body.
+            header = bytes(view[start:start + 512])
+            if view[start] != ord('{') or not b'"sdk_version"' in header or not b'"route"' in header:
+                raise Exception('Payload failed sdk validation. Not an AWS Greengrass PubSub SDK formatted message.')
+
+        elif validate != 'json':
+            raise Exception('Unknown payload validation: {}. Supported Values: [json || sdk]'.format(validate))
+
+    def _get_publish_timeout(self, protocol, timeout):
+        '''
+        Returns the given publish timeout or the default timeout of the protocol client if None.
+        '''
+
+        if timeout != None:
+            return timeout
+
+        if protocol == 'ipc':
+            return self.ipc_pubsub.ipc_default_timeout
+
+        return self.mqtt_pubsub.mqtt_default_timeout
+
+    def _is_leg_inactive(self, protocol, key, results):
+        '''
+        Returns True and records a failed result for the publish leg key in results 
+        if the protocol client hasn't been activated, else False.
+        '''
+
+        if self.is_ipc_active if protocol == 'ipc' else self.is_mqtt_active:
+            return False
+
+        results[key] = Exception('Publish requested on {} but the {} PubSub client is not activated.'.format(protocol, protocol.upper()))
+        log.error('Publish failed on: {} - ERROR: {}'.format(key, results[key]))
+        return True
+
+    def _publish_legs_concurrently(self, legs):
+        '''
+        Issues the publish on every leg before waiting on any of them, then collects 
+        each leg's outcome against a deadline measured from when that leg was issued.
+        
+        legs is a list of (key, publish_async, wait_for_publish, topic, message, timeout) tuples 
+        where publish_async() issues the publish and returns its response future.
+        Returns a dict of key: None (success) or the Exception raised for that leg.
+        '''
+
+        results = {}
+        pending = []
+
+        # Issue all legs first so no leg waits on another leg's round trip.
+        for key, publish_async, wait_for_publish, topic, message, timeout in legs:
+            try:
+                future = publish_async()
+                pending.append((key, future, wait_for_publish, topic, message, time.monotonic() + timeout))
+            except Exception as err:
+                results[key] = err
+
+        # Collect each leg against its own deadline.
+        for key, future, wait_for_publish, topic, message, deadline in pending:
+            try:
+                wait_for_publish(future, topic, message, max(deadline - time.monotonic(), 0))
+                results[key] = None
+            except Exception as err:
+                results[key] = err
+
+        for key, err in results.items():
+            if err:
+                log.error('Publish failed on: {} - ERROR: {}'.format(key, err))
+
+        return results
 
     def publish_error(self, protocol, err_message):
         '''
@@ -410,7 +2024,7 @@ class AwsGreengrassPubSubSdkClient():
     ### Custom topic subscriber
     ##################################################
 
-    def subscribe_to_topic(self, protocol, topic):
+    def subscribe_to_topic(self, protocol, topic, message_filter=None):
         '''
         Subscribes to custom PubSub topics on IPC and / or MQTT clients. 
         If the given protocol client has been activated, then the subscription will take immediate effect
@@ -435,6 +2049,24 @@ class AwsGreengrassPubSubSdkClient():
 
         **topic**: str
             The topic to subscribe too.
+
+        **message_filter**: dict or message_filter.SubscriptionFilter (Optional)
+
+            Sampling / decimation filter for messages received on this subscription. Messages are filtered on 
+            the stream thread before being decoded or dispatched to the message handlers. A dict is converted 
+            to a SubscriptionFilter with separate counters per protocol. Supported filters:
+
+            * every_nth: Accept only every Nth message per key.
+            * max_rate: Accept at most max_rate messages per second per key.
+            * key: Key for every_nth / max_rate, 'topic' (default), 'route' or function(topic, payload).
+            * topic_predicate: Function(topic) that returns True to accept messages on the topic.
+            * max_keys: Max keys the every_nth / max_rate state is held for (default 10000).
+
+            Chunked messages are filtered as one message on their first chunk.
+
+            e.g: message_filter={'max_rate' : 1, 'key' : 'route'}
+
+            Calling again for an already subscribed topic with a message_filter replaces its filter.
             
         '''
         
@@ -443,36 +2075,53 @@ class AwsGreengrassPubSubSdkClient():
 
         # Subscribe to requested topic on IPC / MQTT protocols.
         if protocol =='ipc':
-            self._subscribe_to_ipc_topic(topic)
+            self._subscribe_to_ipc_topic(topic, SubscriptionFilter.from_config(message_filter))
         
         elif protocol =='mqtt':
-            self._subscribe_to_mqtt_topic(topic)
+            self._subscribe_to_mqtt_topic(topic, SubscriptionFilter.from_config(message_filter))
             
         elif protocol =='ipc_mqtt':
-            self._subscribe_to_ipc_topic(topic)
-            self._subscribe_to_mqtt_topic(topic)
+            self._subscribe_to_ipc_topic(topic, SubscriptionFilter.from_config(message_filter))
+            self._subscribe_to_mqtt_topic(topic, SubscriptionFilter.from_config(message_filter))
 
         else:
-            raise Exception('Requested subscribe to topic: {} for unknown protocol {}. Supported Values: [ipc || mqtt || ipc_mqtt]',format(topic, protocol))
+            raise Exception('Requested subscribe to topic: {} for unknown protocol {}. Supported Values: [ipc || mqtt || ipc_mqtt]'.format(topic, protocol))
+
+    def get_message_filter_stats(self):
+        '''
+        Returns a dict by protocol and topic of received and filtered message counts of subscriptions with a message filter.
+        '''
 
-    def _subscribe_to_ipc_topic(self, topic):
+        return {protocol : {topic : message_filter.get_stats() for topic, message_filter in message_filters.items()} 
+                for protocol, message_filters in self.message_filters.items()}
+
+    def _subscribe_to_ipc_topic(self, topic, message_filter=None):
         '''
         Private helper to subscribe to an IPC client topic. 
         '''
         
         if not topic in self.ipc_subscribe_topics:
             self.ipc_subscribe_topics.append(topic)
+
+        if message_filter:
+            self.message_filters['ipc'][topic] = message_filter
             
         if self.is_ipc_active:
-             self.ipc_pubsub.subscribe_to_topic(topic)
+             self.ipc_pubsub.subscribe_to_topic(topic, message_filter)
              
-    def _subscribe_to_mqtt_topic(self, topic):
+    def _subscribe_to_mqtt_topic(self, topic, message_filter=None):
         '''
         Private helper to subscribe to an MQTT client topic. 
         '''
         
         if not topic in self.mqtt_subscribe_topics:
             self.mqtt_subscribe_topics.append(topic)
+
+        if message_filter:
+            self.message_filters['mqtt'][topic] = message_filter
             
         if self.is_mqtt_active:
-             self.mqtt_pubsub.subscribe_to_topic(topic)
+             self.mqtt_pubsub.subscribe_to_topic(topic, message_filter)
+
+# End of the SDK import time reported in get_startup_timings().
+_import_completed = time.perf_counter()
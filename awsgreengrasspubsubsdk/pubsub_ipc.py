@@ -22,6 +22,7 @@ __author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
 
 import json
 import logging
+import functools
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 import awsiot.greengrasscoreipc
@@ -40,7 +41,7 @@ log = logging.getLogger(__name__)
 
 class IpcPubSub():
 
-    def __init__(self, message_callback, ipc_subscribe_topics):
+    def __init__(self, message_callback, ipc_subscribe_topics, zero_copy_receive=False, executor=None, rate_limiter=None, message_filters=None, echo_check=None):
 
             
         super().__init__()
@@ -59,13 +60,28 @@ class IpcPubSub():
         # List of active topics subscribed too.
         self.ipc_subscribed_topics = []
 
+        # Subscription handlers and message_filter.SubscriptionFilter applied to received messages by topic.
+        self.subscribe_handlers = {}
+        self.message_filters = dict(message_filters) if message_filters else {}
+
+        # If True, pass received payloads to the message callback as a memoryview of 
+        # the received buffer rather than copying into a decoded str.
+        self.zero_copy_receive = zero_copy_receive
+
+        # Optional publish_limiter.PublishRateLimiter applied to all publishes.
+        self.rate_limiter = rate_limiter
+
+        # Optional echo_check(subscription topic, payload) that returns True for received payloads to discard 
+        # before the message filter, i.e: the IPC copy of a message already delivered by IPC loopback.
+        self.echo_check = echo_check
+
         # Create the ipc_clients.
         self.ipc_subscribe_client = awsiot.greengrasscoreipc.connect()
         self.ipc_publish_client = awsiot.greengrasscoreipc.connect()
 
-        # Create ThreadPoolExecutor to process PubSub messages.
+        # Executor to process PubSub messages, defaults to a ThreadPoolExecutor.
         # Changed in version 3.8: Default max_workers changed to min(32, os.cpu_count() + 4).
-        self.executor = ThreadPoolExecutor(max_workers=None)
+        self.executor = executor if executor else ThreadPoolExecutor(max_workers=None)
 
         # Init IPC PubSub's.
         self._init_topic_subscriber()
@@ -78,6 +94,9 @@ class IpcPubSub():
     def set_ipc_default_timeout(self, ipc_default_timeout):
         self.ipc_default_timeout = ipc_default_timeout
 
+    def set_rate_limiter(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+
     ###############################################
     # IPC Topic PubSub Functions
     def _init_topic_subscriber(self):
@@ -88,17 +107,29 @@ class IpcPubSub():
         for subscribe_topic in self.ipc_subscribe_topics:
             self.subscribe_to_topic(subscribe_topic)
 
-    def subscribe_to_topic(self, topic):
+    def subscribe_to_topic(self, topic, message_filter=None):
+        '''
+            Subscribe to an IPC local topic. The optional message_filter.SubscriptionFilter is evaluated 
+            on the stream thread and messages it filters out are never submitted for processing.
+            If already subscribed, a given message_filter replaces the topic's current filter.
+        '''
 
         log.info('IPC SDK Subscribing to Topic: {}:'.format(topic))
+
+        if message_filter:
+            self.message_filters[topic] = message_filter
         
         if (topic in self.ipc_subscribed_topics):
+            if message_filter:
+                self.subscribe_handlers[topic].message_filter = message_filter
+                log.info('Updated message filter on subscribed IPC topic: {}'.format(topic))
             log.info('Returning with no action. Already subscribed to IPC topic: {}'.format(topic))
             return
         
         request = SubscribeToTopicRequest()
         request.topic = topic
-        handler = IpcPubSub._IpcSubscribeHandler(self.message_callback, topic, self.executor)
+        handler = IpcPubSub._IpcSubscribeHandler(self.message_callback, topic, self.executor, self.zero_copy_receive, self.message_filters.get(topic), self.echo_check)
+        self.subscribe_handlers[topic] = handler
         operation = self.ipc_subscribe_client.new_subscribe_to_topic(handler)
         future = operation.activate(request)
         # call the result to ensure the future has completed.
@@ -110,45 +141,119 @@ class IpcPubSub():
     def _init_topic_publisher(self):
         '''
             Initialise publisher to requested IPC local topics.
+            
+            Publish requests are built per call so concurrent publishes
+            (i.e: from multiple message handler threads) don't share request state.
         '''
 
         log.info('Initialising IPC Topic Publisher.')
-        self.pub_request = PublishToTopicRequest()
-        self.publish_message = PublishMessage()
-        self.publish_message.binary_message = BinaryMessage()
 
     def publish_to_topic(self, topic, message_object, timeout=None):
         '''
             Publish a Python object sterilised as a JSON message to the requested local IPC topic.
         '''
         
+        future = self.publish_to_topic_async(topic, message_object)
+        self.wait_for_publish(future, topic, message_object, timeout)
+
+    def publish_to_topic_async(self, topic, message_object):
+        '''
+            Issue a publish of a Python object sterilised as a JSON message to the requested local IPC topic
+            without waiting on the response. Returns the publish response future that can be passed to 
+            wait_for_publish() to collect the outcome.
+        '''
+        
         try:
             log.debug('IPC Publish - Topic: {} - Message: {}'.format(topic, message_object))
             
-            self.pub_request.topic = topic
             json_message = json.dumps(message_object)
-            self.publish_message.binary_message.message = bytes(json_message, "utf-8")
-            self.pub_request.publish_message = self.publish_message
-            operation = self.ipc_publish_client.new_publish_to_topic()
-            operation.activate(self.pub_request)
-            future = operation.get_response()
-            future.result(timeout if timeout else self.ipc_default_timeout)
+            return self._publish_payload_async(topic, bytes(json_message, "utf-8"))
+
+        except Exception as err:
+            self._raise_publish_error(err, topic, message_object)
+
+    def wait_for_publish(self, future, topic, message_object, timeout=None):
+        '''
+            Block on a publish response future returned from publish_to_topic_async() for up to timeout secs 
+            (or the IPC default timeout if None). Raises an Exception if the publish failed or timed out.
+        '''
+        
+        try:
+            future.result(timeout if timeout != None else self.ipc_default_timeout)
+
+        except Exception as err:
+            self._raise_publish_error(err, topic, message_object)
+
+    def publish_bytes_to_topic(self, topic, payload, timeout=None):
+        '''
+            Publish an already encoded payload (bytes, bytearray or memoryview) to the requested local IPC topic.
+            The payload is forwarded as given without being decoded, re-serialised or copied.
+        '''
+        
+        future = self.publish_bytes_to_topic_async(topic, payload)
+        self.wait_for_publish(future, topic, '<{} bytes>'.format(len(payload)), timeout)
 
-        except KeyError as key_error:
-            raise Exception('KeyError occurred publishing to IPC topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(key_error, topic, message_object))
+    def publish_bytes_to_topic_async(self, topic, payload):
+        '''
+            Issue a publish of an already encoded payload (bytes, bytearray or memoryview) to the requested 
+            local IPC topic without waiting on the response. Returns the publish response future that can be 
+            passed to wait_for_publish() to collect the outcome.
+        '''
+        
+        try:
+            log.debug('IPC Publish Bytes - Topic: {} - Payload Length: {}'.format(topic, len(payload)))
 
-        except concurrent.futures.TimeoutError as timeout_error:
-            raise Exception('Timeout occurred publishing to IPC topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(timeout_error, topic, message_object))
+            if not isinstance(payload, (bytes, bytearray, memoryview)):
+                raise TypeError('Expected bytes, bytearray or memoryview payload but received: {}'.format(type(payload).__name__))
 
-        except UnauthorizedError as unauth_error:
-            raise Exception('Unauthorized error publishing to IPC topic. ERROR {} - TOPIC {} - MESSAGE: {}'.format(unauth_error, topic, message_object))
+            return self._publish_payload_async(topic, payload)
 
         except Exception as err:
+            self._raise_publish_error(err, topic, '<{} payload>'.format(type(payload).__name__))
+
+    def _publish_payload_async(self, topic, payload):
+        '''
+            Activates an IPC publish operation for the given encoded payload and returns the response future. 
+            The publish is issued within the rate limit if a rate limiter is set.
+        '''
+
+        if self.rate_limiter:
+            return self.rate_limiter.publish(topic, functools.partial(self._activate_publish, topic, payload))
+
+        return self._activate_publish(topic, payload)
+
+    def _activate_publish(self, topic, payload):
+        
+        publish_message = PublishMessage()
+        publish_message.binary_message = BinaryMessage()
+        publish_message.binary_message.message = payload
+        pub_request = PublishToTopicRequest()
+        pub_request.topic = topic
+        pub_request.publish_message = publish_message
+        operation = self.ipc_publish_client.new_publish_to_topic()
+        operation.activate(pub_request)
+        return operation.get_response()
+
+    def _raise_publish_error(self, err, topic, message_object):
+        '''
+            Re-raises a publish exception with the IPC topic and message detail attached.
+        '''
+
+        if isinstance(err, KeyError):
+            raise Exception('KeyError occurred publishing to IPC topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(err, topic, message_object))
+
+        elif isinstance(err, concurrent.futures.TimeoutError):
+            raise Exception('Timeout occurred publishing to IPC topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(err, topic, message_object))
+
+        elif isinstance(err, UnauthorizedError):
+            raise Exception('Unauthorized error publishing to IPC topic. ERROR {} - TOPIC {} - MESSAGE: {}'.format(err, topic, message_object))
+
+        else:
             raise Exception('Exception publishing to IPC topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(err,  topic, message_object))
 
     class _IpcSubscribeHandler(client.SubscribeToTopicStreamHandler):
 
-        def __init__(self, message_callback, ipc_subscribe_topic, executor):
+        def __init__(self, message_callback, ipc_subscribe_topic, executor, zero_copy_receive=False, message_filter=None, echo_check=None):
 
             log.info('Initialising AWS Greengrass V2 IPC Topic Subscriber: {}'.format(ipc_subscribe_topic))
 
@@ -162,13 +267,33 @@ class IpcPubSub():
             # PubSub message process ThreadExecutor
             self.executor = executor
 
+            # Pass payloads as memoryview of the received buffer rather than a decoded str.
+            self.zero_copy_receive = zero_copy_receive
+
+            # Sampling / decimation filter evaluated before the message is decoded and submitted.
+            self.message_filter = message_filter
+
+            # Discards echoes of messages already delivered by IPC loopback, before they are counted by the message_filter.
+            self.echo_check = echo_check
+
         # Topic subscription event handlers 
         def on_stream_event(self, event: SubscriptionResponseMessage) -> None:
             try:
 
-                log.debug('IPC EVENT RECEIVED: {}'.format(event))
+                # Only format the event if debug is enabled as it includes the full payload.
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug('IPC EVENT RECEIVED: {}'.format(event))
+
+                if self.echo_check and self.echo_check(self.ipc_subscribe_topic, event.binary_message.message):
+                    return
+
+                if self.message_filter and not self.message_filter.accept(self.ipc_subscribe_topic, event.binary_message.message):
+                    return
 
-                message = str(event.binary_message.message, "utf-8")
+                if self.zero_copy_receive:
+                    message = memoryview(event.binary_message.message)
+                else:
+                    message = str(event.binary_message.message, "utf-8")
                 
                 self.executor.submit(self.message_callback, "ipc", self.ipc_subscribe_topic, message)
 
@@ -0,0 +1,305 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+In process stand-in for the AWS Greengrass IPC and MQTT PubSub clients.
+
+LocalPubSub and LocalMqttPubSub implement the same interface as IpcPubSub and MqttPubSub
+but publish to an in process LocalPubSubBus rather than the Greengrass nucleus. Messages are
+serialised on publish and delivered as encoded bytes from a bus delivery thread as they would
+be from the nucleus so the full message path can be run, tested and benchmarked off device
+and without the awsiotsdk installed.
+
+Activate with:
+
+```
+pubsub_client.activate_ipc_pubsub(pubsub_class=LocalPubSub)
+pubsub_client.activate_mqtt_pubsub(pubsub_class=LocalMqttPubSub)
+```
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import json
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+def topic_matches(subscription, topic):
+    '''
+    Returns True if the topic matches the subscription topic filter with MQTT style + and # wildcards.
+    '''
+
+    if subscription == topic:
+        return True
+
+    if '+' not in subscription and '#' not in subscription:
+        return False
+
+    sub_levels = subscription.split('/')
+    topic_levels = topic.split('/')
+    for idx, sub_level in enumerate(sub_levels):
+        if sub_level == '#':
+            return True
+        if idx >= len(topic_levels):
+            return False
+        if sub_level != '+' and sub_level != topic_levels[idx]:
+            return False
+
+    return len(sub_levels) == len(topic_levels)
+
+class LocalPubSubBus():
+    '''
+    In process message bus that delivers published payloads to matching subscriptions from a single
+    delivery thread, as the Greengrass nucleus delivers to a component's subscription stream.
+    '''
+
+    def __init__(self):
+
+        self.subscriptions = []
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._queue_available = threading.Condition(self._lock)
+        self._thread = None
+
+    def subscribe(self, topic, on_message):
+        '''
+        Subscribes the on_message(topic, payload) callback to the topic filter.
+        '''
+
+        with self._lock:
+            self.subscriptions.append((topic, on_message))
+
+    def unsubscribe_all(self, on_messages):
+        '''
+        Removes all subscriptions of the given on_message callbacks.
+        '''
+
+        with self._lock:
+            self.subscriptions = [sub for sub in self.subscriptions if sub[1] not in on_messages]
+
+    def publish(self, topic, payload):
+        '''
+        Queues the payload for delivery and returns a completed publish response future.
+        '''
+
+        # Copy the payload as it's sent to the nucleus, the publisher may reuse its buffer.
+        payload = bytes(payload)
+        with self._lock:
+            self._queue.append((topic, payload))
+            self._queue_available.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._deliver, name='LocalPubSubBus', daemon=True)
+                self._thread.start()
+
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def _deliver(self):
+
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._queue_available.wait()
+                topic, payload = self._queue.popleft()
+                subscriptions = self.subscriptions
+
+            for subscription, on_message in subscriptions:
+                if topic_matches(subscription, topic):
+                    try:
+                        on_message(topic, payload)
+                    except Exception as err:
+                        log.error('EXCEPTION: Exception Raised from Local PubSub Subscriber. ERROR: {} - TOPIC: {}'.format(err, topic))
+
+# Default buses shared by all local clients in the process.
+ipc_bus = LocalPubSubBus()
+mqtt_bus = LocalPubSubBus()
+
+class _LocalPubSubClient():
+    '''
+    Shared implementation of the local IPC and MQTT stand-in clients.
+    '''
+
+    protocol = None
+
+    def __init__(self, message_callback, subscribe_topics, zero_copy_receive=False, executor=None, rate_limiter=None, message_filters=None, echo_check=None, bus=None):
+
+        super().__init__()
+
+        log.info('Initialising / Activating Local {} PubSub Client....'.format(self.protocol.upper()))
+
+        self.default_timeout = 10
+        self.message_callback = message_callback
+        self.subscribe_topics = subscribe_topics
+        self.subscribed_topics = []
+        self.zero_copy_receive = zero_copy_receive
+        self.executor = executor if executor else ThreadPoolExecutor(max_workers=None)
+        self.rate_limiter = rate_limiter
+        self.subscribe_handlers = {}
+        self.message_filters = dict(message_filters) if message_filters else {}
+        self.echo_check = echo_check
+        self.bus = bus if bus else (ipc_bus if self.protocol == 'ipc' else mqtt_bus)
+
+        for subscribe_topic in self.subscribe_topics:
+            self.subscribe_to_topic(subscribe_topic)
+
+        log.info('Initialising / Activating Local {} PubSub Client Complete'.format(self.protocol.upper()))
+
+    def set_rate_limiter(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+
+    def subscribe_to_topic(self, topic, message_filter=None):
+
+        if message_filter:
+            self.message_filters[topic] = message_filter
+
+        if topic in self.subscribed_topics:
+            if message_filter:
+                self.subscribe_handlers[topic].message_filter = message_filter
+            return
+
+        handler = _LocalSubscribeHandler(self.message_callback, self.protocol, topic, self.executor, self.zero_copy_receive, self.message_filters.get(topic), self.echo_check)
+        self.subscribe_handlers[topic] = handler
+        self.bus.subscribe(topic, handler.on_message)
+        self.subscribed_topics.append(topic)
+
+    def close(self):
+        '''
+        Removes this client's subscriptions from the bus.
+        '''
+        self.bus.unsubscribe_all([handler.on_message for handler in self.subscribe_handlers.values()])
+
+    def _publish(self, topic, message_object, timeout=None):
+        future = self._publish_async(topic, message_object)
+        self.wait_for_publish(future, topic, message_object, timeout)
+
+    def _publish_async(self, topic, message_object):
+        try:
+            return self._publish_payload_async(topic, bytes(json.dumps(message_object), "utf-8"))
+        except Exception as err:
+            self._raise_publish_error(err, topic, message_object)
+
+    def _publish_bytes(self, topic, payload, timeout=None):
+        future = self._publish_bytes_async(topic, payload)
+        self.wait_for_publish(future, topic, '<{} bytes>'.format(len(payload)), timeout)
+
+    def _publish_bytes_async(self, topic, payload):
+        try:
+            if not isinstance(payload, (bytes, bytearray, memoryview)):
+                raise TypeError('Expected bytes, bytearray or memoryview payload but received: {}'.format(type(payload).__name__))
+            return self._publish_payload_async(topic, payload)
+        except Exception as err:
+            self._raise_publish_error(err, topic, '<{} payload>'.format(type(payload).__name__))
+
+    def wait_for_publish(self, future, topic, message_object, timeout=None):
+        try:
+            future.result(timeout if timeout != None else self.default_timeout)
+        except Exception as err:
+            self._raise_publish_error(err, topic, message_object)
+
+    def _publish_payload_async(self, topic, payload):
+
+        if self.rate_limiter:
+            return self.rate_limiter.publish(topic, lambda: self.bus.publish(topic, payload))
+
+        return self.bus.publish(topic, payload)
+
+    def _raise_publish_error(self, err, topic, message_object):
+
+        if isinstance(err, concurrent.futures.TimeoutError):
+            raise Exception('Timeout occurred publishing to Local {} topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(self.protocol.upper(), err, topic, message_object))
+
+        raise Exception('Exception publishing to Local {} topic. ERROR: {} - TOPIC {} - MESSAGE: {}'.format(self.protocol.upper(), err, topic, message_object))
+
+class LocalPubSub(_LocalPubSubClient):
+    '''
+    In process stand-in for pubsub_ipc.IpcPubSub.
+    '''
+
+    protocol = 'ipc'
+
+    @property
+    def ipc_default_timeout(self):
+        return self.default_timeout
+
+    @property
+    def ipc_subscribed_topics(self):
+        return self.subscribed_topics
+
+    def set_ipc_default_timeout(self, ipc_default_timeout):
+        self.default_timeout = ipc_default_timeout
+
+    publish_to_topic = _LocalPubSubClient._publish
+    publish_to_topic_async = _LocalPubSubClient._publish_async
+    publish_bytes_to_topic = _LocalPubSubClient._publish_bytes
+    publish_bytes_to_topic_async = _LocalPubSubClient._publish_bytes_async
+
+class LocalMqttPubSub(_LocalPubSubClient):
+    '''
+    In process stand-in for pubsub_mqtt.MqttPubSub.
+    '''
+
+    protocol = 'mqtt'
+
+    @property
+    def mqtt_default_timeout(self):
+        return self.default_timeout
+
+    @property
+    def mqtt_subscribed_topics(self):
+        return self.subscribed_topics
+
+    def set_mqtt_default_timeout(self, mqtt_default_timeout):
+        self.default_timeout = mqtt_default_timeout
+
+    def set_mqtt_default_qos(self, mqtt_default_qos):
+        # The local bus always delivers, QoS is accepted for interface compatibility.
+        self.mqtt_default_qos = mqtt_default_qos
+
+    publish_to_mqtt = _LocalPubSubClient._publish
+    publish_to_mqtt_async = _LocalPubSubClient._publish_async
+    publish_bytes_to_mqtt = _LocalPubSubClient._publish_bytes
+    publish_bytes_to_mqtt_async = _LocalPubSubClient._publish_bytes_async
+
+class _LocalSubscribeHandler():
+    '''
+    Local bus subscription handler, processes received payloads as the IPC / MQTT stream handlers do.
+    As IPC does, received IPC messages are passed with the subscription topic (filter) rather than the published topic.
+    '''
+
+    def __init__(self, message_callback, protocol, subscribe_topic, executor, zero_copy_receive=False, message_filter=None, echo_check=None):
+
+        self.message_callback = message_callback
+        self.protocol = protocol
+        self.subscribe_topic = subscribe_topic
+        self.executor = executor
+        self.zero_copy_receive = zero_copy_receive
+        self.message_filter = message_filter
+        self.echo_check = echo_check
+
+    def on_message(self, topic, payload):
+
+        if self.protocol == 'ipc':
+            topic = self.subscribe_topic
+
+        if self.echo_check and self.echo_check(topic, payload):
+            return
+
+        if self.message_filter and not self.message_filter.accept(topic, payload):
+            return
+
+        if self.zero_copy_receive:
+            message = memoryview(payload)
+        else:
+            message = str(payload, "utf-8")
+
+        self.executor.submit(self.message_callback, self.protocol, topic, message)
@@ -0,0 +1,366 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Typed PubSub SDK message objects and lazy, route-first decoding of received messages.
+
+The SDK message header fields (sdk_version, message_id, status and route) are all that
+is needed to validate and route a message. The PubSubMessageFormatter serialises these
+ahead of the message body so they can be extracted without parsing the body, which is
+only parsed if and when a message handler accesses it.
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import re
+import json
+import time
+import codecs
+from collections.abc import Mapping
+from json.decoder import scanstring
+
+# Max bytes of a binary payload decoded to scan for the message header.
+HEADER_SCAN_BYTES = 4096
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+_header_fields = ('sdk_version', 'message_id', 'status', 'route')
+
+def scan_header(payload):
+    '''
+    Scans the top level JSON object fields of an SDK message payload up to the message body
+    without parsing the body. Cheap enough to call on the IPC / MQTT stream threads.
+
+    Returns a tuple of the (header fields dict, message body offset) where the offset is in
+    characters for str payloads or bytes for bytes / memoryview payloads. Returns None if any
+    required header field isn't found before the message body or the payload isn't valid.
+
+    ### Parameters
+
+    **payload**: str, bytes or memoryview
+
+        The received JSON payload.
+    '''
+
+    try:
+        if isinstance(payload, str):
+            text = payload
+        elif len(payload) > HEADER_SCAN_BYTES:
+            # Incremental decoder holds back a truncated trailing multi-byte character rather than raising.
+            text = codecs.getincrementaldecoder('utf-8')().decode(payload[:HEADER_SCAN_BYTES])
+        else:
+            text = str(payload, 'utf-8')
+
+        idx = _whitespace.match(text, 0).end()
+        if text[idx] != '{':
+            return None
+
+        header = {}
+        idx += 1
+        while True:
+            idx = _whitespace.match(text, idx).end()
+            if text[idx] != '"':
+                return None
+
+            key, idx = scanstring(text, idx + 1)
+            idx = _whitespace.match(text, idx).end()
+            if text[idx] != ':':
+                return None
+            idx = _whitespace.match(text, idx + 1).end()
+
+            if key == 'message':
+                if not all(field in header for field in _header_fields):
+                    return None
+                return header, idx if isinstance(payload, str) else len(text[:idx].encode('utf-8'))
+
+            header[key], idx = _decoder.raw_decode(text, idx)
+            idx = _whitespace.match(text, idx).end()
+            if text[idx] != ',':
+                return None
+            idx += 1
+
+    except (IndexError, ValueError, UnicodeDecodeError):
+        # Header extends beyond the scanned prefix or is malformed.
+        return None
+
+class PubSubMessage():
+    '''
+    Compact, typed representation of a PubSub SDK well formatted message. 
+    
+    Can be used in place of the message dict returned by PubSubMessageFormatter.get_message() 
+    when publishing and is passed to message handlers that accept a single pubsub_message parameter:
+    
+    ```
+    def my_route(self, protocol, topic, pubsub_message):
+        log.info('Received: {} - {}'.format(pubsub_message.message_id, pubsub_message.message))
+    ```
+
+    Conversion to and from the message dict references the message body rather than copying it.
+
+    The optional header fields are expires_at, the epoch time in secs after which the message is dropped 
+    by the receiver, trace, the trace context dict added by message tracing and is_reply, True for message 
+    handler auto replies so receivers don't auto reply to them.
+    '''
+
+    __slots__ = ('sdk_version', 'message_id', 'status', 'route', 'message', 'expires_at', 'trace', 'is_reply')
+
+    def __init__(self, sdk_version, message_id, status, route, message, expires_at=None, trace=None, is_reply=False):
+        self.sdk_version = sdk_version
+        self.message_id = message_id
+        self.status = status
+        self.route = route
+        self.message = message
+        self.expires_at = expires_at
+        self.trace = trace
+        self.is_reply = is_reply
+
+    @classmethod
+    def from_dict(cls, message):
+        '''
+        Returns a PubSubMessage from an SDK well formatted message dict. 
+        '''
+        return cls(message['sdk_version'], message['message_id'], message['status'], message['route'], message['message'], message.get('expires_at'), message.get('trace'), message.get('is_reply', False))
+
+    def to_dict(self):
+        '''
+        Returns the SDK well formatted message dict to serialise this message.
+        '''
+
+        message = {
+            'sdk_version' : self.sdk_version,
+            'message_id' : self.message_id,
+            'status' : self.status,
+            'route' : self.route
+        }
+
+        # Optional header fields are serialised ahead of the message body so they are found by scan_header().
+        if self.expires_at is not None:
+            message['expires_at'] = self.expires_at
+        if self.trace is not None:
+            message['trace'] = self.trace
+        if self.is_reply:
+            message['is_reply'] = True
+
+        message['message'] = self.message
+        return message
+
+    def is_expired(self, now=None):
+        '''
+        Returns True if the message has an expires_at time that has passed.
+        '''
+
+        if self.expires_at is None:
+            return False
+
+        return self.expires_at < (now if now is not None else time.time())
+
+    def is_sdk_formatted(self):
+        '''
+        Returns True if all SDK message fields are present.
+        '''
+        return True
+
+    def __repr__(self):
+        return 'PubSubMessage({})'.format(self.to_dict())
+
+class LazyPubSubMessage(PubSubMessage):
+    '''
+    A received PubSub SDK message that extracts the header fields on construction
+    and defers parsing the message body until it is first accessed.
+
+    Header fields are scanned from the start of the payload up to the message body.
+    If any required header field isn't found before the body (i.e: a message serialised
+    with a different field order) the full payload is parsed instead.
+
+    ### Parameters
+
+    **payload**: str, bytes or memoryview
+
+        The received JSON payload.
+
+    ### Raises
+
+    ValueError if the payload is not valid JSON.
+    '''
+
+    __slots__ = ('header', '_payload', '_body_offset', '_has_message', '_message', '_is_parsed')
+
+    header_fields = _header_fields
+
+    def __init__(self, payload):
+
+        self._payload = payload
+        self._body_offset = None
+        self._has_message = False
+        self._message = None
+        self._is_parsed = False
+
+        self.header = self._scan_header()
+        if self.header is None:
+            self._parse_full_payload()
+
+        header = self.header
+        self.sdk_version = header.get('sdk_version')
+        self.message_id = header.get('message_id')
+        self.status = header.get('status')
+        self.route = header.get('route')
+        self.expires_at = header.get('expires_at')
+        self.trace = header.get('trace')
+        self.is_reply = header.get('is_reply', False)
+
+    def is_sdk_formatted(self):
+        '''
+        Returns True if all SDK message fields are present.
+        '''
+
+        return self._has_message and all(field in self.header for field in self.header_fields)
+
+    ###############################################
+    # Message Body
+
+    @property
+    def is_parsed(self):
+        '''
+        True once the message body has been parsed.
+        '''
+        return self._is_parsed
+
+    @property
+    def message(self):
+        '''
+        The message body, parsed on first access.
+        '''
+
+        if not self._is_parsed:
+            self._parse_body()
+
+        return self._message
+
+    def lazy_message(self):
+        '''
+        Returns a LazyMessageBody that parses the message body when first accessed.
+        '''
+        return LazyMessageBody(self)
+
+    def get_raw_body(self):
+        '''
+        Returns the unparsed JSON text (str) or bytes (memoryview) of the payload from the start of the message body
+        or None if the message body has already been parsed. Any fields following the message body are included.
+        '''
+
+        if self._is_parsed or self._body_offset is None:
+            return None
+
+        return self._payload[self._body_offset:]
+
+    ###############################################
+    # Parsers
+
+    def _scan_header(self):
+        '''
+        Scans the message header fields, returns the header fields dict or None if they 
+        can't be extracted without a full parse.
+        '''
+
+        scanned = scan_header(self._payload)
+        if scanned is None:
+            return None
+
+        header, self._body_offset = scanned
+        self._has_message = True
+        return header
+
+    def _parse_body(self):
+        '''
+        Parses only the message body from the body offset found by the header scan.
+        Falls back to a full parse if the body is not the last field in the message.
+        '''
+
+        payload = self._payload
+        if isinstance(payload, str):
+            text = payload
+            idx = self._body_offset
+        else:
+            text = str(payload[self._body_offset:], 'utf-8')
+            idx = 0
+
+        message, idx = _decoder.raw_decode(text, idx)
+        if text[idx:].strip() != '}':
+            self._parse_full_payload()
+            return
+
+        self._message = message
+        self._is_parsed = True
+
+    def _parse_full_payload(self):
+        '''
+        Parses the full payload and sets the header fields and message body from it.
+        '''
+
+        payload = self._payload
+        if isinstance(payload, memoryview):
+            # Parse from the underlying bytes object to avoid copying the buffer.
+            payload = payload.obj if isinstance(payload.obj, bytes) and payload.nbytes == len(payload.obj) else payload.tobytes()
+
+        message = json.loads(payload)
+        if not isinstance(message, dict):
+            raise ValueError('PubSub message is not a JSON object.')
+
+        self.header = {key : value for key, value in message.items() if key != 'message'}
+        self._has_message = 'message' in message
+        self._message = message.get('message')
+        self._is_parsed = True
+
+    def to_dict(self):
+        '''
+        Returns the SDK well formatted message dict, parsing the message body if not already parsed.
+        '''
+        message = dict(self.header)
+        message['message'] = self.message
+        return message
+
+    def __repr__(self):
+        return 'LazyPubSubMessage(header={}, is_parsed={})'.format(self.header, self._is_parsed)
+
+class LazyMessageBody(Mapping):
+    '''
+    Read only view of a LazyPubSubMessage body that is passed to message handlers when lazy
+    message parsing is enabled. The body is only parsed when first accessed via item access,
+    iteration, len() or the value property.
+
+    Supports dict style read access (message['key'], message.get('key'), dict(message))
+    for JSON object message bodies, use the value property for any other body types.
+    '''
+
+    __slots__ = ('_envelope',)
+
+    def __init__(self, envelope):
+        self._envelope = envelope
+
+    @property
+    def value(self):
+        '''
+        The parsed message body.
+        '''
+        return self._envelope.message
+
+    @property
+    def is_parsed(self):
+        return self._envelope.is_parsed
+
+    def __getitem__(self, key):
+        return self._envelope.message[key]
+
+    def __iter__(self):
+        return iter(self._envelope.message)
+
+    def __len__(self):
+        return len(self._envelope.message)
+
+    def __repr__(self):
+        if self._envelope.is_parsed:
+            return repr(self._envelope.message)
+        return 'LazyMessageBody(<not parsed>)'
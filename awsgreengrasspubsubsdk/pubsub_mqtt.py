@@ -22,6 +22,7 @@ __author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
 
 import json
 import logging
+import functools
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 import awsiot.greengrasscoreipc
@@ -39,7 +40,7 @@ log = logging.getLogger(__name__)
 
 class MqttPubSub():
 
-    def __init__(self, message_callback, mqtt_subscribe_topics):
+    def __init__(self, message_callback, mqtt_subscribe_topics, zero_copy_receive=False, executor=None, rate_limiter=None, message_filters=None):
         
             
         super().__init__()
@@ -59,6 +60,20 @@ class MqttPubSub():
         # List of active topics subscribed too.
         self.mqtt_subscribed_topics = []
 
+        # Subscription handlers and message_filter.SubscriptionFilter applied to received messages by topic.
+        self.subscribe_handlers = {}
+        self.message_filters = dict(message_filters) if message_filters else {}
+
+        # If True, pass received payloads to the message callback as a memoryview of 
+        # the received buffer rather than copying into a decoded str.
+        self.zero_copy_receive = zero_copy_receive
+
+        # Executor to process PubSub messages, defaults to a ThreadPoolExecutor.
+        self.executor = executor if executor else ThreadPoolExecutor(max_workers=None)
+
+        # Optional publish_limiter.PublishRateLimiter applied to all publishes.
+        self.rate_limiter = rate_limiter
+
         # Create the mqtt_clients
         self.mqtt_subscribe_client = awsiot.greengrasscoreipc.connect()
         self.mqtt_publish_client = awsiot.greengrasscoreipc.connect()
@@ -76,6 +91,9 @@ class MqttPubSub():
     
     def set_mqtt_default_timeout(self, mqtt_default_timeout):
         self.mqtt_default_timeout = mqtt_default_timeout
+
+    def set_rate_limiter(self, rate_limiter):
+        self.rate_limiter = rate_limiter
     
     ###############################################
     # IPC MQTT Iot Core PubSub Functions
@@ -83,24 +101,36 @@ class MqttPubSub():
         '''
         Initialise subscription to requested MQTT IoT Core topics.
         '''
-        
-        self.handler = MqttPubSub.__MqttSubscribeHandler(self.message_callback)
 
         for subscribe_topic in self.mqtt_subscribe_topics:
             self.subscribe_to_topic(subscribe_topic)
     
-    def subscribe_to_topic(self, topic):
+    def subscribe_to_topic(self, topic, message_filter=None):
+        '''
+        Subscribe to an MQTT IoT Core topic. The optional message_filter.SubscriptionFilter is evaluated 
+        on the stream thread and messages it filters out are never submitted for processing.
+        If already subscribed, a given message_filter replaces the topic's current filter.
+        '''
 
         log.info('MQTT Subscribing to Topic: {}:'.format(topic))
+
+        if message_filter:
+            self.message_filters[topic] = message_filter
         
         if (topic in self.mqtt_subscribed_topics):
+            if message_filter:
+                self.subscribe_handlers[topic].message_filter = message_filter
+                log.info('Updated message filter on subscribed MQTT topic: {}'.format(topic))
             log.info('Returning with no action. Already subscribed to MQTT topic: {}'.format(topic))
             return
         
         request = SubscribeToIoTCoreRequest()
         request.topic_name = topic
         request.qos = self.mqtt_default_qos
-        operation = self.mqtt_subscribe_client.new_subscribe_to_iot_core(self.handler)
+        # Handler per subscription so each subscription has its own message filter.
+        handler = MqttPubSub.__MqttSubscribeHandler(self.message_callback, self.executor, self.zero_copy_receive, self.message_filters.get(topic))
+        self.subscribe_handlers[topic] = handler
+        operation = self.mqtt_subscribe_client.new_subscribe_to_iot_core(handler)
         future = operation.activate(request)
         # call the result to block until the future has completed.
         future.result(self.mqtt_default_timeout)
@@ -111,61 +141,149 @@ class MqttPubSub():
     def _init_mqtt_publisher(self):
         '''
         Initialise publisher to requested IoT Core MQTT topics.
+        
+        Publish requests are built per call so concurrent publishes
+        (i.e: from multiple message handler threads) don't share request state.
         '''
 
         log.info('Initialising MQTT Publisher.')
-        self.mqtt_request = PublishToIoTCoreRequest()
-        self.mqtt_request.qos = self.mqtt_default_qos
 
     def publish_to_mqtt(self, topic, message_object, timeout=None):
         '''
         Publish a Python object serlized as a JSON message to the IoT Core MQTT topic.
         '''
         
+        future = self.publish_to_mqtt_async(topic, message_object)
+        self.wait_for_publish(future, topic, message_object, timeout)
+
+    def publish_to_mqtt_async(self, topic, message_object):
+        '''
+        Issue a publish of a Python object serlized as a JSON message to the IoT Core MQTT topic
+        without waiting on the response. Returns the publish response future that can be passed to 
+        wait_for_publish() to collect the outcome.
+        '''
+        
         try:
 
             log.debug('MQTT PUBLISH: topic: {} - Message: {}'.format(topic, message_object))
-            self.mqtt_request.topic_name = topic
             json_message = json.dumps(message_object)
-            self.mqtt_request.payload = bytes(json_message, "utf-8")
-            operation = self.mqtt_publish_client.new_publish_to_iot_core()
-            operation.activate(self.mqtt_request)
-            future = operation.get_response()
+            return self._publish_payload_async(topic, bytes(json_message, "utf-8"))
+
+        except Exception as err:
+            self._raise_publish_error(err, topic, message_object)
+
+    def wait_for_publish(self, future, topic, message_object, timeout=None):
+        '''
+        Block on a publish response future returned from publish_to_mqtt_async() for up to timeout secs 
+        (or the MQTT default timeout if None). Raises an Exception if the publish failed or timed out.
+        '''
+        
+        try:
             future.result(timeout if timeout!=None else self.mqtt_default_timeout)
 
-        except KeyError as key_error:
-            raise Exception('KeyError occurred publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(key_error,  topic, message_object))
+        except Exception as err:
+            self._raise_publish_error(err, topic, message_object)
 
-        except concurrent.futures.TimeoutError as timeout_error:
-            raise Exception('Timeout occurred publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(timeout_error,  topic, message_object))
+    def publish_bytes_to_mqtt(self, topic, payload, timeout=None):
+        '''
+        Publish an already encoded payload (bytes, bytearray or memoryview) to the IoT Core MQTT topic.
+        The payload is forwarded as given without being decoded, re-serialised or copied.
+        '''
+        
+        future = self.publish_bytes_to_mqtt_async(topic, payload)
+        self.wait_for_publish(future, topic, '<{} bytes>'.format(len(payload)), timeout)
+
+    def publish_bytes_to_mqtt_async(self, topic, payload):
+        '''
+        Issue a publish of an already encoded payload (bytes, bytearray or memoryview) to the IoT Core MQTT 
+        topic without waiting on the response. Returns the publish response future that can be passed to 
+        wait_for_publish() to collect the outcome.
+        '''
+        
+        try:
+            log.debug('MQTT PUBLISH BYTES: topic: {} - Payload Length: {}'.format(topic, len(payload)))
 
-        except UnauthorizedError as unauth_error:
-            raise Exception('Unauthorized error publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(unauth_error,  topic, message_object))
+            if not isinstance(payload, (bytes, bytearray, memoryview)):
+                raise TypeError('Expected bytes, bytearray or memoryview payload but received: {}'.format(type(payload).__name__))
+
+            return self._publish_payload_async(topic, payload)
 
         except Exception as err:
+            self._raise_publish_error(err, topic, '<{} payload>'.format(type(payload).__name__))
+
+    def _publish_payload_async(self, topic, payload):
+        '''
+        Activates an IoT Core publish operation for the given encoded payload and returns the response future. 
+        The publish is issued within the rate limit if a rate limiter is set.
+        '''
+
+        if self.rate_limiter:
+            return self.rate_limiter.publish(topic, functools.partial(self._activate_publish, topic, payload))
+
+        return self._activate_publish(topic, payload)
+
+    def _activate_publish(self, topic, payload):
+        
+        mqtt_request = PublishToIoTCoreRequest()
+        mqtt_request.topic_name = topic
+        mqtt_request.qos = self.mqtt_default_qos
+        mqtt_request.payload = payload
+        operation = self.mqtt_publish_client.new_publish_to_iot_core()
+        operation.activate(mqtt_request)
+        return operation.get_response()
+
+    def _raise_publish_error(self, err, topic, message_object):
+        '''
+        Re-raises a publish exception with the MQTT topic and message detail attached.
+        '''
+
+        if isinstance(err, KeyError):
+            raise Exception('KeyError occurred publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(err,  topic, message_object))
+
+        elif isinstance(err, concurrent.futures.TimeoutError):
+            raise Exception('Timeout occurred publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(err,  topic, message_object))
+
+        elif isinstance(err, UnauthorizedError):
+            raise Exception('Unauthorized error publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(err,  topic, message_object))
+
+        else:
             raise Exception('Exception publishing to IoT Core on MQTT Topic. ERROR: {} - TOPIC: {} - MESSAGE: {}'.format(err, topic, message_object))
     
     class __MqttSubscribeHandler(client.SubscribeToIoTCoreStreamHandler):
 
-        def __init__(self, message_callback):
+        def __init__(self, message_callback, executor, zero_copy_receive=False, message_filter=None):
 
             log.info('Initialising AWS Greengrass V2 IPC MQTT Subscribe Client')
 
             super().__init__()
 
-            # Create ThreadPoolExecutor to process PubSub reveived messages.
-            self.executor = ThreadPoolExecutor(max_workers=None) 
+            # Executor to process PubSub reveived messages.
+            self.executor = executor
 
             self.message_callback = message_callback
 
+            # Pass payloads as memoryview of the received buffer rather than a decoded str.
+            self.zero_copy_receive = zero_copy_receive
+
+            # Sampling / decimation filter evaluated before the message is decoded and submitted.
+            self.message_filter = message_filter
+
         # Topic subscription event handlers 
         def on_stream_event(self, event: IoTCoreMessage) -> None:
             try:
                 
-                log.debug('MQTT EVENT RECEIVED: {}'.format(event))
+                # Only format the event if debug is enabled as it includes the full payload.
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug('MQTT EVENT RECEIVED: {}'.format(event))
 
                 topic = event.message.topic_name    
-                message = str(event.message.payload, "utf-8")
+                if self.message_filter and not self.message_filter.accept(topic, event.message.payload):
+                    return
+
+                if self.zero_copy_receive:
+                    message = memoryview(event.message.payload)
+                else:
+                    message = str(event.message.payload, "utf-8")
                 self.executor.submit(self.message_callback, "mqtt", topic, message)
 
             except Exception as err:
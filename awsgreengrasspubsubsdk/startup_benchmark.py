@@ -0,0 +1,150 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Cold start benchmark of the PubSub SDK to track component startup time across releases.
+
+Each run starts a new Python interpreter that imports the SDK, constructs the client, activates
+IPC and MQTT and times the first message received back on the component ingress topic, as reported
+by AwsGreengrassPubSubSdkClient.get_startup_timings(). The median of each stage is printed and
+appended to a JSON lines history file with the SDK and Python versions so results can be compared
+between releases.
+
+By default the pubsub_local stand-in transports are used so the benchmark runs off device.
+Use --transport greengrass to benchmark against the Greengrass nucleus from within a component.
+
+### Usage
+
+```
+python -m awsgreengrasspubsubsdk.startup_benchmark --runs 20 --history startup_history.jsonl
+```
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+STAGES = ('import', 'construct', 'activate_ipc', 'activate_mqtt', 'first_message')
+
+# Run in a new interpreter for each cold start measurement.
+_COLD_START_SCRIPT = '''
+import sys, json, time, threading, logging
+logging.disable(logging.CRITICAL)
+from awsgreengrasspubsubsdk.pubsub_client import AwsGreengrassPubSubSdkClient
+
+received = threading.Event()
+client = AwsGreengrassPubSubSdkClient('startup_benchmark', lambda *args: received.set())
+
+if sys.argv[1] == 'local':
+    from awsgreengrasspubsubsdk.pubsub_local import LocalPubSub, LocalMqttPubSub
+    client.activate_ipc_pubsub(pubsub_class=LocalPubSub)
+    client.activate_mqtt_pubsub(pubsub_class=LocalMqttPubSub)
+else:
+    client.activate_ipc_pubsub()
+    client.activate_mqtt_pubsub()
+
+client.publish_message('ipc', client.formatter.get_message(), topic=client.ingress_topic)
+if not received.wait(30):
+    raise Exception('First message not received.')
+print(json.dumps(client.get_startup_timings()))
+'''
+
+def get_sdk_version():
+    '''
+    Returns the installed SDK package version or the SDK message version if not installed as a package.
+    '''
+
+    try:
+        from importlib.metadata import version
+        return version('awsgreengrasspubsubsdk')
+    except Exception:
+        from awsgreengrasspubsubsdk.message_formatter import PubSubMessageFormatter
+        return PubSubMessageFormatter.sdk_version
+
+def run_cold_start(transport):
+    '''
+    Returns the startup timings dict of one cold start in a new interpreter.
+    '''
+
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT, transport],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    elapsed = time.perf_counter() - started
+
+    if output.returncode != 0:
+        raise Exception('Cold start run failed. ERROR: {}'.format(output.stderr.strip()))
+
+    timings = json.loads(output.stdout.strip().splitlines()[-1])
+    timings['process'] = elapsed
+    return timings
+
+def run_benchmark(runs=10, transport='local'):
+    '''
+    Returns a result dict with the median of each startup stage over the given number of cold starts in ms.
+    '''
+
+    results = [run_cold_start(transport) for _ in range(runs)]
+
+    medians = {}
+    for stage in STAGES + ('process',):
+        values = [result[stage] for result in results if stage in result]
+        if values:
+            medians[stage] = round(statistics.median(values) * 1000, 2)
+
+    return {
+        'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'sdk_version' : get_sdk_version(),
+        'python_version' : platform.python_version(),
+        'machine' : platform.machine(),
+        'transport' : transport,
+        'runs' : runs,
+        'median_ms' : medians
+    }
+
+def load_history(history_file):
+
+    try:
+        with open(history_file) as history:
+            return [json.loads(line) for line in history if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='AWS Greengrass PubSub SDK cold start benchmark.')
+    parser.add_argument('--runs', type=int, default=10, help='Number of cold starts to take the median of.')
+    parser.add_argument('--transport', choices=['local', 'greengrass'], default='local', help='PubSub transport to activate.')
+    parser.add_argument('--history', help='JSON lines file to append the result to and compare against.')
+    args = parser.parse_args(args)
+
+    result = run_benchmark(args.runs, args.transport)
+
+    # Compare against the last result with the same transport on the same machine.
+    previous = None
+    if args.history:
+        for record in load_history(args.history):
+            if record.get('transport') == result['transport'] and record.get('machine') == result['machine']:
+                previous = record
+
+    print('SDK {} - Python {} - {} cold starts ({} transport)'.format(result['sdk_version'], result['python_version'], result['runs'], result['transport']))
+    for stage, median in result['median_ms'].items():
+        line = '  {:<14} {:>9.2f} ms'.format(stage, median)
+        if previous and stage in previous['median_ms']:
+            line += '  ({:+.2f} ms vs SDK {})'.format(median - previous['median_ms'][stage], previous['sdk_version'])
+        print(line)
+
+    if args.history:
+        with open(args.history, 'a') as history:
+            history.write(json.dumps(result) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Capture of received and published PubSub traffic to a compact append-only file and
+time accurate replay of a capture into a client through the pubsub_local stand-in transports.
+
+Capture records are queued on the calling thread and written by a background writer thread so
+capturing adds little to the message path. Each record is the (timestamp, direction, protocol, topic, payload)
+of a message as received from or published to IPC / MQTT.
+
+Replay publishes the captured received payloads to the local IPC / MQTT buses at the captured
+message timing (or faster), so message handler changes can be load tested offline against a real message mix:
+
+```
+pubsub_client.activate_ipc_pubsub(pubsub_class=LocalPubSub)
+pubsub_client.activate_mqtt_pubsub(pubsub_class=LocalMqttPubSub)
+stats = replay_capture('traffic.cap', speed=10)
+```
+'''
+
+__version__ = "0.1.4"
+__status__ = "Development"
+__copyright__ = "Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved."
+__author__ = "Dean Colcott <https://www.linkedin.com/in/deancolcott/>"
+
+import json
+import time
+import struct
+import logging
+import threading
+from collections import deque, namedtuple
+
+# Init the logger.
+log = logging.getLogger(__name__)
+
+# File header and fixed size record header of (timestamp, direction, protocol, topic length, payload length).
+CAPTURE_MAGIC = b'GGPSCAP1'
+_record_header = struct.Struct('<dBBHI')
+
+DIRECTIONS = ('received', 'published')
+PROTOCOLS = ('ipc', 'mqtt', 'ipc_mqtt')
+
+CaptureRecord = namedtuple('CaptureRecord', ['timestamp', 'direction', 'protocol', 'topic', 'payload'])
+
+class TrafficCapture():
+    '''
+    Append-only capture of PubSub traffic to a binary file.
+
+    Set on the client with AwsGreengrassPubSubSdkClient.set_traffic_capture(). Records are written
+    from a background thread, if the writer falls more than max_queue records behind further
+    records are dropped (and counted) rather than slowing down message processing.
+
+    ### Parameters
+
+    **capture_file**: str
+
+        Path of the capture file, appended to if it exists.
+
+    **directions**: list (Optional) Default=['received', 'published']
+
+        Message directions to capture.
+
+    **max_queue**: int (Optional) Default=10000
+
+        Max records queued for the writer thread.
+    '''
+
+    def __init__(self, capture_file, directions=DIRECTIONS, max_queue=10000):
+
+        for direction in directions:
+            if direction not in DIRECTIONS:
+                raise Exception('Unknown capture direction: {}. Supported Values: [received || published]'.format(direction))
+
+        self.capture_file = capture_file
+        self.directions = set(directions)
+        self.max_queue = max_queue
+
+        self._file = open(capture_file, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._queue_available = threading.Condition(self._lock)
+        self._is_closed = False
+
+        # Counters
+        self.recorded = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+        self._thread = threading.Thread(target=self._write_records, name='TrafficCapture', daemon=True)
+        self._thread.start()
+
+    def record(self, direction, protocol, topic, payload, timestamp=None):
+        '''
+        Queues a capture record. payload is the str, bytes or memoryview received payload or, for
+        published messages, the message object which is serialised on the writer thread so must
+        not be modified after publishing. timestamp is the time.time() the message was received
+        or published, defaults to now.
+        '''
+
+        if direction not in self.directions:
+            return
+
+        # Received buffers may be reused by the transport once the callback returns.
+        if isinstance(payload, (memoryview, bytearray)):
+            payload = bytes(payload)
+
+        with self._lock:
+            if self._is_closed:
+                return
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append((time.time() if timestamp is None else timestamp, direction, protocol, topic, payload))
+            self._queue_available.notify()
+
+    def get_stats(self):
+        '''
+        Returns a dict of the recorded and dropped record counts, bytes written and current queue depth.
+        '''
+
+        return {
+            'recorded' : self.recorded,
+            'dropped' : self.dropped,
+            'bytes_written' : self.bytes_written,
+            'queued' : len(self._queue)
+        }
+
+    def close(self):
+        '''
+        Writes any queued records and closes the capture file.
+        '''
+
+        with self._lock:
+            self._is_closed = True
+            self._queue_available.notify()
+
+        self._thread.join()
+        self._file.close()
+
+    def _write_records(self):
+
+        while True:
+            with self._lock:
+                while not self._queue and not self._is_closed:
+                    self._queue_available.wait()
+                records = list(self._queue)
+                self._queue.clear()
+                is_closed = self._is_closed
+
+            for record in records:
+                try:
+                    self._write_record(*record)
+                except Exception as err:
+                    self.dropped += 1
+                    log.error('Exception writing traffic capture record. ERROR: {} - TOPIC: {}'.format(err, record[3]))
+
+            self._file.flush()
+            if is_closed:
+                return
+
+    def _write_record(self, timestamp, direction, protocol, topic, payload):
+
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        elif not isinstance(payload, bytes):
+            if hasattr(payload, 'to_dict'):
+                payload = payload.to_dict()
+            payload = json.dumps(payload).encode('utf-8')
+
+        topic = topic.encode('utf-8')
+        self._file.write(_record_header.pack(timestamp, DIRECTIONS.index(direction), PROTOCOLS.index(protocol), len(topic), len(payload)))
+        self._file.write(topic)
+        self._file.write(payload)
+
+        self.recorded += 1
+        self.bytes_written += _record_header.size + len(topic) + len(payload)
+
+def read_capture(capture_file):
+    '''
+    Generator of the CaptureRecord(timestamp, direction, protocol, topic, payload) records
+    in a capture file, in the order captured. payload is bytes.
+    '''
+
+    with open(capture_file, 'rb') as capture:
+        if capture.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise Exception('Not a PubSub SDK traffic capture file: {}'.format(capture_file))
+
+        while True:
+            header = capture.read(_record_header.size)
+            if len(header) < _record_header.size:
+                # End of file or a record truncated by the capturing process exiting.
+                return
+
+            timestamp, direction, protocol, topic_len, payload_len = _record_header.unpack(header)
+            topic = capture.read(topic_len)
+            payload = capture.read(payload_len)
+            if len(payload) < payload_len:
+                return
+
+            yield CaptureRecord(timestamp, DIRECTIONS[direction], PROTOCOLS[protocol], topic.decode('utf-8'), payload)
+
+def replay_capture(capture_file, speed=1.0, directions=('received',), protocols=('ipc', 'mqtt'), ipc_bus=None, mqtt_bus=None):
+    '''
+    Replays the captured payloads to the pubsub_local IPC / MQTT buses, delivering them to clients
+    activated with the LocalPubSub / LocalMqttPubSub transports and subscribed to the captured topics.
+    Returns a dict of replay stats once all records are published.
+
+    ### Parameters
+
+    **capture_file**: str
+
+        Path of the capture file to replay.
+
+    **speed**: float (Optional) Default=1.0
+
+        Replay speed relative to the captured message timing, i.e: 1 for real time, 10 for 10x.
+        None (or 0) to publish as fast as possible.
+
+    **directions**: list (Optional) Default=['received']
+
+        Captured message directions to replay. Published messages are replayed to the topic they were published to.
+
+    **protocols**: list (Optional) Default=['ipc', 'mqtt']
+
+        Captured protocols to replay.
+
+    **ipc_bus** / **mqtt_bus**: pubsub_local.LocalPubSubBus (Optional) Default=pubsub_local.ipc_bus / mqtt_bus
+
+        Buses to replay the IPC / MQTT records to.
+
+    ### Returns
+
+    Dict of replayed: records published, elapsed: secs, rate: records per sec and
+    max_lag: max secs a record was published behind its scheduled replay time.
+    '''
+
+    from awsgreengrasspubsubsdk import pubsub_local
+
+    buses = {
+        'ipc' : ipc_bus if ipc_bus else pubsub_local.ipc_bus,
+        'mqtt' : mqtt_bus if mqtt_bus else pubsub_local.mqtt_bus
+    }
+
+    replayed = 0
+    max_lag = 0
+    first_timestamp = None
+    started = time.monotonic()
+
+    for record in read_capture(capture_file):
+        if record.direction not in directions:
+            continue
+
+        record_protocols = ['ipc', 'mqtt'] if record.protocol == 'ipc_mqtt' else [record.protocol]
+        record_protocols = [protocol for protocol in record_protocols if protocol in protocols]
+        if not record_protocols:
+            continue
+
+        if speed:
+            if first_timestamp is None:
+                first_timestamp = record.timestamp
+            scheduled = started + (record.timestamp - first_timestamp) / speed
+            wait = scheduled - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                max_lag = max(max_lag, -wait)
+
+        for protocol in record_protocols:
+            buses[protocol].publish(record.topic, record.payload)
+        replayed += 1
+
+    elapsed = time.monotonic() - started
+    return {
+        'replayed' : replayed,
+        'elapsed' : elapsed,
+        'rate' : replayed / elapsed if elapsed else 0,
+        'max_lag' : max_lag
+    }
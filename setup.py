@@ -25,6 +25,11 @@ setup(
     packages=find_packages(include=['awsgreengrasspubsubsdk*']),
     install_requires=['awsiotsdk'],
     python_requires='>=3.6',
+    entry_points={
+        'console_scripts': [
+            'gg-pubsub-load-generator=awsgreengrasspubsubsdk.load_generator:main'
+        ]
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         'Intended Audience :: Developers',
@@ -0,0 +1,81 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Shared fixtures for the PubSub SDK tests. Clients are activated with the pubsub_local stand-in
+transports on buses isolated to each test so tests run without the awsiotsdk or a Greengrass nucleus.
+'''
+
+import time
+import pytest
+
+from awsgreengrasspubsubsdk.pubsub_client import AwsGreengrassPubSubSdkClient
+from awsgreengrasspubsubsdk.pubsub_local import LocalPubSub, LocalMqttPubSub, LocalPubSubBus
+
+def wait_for(condition, timeout=2.0):
+    '''
+    Waits for the condition callable to return True, returns its last result.
+    '''
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return condition()
+        time.sleep(0.01)
+    return True
+
+class LocalBuses():
+    '''
+    Isolated IPC and MQTT local buses with the local stand-in client classes that publish to them.
+    '''
+
+    def __init__(self):
+
+        self.ipc_bus = LocalPubSubBus()
+        self.mqtt_bus = LocalPubSubBus()
+
+        ipc_bus = self.ipc_bus
+        mqtt_bus = self.mqtt_bus
+
+        class IpcPubSub(LocalPubSub):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, bus=ipc_bus, **kwargs)
+
+        class MqttPubSub(LocalMqttPubSub):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, bus=mqtt_bus, **kwargs)
+
+        self.ipc_pubsub_class = IpcPubSub
+        self.mqtt_pubsub_class = MqttPubSub
+
+    def record(self, protocol, topic='#'):
+        '''
+        Returns a list the (topic, payload) of messages published to the protocol bus are appended to.
+        '''
+
+        received = []
+        bus = self.ipc_bus if protocol == 'ipc' else self.mqtt_bus
+        bus.subscribe(topic, lambda topic, payload: received.append((topic, payload)))
+        return received
+
+@pytest.fixture
+def buses():
+    return LocalBuses()
+
+@pytest.fixture
+def new_client(buses):
+    '''
+    Factory of clients activated on the test's local buses, protocols is any of ('ipc', 'mqtt').
+    '''
+
+    def new_client(base_topic='test', protocols=('ipc', 'mqtt'), default_handler=None, handlers=(), **handler_kwargs):
+        client = AwsGreengrassPubSubSdkClient(base_topic, default_handler or (lambda *args: None))
+        for handler in handlers:
+            client.register_message_handler(handler, **handler_kwargs)
+        if 'ipc' in protocols:
+            client.activate_ipc_pubsub(pubsub_class=buses.ipc_pubsub_class)
+        if 'mqtt' in protocols:
+            client.activate_mqtt_pubsub(pubsub_class=buses.mqtt_pubsub_class)
+        return client
+
+    return new_client
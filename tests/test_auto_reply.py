@@ -0,0 +1,86 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Auto reply of message handler results, and suppression of replies to replies.
+'''
+
+import json
+import time
+
+from conftest import wait_for
+
+class ReplyHandler():
+
+    def __init__(self):
+        self.received = []
+
+    def request(self, protocol, topic, message_id, status, route, message):
+        self.received.append((route, message_id, status))
+        return {'value' : message['value'] * 2}
+
+    def no_reply(self, protocol, topic, message_id, status, route, message):
+        self.received.append((route, message_id, status))
+
+    def failing(self, protocol, topic, message_id, status, route, message):
+        self.received.append((route, message_id, status))
+        raise ValueError('failed')
+
+def get_replies(received):
+    return [json.loads(payload) for topic, payload in received]
+
+def test_auto_reply_publishes_handler_result(buses, new_client):
+
+    replies = buses.record('ipc', 'replies')
+    handler = ReplyHandler()
+    client = new_client(protocols=('ipc',), handlers=[handler], auto_reply=True)
+    client.set_reply_topic('replies')
+
+    client.publish_message('ipc', client.formatter.get_message(route='ReplyHandler.request', message_id='id-1', message={'value' : 21}), topic=client.ingress_topic)
+
+    assert wait_for(lambda: len(replies) == 1)
+    reply = get_replies(replies)[0]
+    assert reply['route'] == 'ReplyHandler.request_response'
+    assert reply['message_id'] == 'id-1'
+    assert reply['status'] == 200
+    assert reply['is_reply'] is True
+    assert reply['message'] == {'value' : 42}
+
+def test_auto_reply_replies_to_every_request(buses, new_client):
+
+    replies = buses.record('ipc', 'replies')
+    handler = ReplyHandler()
+    client = new_client(protocols=('ipc',), handlers=[handler], auto_reply=True)
+    client.set_reply_topic('replies')
+
+    # Requests with non 200 status and repeated message_ids are still requests, not replies.
+    for status in (200, 202, 200):
+        client.publish_message('ipc', client.formatter.get_message(route='ReplyHandler.request', message_id='id-1', status=status, message={'value' : 1}), topic=client.ingress_topic)
+
+    assert wait_for(lambda: len(replies) == 3)
+
+def test_handler_returning_none_does_not_reply(buses, new_client):
+
+    replies = buses.record('ipc', 'replies')
+    handler = ReplyHandler()
+    client = new_client(protocols=('ipc',), handlers=[handler], auto_reply=True)
+    client.set_reply_topic('replies')
+
+    client.publish_message('ipc', client.formatter.get_message(route='ReplyHandler.no_reply'), topic=client.ingress_topic)
+
+    assert wait_for(lambda: len(handler.received) == 1)
+    time.sleep(0.1)
+    assert replies == []
+
+def test_received_replies_are_not_replied_to(buses, new_client):
+
+    handler = ReplyHandler()
+    client = new_client(protocols=('ipc',), handlers=[handler], auto_reply={'failing' : 'ReplyHandler.failing'})
+
+    # Replies to the ingress topic with the request route, so the error reply is received by the same handler.
+    client.set_reply_topic(client.ingress_topic)
+    client.publish_message('ipc', client.formatter.get_message(route='ReplyHandler.failing', message_id='id-1'), topic=client.ingress_topic)
+
+    assert wait_for(lambda: len(handler.received) == 2)
+    time.sleep(0.2)
+    assert handler.received == [('ReplyHandler.failing', 'id-1', 200), ('ReplyHandler.failing', 'id-1', 500)]
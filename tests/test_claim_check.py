@@ -0,0 +1,115 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Claim-check check in of large message bodies to shared memory segments and check out by receivers.
+'''
+
+import os
+import json
+import stat
+import pytest
+
+from awsgreengrasspubsubsdk.claim_check import ClaimCheckStore, ClaimCheckReader
+from awsgreengrasspubsubsdk.pubsub_message import LazyPubSubMessage
+
+from conftest import wait_for
+
+def get_message(body, route='LargeHandler.large'):
+    return {'sdk_version' : '0.1.4', 'message_id' : 'id-1', 'status' : 200, 'route' : route, 'message' : body}
+
+def test_check_in_under_threshold_returns_payload(tmp_path):
+
+    store = ClaimCheckStore(threshold=1024, directory=str(tmp_path))
+    message = get_message({'value' : 1})
+
+    payload = store.check_in(message)
+
+    assert json.loads(payload) == message
+    assert os.listdir(tmp_path) == []
+    store.close()
+
+def test_check_in_and_check_out_json_body(tmp_path):
+
+    store = ClaimCheckStore(threshold=1024, directory=str(tmp_path))
+    reader = ClaimCheckReader(str(tmp_path))
+    body = {'values' : list(range(1000))}
+
+    reference = store.check_in(get_message(body))
+    segment = os.path.join(tmp_path, reference['claim_check']['segment'])
+    assert reference['claim_check']['encoding'] == 'json'
+    assert reference['message'] == {}
+    assert stat.S_IMODE(os.stat(segment).st_mode) == 0o600
+
+    message = reader.check_out(LazyPubSubMessage(json.dumps(reference)))
+    assert message.route == 'LargeHandler.large'
+    assert message.message_id == 'id-1'
+    assert message.message == body
+
+    message.release()
+    assert reader.get_stats() == {'checked_out' : 1, 'mapped' : 0}
+    store.close()
+
+def test_check_in_and_check_out_bytes_body(tmp_path):
+
+    store = ClaimCheckStore(threshold=1024 * 1024, directory=str(tmp_path))
+    reader = ClaimCheckReader(str(tmp_path))
+    body = os.urandom(1000)
+
+    # Bytes bodies are claim-checked at any size.
+    reference = store.check_in(get_message(body))
+    assert reference['claim_check']['size'] == 1000
+    assert reference['claim_check']['encoding'] == 'bytes'
+
+    message = reader.check_out(LazyPubSubMessage(json.dumps(reference)))
+    assert isinstance(message.message, memoryview)
+    assert bytes(message.message) == body
+    message.release()
+    store.close()
+
+def test_check_out_of_missing_segment_raises(tmp_path):
+
+    store = ClaimCheckStore(threshold=1, directory=str(tmp_path))
+    reader = ClaimCheckReader(str(tmp_path))
+
+    reference = store.check_in(get_message({'value' : 1}))
+    os.remove(os.path.join(tmp_path, reference['claim_check']['segment']))
+
+    with pytest.raises(Exception, match='not found'):
+        reader.check_out(LazyPubSubMessage(json.dumps(reference)))
+    store.close()
+
+def test_client_claim_check_over_ipc(tmp_path, buses, new_client):
+
+    class LargeHandler():
+        def __init__(self):
+            self.received = []
+        def large(self, protocol, topic, message_id, status, route, message):
+            # Bytes bodies are a view of the segment, copied as they're kept after the handler returns.
+            self.received.append(bytes(message) if isinstance(message, memoryview) else message)
+
+    ipc_received = buses.record('ipc', 'large/topic')
+    handler = LargeHandler()
+    receiver = new_client(base_topic='receiver', protocols=('ipc',), handlers=[handler])
+    receiver.set_claim_check(directory=str(tmp_path))
+    receiver.subscribe_to_topic('ipc', 'large/topic')
+
+    publisher = new_client(base_topic='publisher', protocols=('ipc',))
+    publisher.set_claim_check(threshold=1024, directory=str(tmp_path))
+
+    json_body = {'values' : list(range(1000))}
+    bytes_body = os.urandom(2000)
+    publisher.publish_message('ipc', publisher.formatter.get_message(route='LargeHandler.large', message=json_body), topic='large/topic')
+    publisher.publish_message('ipc', publisher.formatter.get_message(route='LargeHandler.large', message=bytes_body), topic='large/topic')
+
+    assert wait_for(lambda: len(handler.received) == 2)
+    assert json_body in handler.received
+    assert bytes_body in handler.received
+
+    # Only the small reference messages are published to IPC.
+    assert all(len(payload) < 1024 for topic, payload in ipc_received)
+    assert publisher.get_claim_check_stats()['store']['checked_in'] == 2
+    assert wait_for(lambda: receiver.get_claim_check_stats()['reader']['mapped'] == 0)
+
+    publisher.claim_check_store.close()
+    receiver.claim_check_store.close()
@@ -0,0 +1,75 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+IPC loopback delivery to in process subscribers, with wildcard subscriptions and message filters.
+'''
+
+import time
+
+from conftest import wait_for
+
+class SensorHandler():
+
+    def __init__(self):
+        self.received = []
+
+    def reading(self, protocol, topic, message_id, status, route, message):
+        self.received.append((topic, message_id))
+
+def new_loopback_client(new_client, ipc_loopback, message_filter=None):
+
+    handler = SensorHandler()
+    client = new_client(protocols=('ipc',), handlers=[handler])
+    client.subscribe_to_topic('ipc', 'sensors/#', message_filter=message_filter)
+    client.set_ipc_loopback(ipc_loopback)
+    return client, handler
+
+def publish_readings(client, count):
+
+    for message_id in range(1, count + 1):
+        client.publish_message('ipc', client.formatter.get_message(route='SensorHandler.reading', message_id=message_id), topic='sensors/device/{}'.format(message_id))
+
+def test_also_mode_delivers_wildcard_subscription_once_and_publishes_to_ipc(buses, new_client):
+
+    ipc_received = buses.record('ipc', 'sensors/#')
+    client, handler = new_loopback_client(new_client, 'also')
+
+    publish_readings(client, 3)
+
+    assert wait_for(lambda: len(ipc_received) == 3)
+    time.sleep(0.2)
+
+    # Delivered once in process with the subscription topic, the copy received back from IPC is discarded.
+    assert sorted(handler.received) == [('sensors/#', 1), ('sensors/#', 2), ('sensors/#', 3)]
+
+def test_also_mode_applies_subscription_filter_once(buses, new_client):
+
+    client, handler = new_loopback_client(new_client, 'also', message_filter={'every_nth' : 2})
+
+    publish_readings(client, 6)
+
+    assert wait_for(lambda: len(handler.received) == 3)
+    time.sleep(0.2)
+    assert sorted(message_id for topic, message_id in handler.received) == [1, 3, 5]
+
+def test_only_mode_does_not_publish_to_ipc(buses, new_client):
+
+    ipc_received = buses.record('ipc', 'sensors/#')
+    client, handler = new_loopback_client(new_client, 'only')
+
+    publish_readings(client, 2)
+
+    assert wait_for(lambda: len(handler.received) == 2)
+    time.sleep(0.1)
+    assert ipc_received == []
+
+def test_unsubscribed_topics_are_published_to_ipc(buses, new_client):
+
+    ipc_received = buses.record('ipc', 'other/topic')
+    client, handler = new_loopback_client(new_client, 'only')
+
+    client.publish_message('ipc', client.formatter.get_message(route='SensorHandler.reading'), topic='other/topic')
+
+    assert wait_for(lambda: len(ipc_received) == 1)
+    assert handler.received == []
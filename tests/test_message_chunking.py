@@ -0,0 +1,111 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Chunking of oversized messages on publish and reassembly of the received chunks.
+'''
+
+import os
+import time
+
+from awsgreengrasspubsubsdk.message_chunking import MessageChunker, ChunkReassembler
+from awsgreengrasspubsubsdk.pubsub_message import LazyPubSubMessage
+
+from conftest import wait_for
+
+def get_message(body, message_id='id-1', route='LargeHandler.large'):
+    return {'sdk_version' : '0.1.4', 'message_id' : message_id, 'status' : 200, 'route' : route, 'message' : body}
+
+def test_payloads_are_within_max_payload():
+
+    chunker = MessageChunker(max_payload=4096)
+
+    payloads = chunker.get_payloads(get_message(os.urandom(20000)))
+
+    assert len(payloads) > 1
+    assert all(len(payload) <= 4096 for payload in payloads)
+
+def test_reassembles_out_of_order_and_duplicate_chunks():
+
+    chunker = MessageChunker(max_payload=4096)
+    reassembler = ChunkReassembler()
+    message = get_message({'values' : list(range(3000))})
+
+    payloads = chunker.get_payloads(message)
+    results = [reassembler.add('mqtt', LazyPubSubMessage(payload)) for payload in list(reversed(payloads)) + [payloads[0]]]
+
+    reassembled = [result for result in results if result is not None]
+    assert len(reassembled) == 1
+    assert reassembled[0].message_id == 'id-1'
+    assert reassembled[0].route == 'LargeHandler.large'
+    assert reassembled[0].message == message['message']
+    assert reassembler.get_stats()['reassembled'] == 1
+    assert reassembler.get_stats()['incomplete'] == 0
+
+def test_reassembles_bytes_body():
+
+    chunker = MessageChunker(max_payload=4096)
+    reassembler = ChunkReassembler()
+    body = os.urandom(10000)
+
+    results = [reassembler.add('mqtt', LazyPubSubMessage(payload)) for payload in chunker.get_payloads(get_message(body))]
+
+    assert results[-1].message == body
+    assert all(result is None for result in results[:-1])
+
+def test_incomplete_messages_time_out():
+
+    chunker = MessageChunker(max_payload=4096)
+    reassembler = ChunkReassembler(timeout=0.1)
+
+    payloads = chunker.get_payloads(get_message(os.urandom(10000)))
+    reassembler.add('mqtt', LazyPubSubMessage(payloads[0]))
+    time.sleep(0.2)
+    reassembler.add('mqtt', LazyPubSubMessage(chunker.get_payloads(get_message(os.urandom(10000), message_id='id-2'))[0]))
+
+    stats = reassembler.get_stats()
+    assert stats['timed_out'] == 1
+    assert stats['incomplete'] == 1
+
+def test_incomplete_messages_are_evicted_over_max_bytes():
+
+    chunker = MessageChunker(max_payload=4096)
+    reassembler = ChunkReassembler(max_bytes=20000)
+
+    for message_id in ('id-1', 'id-2'):
+        payloads = chunker.get_payloads(get_message(os.urandom(15000), message_id=message_id))
+        for payload in payloads[:-1]:
+            reassembler.add('mqtt', LazyPubSubMessage(payload))
+
+    stats = reassembler.get_stats()
+    assert stats['evicted'] == 1
+    assert stats['bytes'] <= 20000
+
+def test_client_chunked_publish_over_mqtt(buses, new_client):
+
+    class LargeHandler():
+        def __init__(self):
+            self.received = []
+        def large(self, protocol, topic, message_id, status, route, message):
+            self.received.append(message)
+
+    mqtt_received = buses.record('mqtt', 'large/topic')
+    handler = LargeHandler()
+    receiver = new_client(base_topic='receiver', protocols=('mqtt',), handlers=[handler])
+    receiver.subscribe_to_topic('mqtt', 'large/topic')
+
+    publisher = new_client(base_topic='publisher', protocols=('mqtt',))
+    publisher.set_message_chunking(max_payload=4096)
+
+    json_body = {'values' : list(range(3000))}
+    bytes_body = os.urandom(10000)
+    publisher.publish_message('mqtt', publisher.formatter.get_message(route='LargeHandler.large', message=json_body), topic='large/topic')
+    publisher.publish_message('mqtt', publisher.formatter.get_message(route='LargeHandler.large', message=bytes_body), topic='large/topic')
+
+    assert wait_for(lambda: len(handler.received) == 2)
+    assert json_body in handler.received
+    assert bytes_body in handler.received
+
+    assert all(len(payload) <= 4096 for topic, payload in mqtt_received)
+    assert publisher.get_message_chunking_stats()['chunked'] == 2
+    assert receiver.get_message_chunking_stats()['reassembly']['reassembled'] == 2
@@ -0,0 +1,53 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+ipc_mqtt publishes to both protocol legs, with the outcome of each leg returned.
+'''
+
+from conftest import wait_for
+
+def test_ipc_mqtt_publishes_to_both_legs(buses, new_client):
+
+    ipc_received = buses.record('ipc', 'legs/topic')
+    mqtt_received = buses.record('mqtt', 'legs/topic')
+    client = new_client()
+
+    results = client.publish_message('ipc_mqtt', client.formatter.get_message(route='route'), topic='legs/topic')
+
+    assert results == {'ipc' : None, 'mqtt' : None}
+    assert wait_for(lambda: len(ipc_received) == 1 and len(mqtt_received) == 1)
+
+def test_ipc_mqtt_with_mqtt_inactive_publishes_ipc_and_returns_mqtt_error(buses, new_client):
+
+    ipc_received = buses.record('ipc', 'legs/topic')
+    client = new_client(protocols=('ipc',))
+
+    results = client.publish_message('ipc_mqtt', client.formatter.get_message(route='route'), topic='legs/topic')
+
+    assert results['ipc'] is None
+    assert isinstance(results['mqtt'], Exception)
+    assert wait_for(lambda: len(ipc_received) == 1)
+
+def test_ipc_mqtt_publish_bytes_with_ipc_inactive_publishes_mqtt_and_returns_ipc_error(buses, new_client):
+
+    mqtt_received = buses.record('mqtt', 'legs/topic')
+    client = new_client(protocols=('mqtt',))
+
+    results = client.publish_bytes('ipc_mqtt', b'{"value": 1}', topic='legs/topic')
+
+    assert isinstance(results['ipc'], Exception)
+    assert results['mqtt'] is None
+    assert wait_for(lambda: mqtt_received == [('legs/topic', b'{"value": 1}')])
+
+def test_publish_many_with_mqtt_inactive_returns_error_per_mqtt_topic(buses, new_client):
+
+    ipc_received = buses.record('ipc', 'many/#')
+    client = new_client(protocols=('ipc',))
+    topics = ['many/a', 'many/b']
+
+    results = client.publish_many('ipc_mqtt', topics, client.formatter.get_message(route='route'))
+
+    assert results['ipc'] == {'many/a' : None, 'many/b' : None}
+    assert all(isinstance(results['mqtt'][topic], Exception) for topic in topics)
+    assert wait_for(lambda: sorted(topic for topic, payload in ipc_received) == topics)
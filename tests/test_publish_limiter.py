@@ -0,0 +1,108 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0.
+
+'''
+Publish rate limiter block, queue and drop modes.
+'''
+
+import time
+import pytest
+from concurrent.futures import Future
+
+from awsgreengrasspubsubsdk.publish_limiter import PublishRateLimiter
+
+class Publisher():
+    '''
+    Records the topic and time.monotonic() of each publish issued by the rate limiter.
+    '''
+
+    def __init__(self):
+        self.published = []
+
+    def publish_async(self, topic, index):
+
+        def publish_async():
+            self.published.append((topic, index, time.monotonic()))
+            future = Future()
+            future.set_result(None)
+            return future
+
+        return publish_async
+
+def test_block_mode_waits_for_rate_limit():
+
+    limiter = PublishRateLimiter('block')
+    limiter.set_rate_limit(20, burst=1)
+    publisher = Publisher()
+
+    started = time.monotonic()
+    for index in range(5):
+        limiter.publish('block/topic', publisher.publish_async('block/topic', index)).result(1)
+
+    # First publish uses the burst token, the remaining 4 wait 1 / 20 secs each.
+    assert time.monotonic() - started >= 0.15
+    assert [index for topic, index, published_at in publisher.published] == list(range(5))
+    assert limiter.get_stats()['throttled'] == 4
+
+def test_queue_mode_publishes_in_order_without_blocking():
+
+    limiter = PublishRateLimiter('queue')
+    limiter.set_rate_limit(50, burst=1, topic='queue/slow')
+    publisher = Publisher()
+
+    started = time.monotonic()
+    futures = [limiter.publish('queue/slow', publisher.publish_async('queue/slow', index)) for index in range(5)]
+    assert time.monotonic() - started < 0.05
+    assert limiter.get_stats()['queued'] == 4
+
+    for future in futures:
+        future.result(2)
+
+    assert [index for topic, index, published_at in publisher.published] == list(range(5))
+    assert limiter.get_stats()['queued'] == 0
+
+def test_queue_mode_does_not_delay_other_topics():
+
+    limiter = PublishRateLimiter('queue')
+    limiter.set_rate_limit(2, burst=1, topic='queue/slow')
+    publisher = Publisher()
+
+    slow_futures = [limiter.publish('queue/slow', publisher.publish_async('queue/slow', index)) for index in range(3)]
+    fast_future = limiter.publish('queue/fast', publisher.publish_async('queue/fast', 0))
+
+    # The unlimited topic is published immediately, not behind the slow topic queue.
+    assert fast_future.done()
+    assert [topic for topic, index, published_at in publisher.published] == ['queue/slow', 'queue/fast']
+    assert not slow_futures[-1].done()
+
+def test_drop_mode_fails_dropped_publishes():
+
+    limiter = PublishRateLimiter('drop')
+    limiter.set_rate_limit(1, burst=1, topic='drop/topic')
+    publisher = Publisher()
+
+    futures = [limiter.publish('drop/topic', publisher.publish_async('drop/topic', index)) for index in range(3)]
+
+    assert futures[0].exception() is None
+    assert all(isinstance(future.exception(), Exception) for future in futures[1:])
+    assert len(publisher.published) == 1
+    assert limiter.get_stats()['dropped'] == 2
+
+def test_rejects_unknown_mode_and_burst_under_one():
+
+    with pytest.raises(Exception):
+        PublishRateLimiter('unknown')
+
+    with pytest.raises(Exception):
+        PublishRateLimiter().set_rate_limit(10, burst=0.5)
+
+def test_client_publish_rate_limit_drop_mode(buses, new_client):
+
+    client = new_client(protocols=('ipc',))
+    client.set_publish_rate_limit('ipc', 1, burst=1, topic='drop/topic', mode='drop')
+
+    client.publish_message('ipc', client.formatter.get_message(route='route'), topic='drop/topic')
+    with pytest.raises(Exception):
+        client.publish_message('ipc', client.formatter.get_message(route='route'), topic='drop/topic')
+
+    assert client.get_publish_stats()['ipc']['dropped'] == 1